@@ -0,0 +1,282 @@
+"""
+Scaling benchmarks for the backtest pipeline
+
+Every case builds a deterministic synthetic universe and times signal generation,
+panel assembly, simulation and analysis separately. Timings and peak memory are
+compared to benchmarks/baseline.json and the simulation output to benchmarks/golden.json.
+The run exits with status 1 on any regression or golden mismatch.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmarks [--grid quick|full] [--update-baseline] [--update-golden]
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+import pandas as pd
+
+import src.analysis as analysis
+import src.strategy as strategy
+from benchmarks.synthetic_universe import make_universe
+from src.backtesting_engine import Backtester
+from src.panel import assemble_panel, build_market_frame
+
+BENCHMARKS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCHMARKS_FOLDER, "baseline.json")
+GOLDEN_PATH = os.path.join(BENCHMARKS_FOLDER, "golden.json")
+
+STAGES = ["signals", "panel", "simulate", "analysis"]
+
+# Cases are (# of markets, # of years, bar frequency)
+GRIDS = {
+    "quick": [(4, 3, "B"), (8, 3, "B"), (4, 8, "W-FRI")],
+    "full": list(itertools.product([10, 30, 60], [5, 10, 20], ["B", "W-FRI"])),
+}
+
+# Backtest settings shared by every case
+SETTINGS = {
+    "initial_equity": 100000000,
+    "position_risk": 0.005,
+    "commission": 10,
+    "fee": True,
+    "fee_structure": [0.02, 0.2],
+}
+
+
+def case_id(n_markets, n_years, freq):
+    return f"{n_markets}m_{n_years}y_{freq}"
+
+
+class StageTimer:
+    """
+    Record wall time or peak traced memory of each pipeline stage
+
+    Tracing allocations slows the stages down, so time and memory are measured in separate runs
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    def run(self, stage, function, *args, **kwargs):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self.results[stage] = {"peak_mb": round(peak / 2**20, 3)}
+            else:
+                self.results[stage] = {"seconds": round(time.perf_counter() - start, 4)}
+
+
+def generate_signals(universe):
+    """Stage 1: indicators and orders for every market"""
+    signals, orders = {}, []
+    for market, market_data in universe["markets"].items():
+        market_data = strategy.compute_indicators(market_data.copy())
+        market_orders = strategy.generate_orders(market_data)
+        signals[market] = (market_data, market_orders)
+        if not market_orders.empty:
+            orders.append(market_orders.reset_index())
+    orders_df = pd.concat(orders, ignore_index=True) if orders else pd.DataFrame()
+    return signals, orders_df
+
+
+def build_panel(signals):
+    """Stage 2: backtesting dataframe"""
+    market_frames = [
+        build_market_frame(market, market_data, market_orders)
+        for market, (market_data, market_orders) in signals.items()
+    ]
+    return assemble_panel(market_frames, list(signals))
+
+
+def simulate(universe, all_markets_df, orders_df, event_driven=False):
+    """Stage 3: market simulation"""
+    backtester = Backtester(
+        all_markets_df,
+        SETTINGS["initial_equity"],
+        SETTINGS["position_risk"],
+        list(universe["markets"]),
+        orders_df,
+        True,
+        universe["currencies"],
+        SETTINGS["commission"],
+        SETTINGS["fee"],
+        SETTINGS["fee_structure"],
+        specifications=universe["specifications"],
+        progress=False,
+        event_driven=event_driven,
+    )
+    return backtester.simulate()
+
+
+def analyze(universe, all_markets_df, orders_df):
+    """Stage 4: trade, market and portfolio statistics"""
+    results = {
+        "orders": orders_df,
+        "portfolio": all_markets_df.loc[:, ["Margin", "Equity"]],
+        "markets_list": list(universe["markets"]),
+    }
+    return analysis.analyze(results)
+
+
+def golden_metrics(all_markets_df, orders_df):
+    """Summary of the simulation output used to detect changes in P&L"""
+    return {
+        "final_equity": float(all_markets_df.Equity.iloc[-1]),
+        "equity_sum": float(all_markets_df.Equity.sum()),
+        "margin_sum": float(all_markets_df.Margin.sum()),
+        "number_of_orders": int(len(orders_df)),
+        "risk_sum": float(orders_df.Risk.sum()) if not orders_df.empty else 0.0,
+        "pnl_sum": float(orders_df.Pnl.sum()) if "Pnl" in orders_df else 0.0,
+    }
+
+
+def run_pipeline(universe, timer, event_driven=False):
+    signals, orders_df = timer.run("signals", generate_signals, universe)
+    all_markets_df = timer.run("panel", build_panel, signals)
+    all_markets_df, orders_df = timer.run(
+        "simulate", simulate, universe, all_markets_df, orders_df, event_driven
+    )
+    timer.run("analysis", analyze, universe, all_markets_df, orders_df)
+    return all_markets_df, orders_df
+
+
+def run_case(n_markets, n_years, freq, seed=0, event_driven=False):
+    universe = make_universe(n_markets, n_years, freq, seed=seed)
+
+    timer, memory_tracer = StageTimer(), StageTimer(trace_memory=True)
+    all_markets_df, orders_df = run_pipeline(universe, timer, event_driven)
+    run_pipeline(universe, memory_tracer, event_driven)
+
+    results = {
+        stage: {**timer.results[stage], **memory_tracer.results[stage]} for stage in STAGES
+    }
+    return results, golden_metrics(all_markets_df, orders_df)
+
+
+def compare_to_baseline(
+    name, results, baseline, time_tolerance, memory_tolerance, min_seconds, min_mb
+):
+    """Return the list of stages slower or heavier than the stored baseline"""
+    regressions = []
+    for stage, stage_results in results.items():
+        reference = baseline.get(stage)
+        if reference is None:
+            continue
+        slower = stage_results["seconds"] - reference["seconds"]
+        if slower > min_seconds and stage_results["seconds"] > reference["seconds"] * (
+            1 + time_tolerance
+        ):
+            regressions.append(
+                f"{name} {stage}: {stage_results['seconds']:.3f}s vs {reference['seconds']:.3f}s"
+            )
+        heavier = stage_results["peak_mb"] - reference["peak_mb"]
+        if heavier > min_mb and stage_results["peak_mb"] > reference["peak_mb"] * (
+            1 + memory_tolerance
+        ):
+            regressions.append(
+                f"{name} {stage}: {stage_results['peak_mb']:.1f}MB vs {reference['peak_mb']:.1f}MB"
+            )
+    return regressions
+
+
+def compare_to_golden(name, metrics, golden, rel_tolerance=1e-9):
+    """Return the list of golden metrics that changed"""
+    mismatches = []
+    for metric, expected in golden.items():
+        if not math.isclose(metrics.get(metric, math.nan), expected, rel_tol=rel_tolerance):
+            mismatches.append(f"{name} {metric}: {metrics.get(metric)} != {expected}")
+    return mismatches
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_json(path, content):
+    with open(path, "w") as file:
+        json.dump(content, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--grid", choices=sorted(GRIDS), default="quick")
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--memory-tolerance", type=float, default=0.10)
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Ignore slowdowns below it")
+    parser.add_argument("--min-mb", type=float, default=1.0, help="Ignore memory growth below it")
+    parser.add_argument(
+        "--event-driven", action="store_true", help="Simulate with the event driven engine"
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--update-golden", action="store_true")
+    parser.add_argument("--output", help="Save the results of this run as json")
+    args = parser.parse_args(argv)
+
+    # The analysis imports empyrical lazily. Load it now so it is not timed with the first case
+    import empyrical  # noqa: F401
+
+    baseline, golden = load_json(BASELINE_PATH), load_json(GOLDEN_PATH)
+    results, failures = {}, []
+    for n_markets, n_years, freq in GRIDS[args.grid]:
+        # Both engines share the golden output, but have their own baseline
+        golden_name = case_id(n_markets, n_years, freq)
+        name = golden_name + ("_event" if args.event_driven else "")
+        stage_results, metrics = run_case(
+            n_markets, n_years, freq, event_driven=args.event_driven
+        )
+        results[name] = {"stages": stage_results, "golden": metrics, "golden_name": golden_name}
+        print(
+            name.ljust(20),
+            "  ".join(
+                f"{stage} {stage_results[stage]['seconds']:8.3f}s {stage_results[stage]['peak_mb']:8.1f}MB"
+                for stage in STAGES
+            ),
+        )
+
+        if not args.update_baseline:
+            failures += compare_to_baseline(
+                name,
+                stage_results,
+                baseline.get(name, {}),
+                args.time_tolerance,
+                args.memory_tolerance,
+                args.min_seconds,
+                args.min_mb,
+            )
+        if not args.update_golden:
+            failures += compare_to_golden(name, metrics, golden.get(golden_name, {}))
+
+    if args.update_baseline:
+        baseline.update({name: result["stages"] for name, result in results.items()})
+        save_json(BASELINE_PATH, baseline)
+    if args.update_golden:
+        golden.update({result["golden_name"]: result["golden"] for result in results.values()})
+        save_json(GOLDEN_PATH, golden)
+    if args.output:
+        save_json(args.output, results)
+
+    for failure in failures:
+        print("FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
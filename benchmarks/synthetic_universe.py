@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Bars per year for the supported bar frequencies
+BAR_FREQUENCIES = {"B": 252, "W-FRI": 52}
+
+# Quote currencies and their starting USD rate
+CURRENCIES = {"USD": 1.0, "EUR": 1.1, "GBP": 1.3, "JPY": 0.009, "CHF": 1.05}
+
+POINT_VALUES = [10, 20, 50, 100, 1000]
+
+
+def make_calendar(n_years, freq="B", start="2000-01-03"):
+    """Function to create the bar timestamps of the synthetic universe"""
+    periods = int(n_years * BAR_FREQUENCIES[freq])
+    return pd.date_range(start=start, periods=periods, freq=freq, name="Dates")
+
+
+def make_prices(dates, freq, rng, missing_ratio=0.01):
+    """Function to simulate a trending price series with random holidays"""
+    bars_per_year = BAR_FREQUENCIES[freq]
+    volatility = rng.uniform(0.15, 0.35) / np.sqrt(bars_per_year)
+
+    # Drift changes regime roughly once a year so that breakouts happen
+    regimes = np.repeat(
+        rng.normal(0, 0.4, len(dates) // bars_per_year + 1) / bars_per_year, bars_per_year
+    )[: len(dates)]
+    log_returns = regimes + rng.standard_normal(len(dates)) * volatility
+    prices = 100 * np.exp(rng.uniform(-1, 1)) * np.exp(np.cumsum(log_returns))
+
+    market_data = pd.DataFrame({"PX_LAST": prices.round(4)}, index=dates)
+
+    # Simulate holidays by dropping some bars
+    holidays = rng.random(len(dates)) < missing_ratio
+    holidays[0] = False
+    return market_data[~holidays]
+
+
+def make_universe(n_markets, n_years, freq="B", seed=0, missing_ratio=0.01):
+    """
+    Create a deterministic synthetic universe
+
+    :param int n_markets: Number of markets
+    :param float n_years: Length of the history in years
+    :param str freq: Bar frequency. One of BAR_FREQUENCIES
+    :param int seed: Seed of the random generator
+    :param float missing_ratio: Share of bars dropped in each market to simulate holidays
+    :return dict: markets data, contracts specifications and exchange rates
+    """
+    dates = make_calendar(n_years, freq)
+    currencies = list(CURRENCIES)
+
+    markets, specifications = {}, []
+    for market_idx in range(n_markets):
+        # Each market has its own stream so the grid cases share their first markets
+        rng = np.random.default_rng([seed, market_idx])
+        market = f"M{market_idx:03d}"
+        market_data = make_prices(dates, freq, rng, missing_ratio)
+        market_data.insert(0, "Symbol", market)
+        markets[market] = market_data
+
+        point_value = POINT_VALUES[market_idx % len(POINT_VALUES)]
+        specifications.append(
+            {
+                "Symbol": market,
+                "Currency": currencies[market_idx % len(currencies)],
+                "Point_Value": point_value,
+                "Margin": round(0.05 * market_data.PX_LAST.iloc[0] * point_value, 2),
+            }
+        )
+
+    # Exchange rates follow a random walk around their starting level
+    rng = np.random.default_rng([seed, n_markets, 1])
+    currencies_df = pd.DataFrame(index=dates)
+    for currency, rate in CURRENCIES.items():
+        if currency == "USD":
+            continue
+        currencies_df[currency] = (
+            rate * np.exp(np.cumsum(rng.standard_normal(len(dates)) * 0.005))
+        ).round(6)
+
+    return {
+        "markets": markets,
+        "specifications": pd.DataFrame(specifications),
+        "currencies": currencies_df,
+    }
+
+
+def write_universe(universe, root_folder):
+    """Function to save the universe with the same layout as the data folder"""
+    data_folder = os.path.join(root_folder, "data")
+    for folder in ["historical_data", "spot_currencies"]:
+        os.makedirs(os.path.join(data_folder, folder), exist_ok=True)
+
+    for market, market_data in universe["markets"].items():
+        market_data[["PX_LAST"]].to_excel(
+            os.path.join(data_folder, "historical_data", f"{market}.xlsx"), index_label="Dates"
+        )
+
+    for currency in universe["currencies"]:
+        universe["currencies"][[currency]].to_excel(
+            os.path.join(data_folder, "spot_currencies", f"{currency}.xlsx"), index_label="Dates"
+        )
+
+    universe["specifications"].to_excel(
+        os.path.join(data_folder, "contracts_details.xlsx"), index=False
+    )
@@ -0,0 +1,318 @@
+import pandas as pd
+
+from src.bars import daily_bars
+from src.rolling import rolling_regression
+
+
+def pair_trades(orders_summary, markets_list):
+    """
+    Pair each order with the P/L and holding time of the position it opened
+
+    :param pandas.DataFrame orders_summary: Orders indexed by date with Symbol, Order, Risk and Pnl columns
+    :param list markets_list: List of all available markets
+    :return pandas.DataFrame: Closed long and short trades
+    """
+    orders = pd.DataFrame()
+    for market in markets_list:
+        market_orders = orders_summary.loc[orders_summary.Symbol.astype("str") == market]
+        if not market_orders.empty:
+            # Remove open positions
+            if market_orders.Order.iloc[-1] != "flat":
+                market_orders = market_orders[:-1]
+            market_orders = market_orders.copy()
+            # Shift Pnl
+            market_orders.Pnl = market_orders.Pnl.shift(-1)
+            # Compute holding time for each position
+            market_orders.loc[:, "Holding_time"] = market_orders.index.to_series().diff().shift(-1)
+
+            orders = pd.concat([orders, market_orders])
+
+    if orders.empty:
+        return orders
+
+    # Drop any closing order
+    return orders.loc[orders.Order != "flat"].dropna()
+
+
+def ledger_trades(trade_ledger):
+    """
+    Convert the backtester's trade ledger in the closed trades table returned by pair_trades
+
+    :param pandas.DataFrame trade_ledger: Output of TradeLedger.to_frame
+    :return pandas.DataFrame: Closed trades indexed by entry date, with MAE and MFE columns
+    """
+    closed = trade_ledger.dropna(subset=["Exit_date"])
+    return pd.DataFrame(
+        {
+            "Symbol": closed.Symbol.astype("str").values,
+            "Order": closed.Side.astype("str").values,
+            "Risk": closed.Risk.values,
+            "Pnl": closed.Pnl.values,
+            "Holding_time": (closed.Exit_date - closed.Entry_date).values,
+            "MAE": closed.MAE.values,
+            "MFE": closed.MFE.values,
+        },
+        index=pd.DatetimeIndex(closed.Entry_date, name="Dates"),
+    ).sort_index(kind="stable")
+
+
+def trade_statistics(orders):
+    """
+    Compute statistics of closed trades
+
+    :param pandas.DataFrame orders: Trades returned by pair_trades
+    :return dict: Holding times, win rates, profit factor, P/L and R return distributions
+    """
+    wins, losses = orders.Pnl >= 0, orders.Pnl < 0
+    shorts, longs = orders.Order == "short", orders.Order == "long"
+
+    statistics = {
+        "cumulative_R_return": orders.R_return.sum(),
+        # AVG holding times
+        "avg_time": orders.Holding_time.mean().round("D"),
+        "avg_time_short": orders.loc[shorts, "Holding_time"].mean().round("D"),
+        "avg_time_long": orders.loc[longs, "Holding_time"].mean().round("D"),
+        "avg_time_win": orders.loc[wins, "Holding_time"].mean().round("D"),
+        "avg_time_loss": orders.loc[losses, "Holding_time"].mean().round("D"),
+        # W/R
+        "number_of_trades": len(orders),
+        "win_rate": wins.sum() / len(orders),
+        "win_rate_short": (wins & shorts).sum() / shorts.sum(),
+        "win_rate_long": (wins & longs).sum() / longs.sum(),
+        # Profit factor
+        "profit_factor": orders.loc[wins, "Pnl"].sum() / abs(orders.loc[losses, "Pnl"].sum()),
+        # Distribution of Pnl
+        "avg_pnl": orders.Pnl.mean(),
+        "avg_pnl_win": orders.loc[wins, "Pnl"].mean(),
+        "avg_pnl_loss": orders.loc[losses, "Pnl"].mean(),
+        "median_pnl": orders.Pnl.median(),
+        "median_pnl_win": orders.loc[wins, "Pnl"].median(),
+        "median_pnl_loss": orders.loc[losses, "Pnl"].median(),
+        "min_pnl": orders.Pnl.min(),
+        "max_pnl": orders.Pnl.max(),
+        # Distribution of Returns
+        "avg_return": orders.R_return.mean(),
+        "avg_return_win": orders.loc[wins, "R_return"].mean(),
+        "avg_return_loss": orders.loc[losses, "R_return"].mean(),
+        "median_return": orders.R_return.median(),
+        "median_return_win": orders.loc[wins, "R_return"].median(),
+        "median_return_loss": orders.loc[losses, "R_return"].median(),
+        "min_return": orders.R_return.min(),
+        "max_return": orders.R_return.max(),
+        "skew_return": orders.R_return.skew(),
+        "kurtosis_return": orders.R_return.kurtosis(),
+    }
+
+    # Excursions are recorded by the backtester's trade ledger
+    if "MAE" in orders:
+        mae_return, mfe_return = orders.MAE / orders.Risk, orders.MFE / orders.Risk
+        statistics.update(
+            {
+                "avg_mae_return": mae_return.mean(),
+                "avg_mae_return_win": mae_return[wins].mean(),
+                "avg_mae_return_loss": mae_return[losses].mean(),
+                "avg_mfe_return": mfe_return.mean(),
+                "avg_mfe_return_win": mfe_return[wins].mean(),
+                "avg_mfe_return_loss": mfe_return[losses].mean(),
+            }
+        )
+    return statistics
+
+
+def market_statistics(orders):
+    """Compute R returns and win rates of each market"""
+    by_market = orders.groupby("Symbol")
+    wins = orders.Pnl >= 0
+    shorts = orders.Order == "short"
+    return pd.DataFrame(
+        {
+            "R_return": by_market.R_return.sum(),
+            "avg_R_return": by_market.R_return.mean(),
+            "min_R_return": by_market.R_return.min(),
+            "max_R_return": by_market.R_return.max(),
+            "win_rate": wins.groupby(orders.Symbol).mean(),
+            "short_win_rate": wins[shorts].groupby(orders.Symbol[shorts]).mean(),
+            "long_win_rate": wins[~shorts].groupby(orders.Symbol[~shorts]).mean(),
+        }
+    )
+
+
+def period_statistics(returns):
+    """Compute win rate and distribution of monthly or yearly returns"""
+    return {
+        "win_rate": len(returns.loc[returns > 0]) / len(returns.loc[returns != 0]),
+        "avg_return": returns.mean(),
+        "avg_return_win": returns[returns > 0].mean(),
+        "avg_return_loss": returns[returns < 0].mean(),
+        "median_return": returns.median(),
+        "median_return_win": returns.loc[returns > 0].median(),
+        "median_return_loss": returns.loc[returns < 0].median(),
+        "min_return": returns.min(),
+        "max_return": returns.max(),
+    }
+
+
+def portfolio_statistics(portfolio, rolling_windows=(63, 126, 252, 504)):
+    """
+    Compute portfolio metrics
+
+    :param pandas.DataFrame portfolio: Equity and Margin columns, plus Benchmark prices if available
+    :param list rolling_windows: Windows of the rolling regression on the benchmark
+    :return tuple: dict of metrics and dict of series (cumulative return, drawdown, rolling stats)
+    """
+    import empyrical as ep
+
+    returns = portfolio.Equity.pct_change()
+    cumulative_return = (1 + returns).cumprod()
+    roll_drawdown = cumulative_return / cumulative_return.cummax() - 1
+    margin_to_equity = portfolio.Margin / portfolio.Equity
+
+    cagr = ep.cagr(returns)
+    max_drawdown = ep.max_drawdown(returns)
+    metrics = {
+        "cagr": cagr,
+        "annual_volatility": ep.annual_volatility(returns),
+        "max_drawdown": max_drawdown,
+        "calmar_ratio": abs(cagr / max_drawdown),
+        "sharpe_ratio": ep.sharpe_ratio(returns),
+        "sortino_ratio": ep.sortino_ratio(returns),
+        "omega_ratio": ep.omega_ratio(returns),
+        "tail_ratio": ep.tail_ratio(returns),
+        "daily_avg_return_equity": returns.mean(),
+        "daily_avg_pnl_equity": portfolio.Equity.diff().mean(),
+        "daily_standard_deviation_equity": returns.std(),
+        "daily_skew_equity": returns.skew(),
+        "daily_kurtosis_equity": returns.kurtosis(),
+        # Margin to Equity
+        "avg_margin_to_equity": margin_to_equity.mean(),
+        "max_margin_to_equity": margin_to_equity.max(),
+    }
+    series = {
+        "cumulative_return": cumulative_return,
+        "roll_drawdown": roll_drawdown,
+        "margin_to_equity": margin_to_equity,
+    }
+
+    if "Benchmark" in portfolio:
+        benchmark_returns = portfolio.Benchmark.pct_change()
+        metrics["alpha"], metrics["beta"] = ep.alpha_beta(returns, benchmark_returns)
+        metrics["correlation"] = returns.corr(benchmark_returns)
+        rolling = rolling_regression(
+            returns, benchmark_returns.rename("Benchmark"), sorted({*rolling_windows, 252})
+        )
+        series["rolling_regression"] = rolling
+        series["rolling_beta"] = rolling[("beta", "Benchmark", 252)]
+        series["roll_correlation"] = rolling[("correlation", "Benchmark", 252)]
+
+    return metrics, series
+
+
+def analyze(results, benchmark=None, bootstrap=None, rolling_windows=(63, 126, 252, 504)):
+    """
+    Compute trade, market and portfolio statistics of a backtest
+
+    :param dict results: Output of pipeline.run_backtest or pipeline.load_results.
+        Trades come from the trade ledger if available, otherwise from pairing the orders
+    :param pandas.Series benchmark: Benchmark prices indexed by date
+    :param dict bootstrap: Keyword arguments of bootstrap.confidence_intervals. None skips the intervals
+    :param list rolling_windows: Windows of the rolling regression on the benchmark
+    :return dict: trades, statistics per section, portfolio series and confidence intervals
+    """
+    import empyrical as ep
+
+    if results.get("trade_ledger") is not None:
+        trades = ledger_trades(results["trade_ledger"])
+    else:
+        orders_summary = results["orders"]
+        if "Dates" in orders_summary:
+            orders_summary = orders_summary.set_index("Dates").sort_index()
+        trades = pair_trades(
+            orders_summary[["Symbol", "Order", "Risk", "Pnl"]], results["markets_list"]
+        )
+
+    # Compute R Returns | How much a trade made in unit of risk
+    if not trades.empty:
+        trades["R_return"] = trades.Pnl / trades.Risk
+
+    # Statistics are annualized from daily returns, so intraday bars are resampled to their last of the day
+    portfolio = daily_bars(results["portfolio"]).copy()
+    if benchmark is not None:
+        portfolio["Benchmark"] = benchmark
+
+    returns = portfolio.Equity.pct_change()
+    portfolio_metrics, series = portfolio_statistics(portfolio, rolling_windows)
+    analysis = {
+        "trades": trades,
+        "trade_statistics": trade_statistics(trades) if not trades.empty else {},
+        "market_statistics": market_statistics(trades) if not trades.empty else pd.DataFrame(),
+        "monthly_statistics": period_statistics(ep.aggregate_returns(returns, "monthly")),
+        "yearly_statistics": period_statistics(ep.aggregate_returns(returns, "yearly")),
+        "portfolio_statistics": portfolio_metrics,
+        "series": series,
+    }
+
+    if bootstrap is not None:
+        from src.bootstrap import confidence_intervals
+
+        analysis["confidence_intervals"] = confidence_intervals(
+            trades if not trades.empty else None, returns, **bootstrap
+        )
+    return analysis
+
+
+def print_report(analysis):
+    """Print the main portfolio and trade metrics, with their confidence intervals if computed"""
+    intervals = analysis.get("confidence_intervals", pd.DataFrame())
+
+    def interval(metric):
+        if metric not in intervals.index:
+            return ""
+        return f" [{intervals.at[metric, 'lower']:.4f}, {intervals.at[metric, 'upper']:.4f}]"
+
+    metrics = analysis["portfolio_statistics"]
+    print(f"The CAGR is: {metrics['cagr']:.4f}{interval('cagr')}")
+    print(f"The annual volatility is: {metrics['annual_volatility']:.4f}")
+    print(f"The max drawdown is: {metrics['max_drawdown']:.4f}")
+    print(f"The sharpe ratio is: {metrics['sharpe_ratio']:.4f}{interval('sharpe_ratio')}")
+    print(f"The sortino ratio is: {metrics['sortino_ratio']:.4f}")
+    print(f"Calmar ratio: {metrics['calmar_ratio']:.4f}")
+
+    if "correlation" in metrics:
+        print(f"Correlation: {metrics['correlation']:.4f}")
+        print(f"Alpha, Beta: {metrics['alpha']:.4f} {metrics['beta']:.4f}")
+
+    if not intervals.empty and analysis["trade_statistics"]:
+        trades = analysis["trade_statistics"]
+        print(f"Win rate: {trades['win_rate']:.4f}{interval('win_rate')}")
+        print(f"Profit factor: {trades['profit_factor']:.4f}{interval('profit_factor')}")
+        print(f"Average R return: {trades['avg_return']:.4f}{interval('avg_return')}")
+
+
+def plot_report(analysis, portfolio):
+    """Plot equity curve, drawdown and rolling beta and correlation, decimated to the pixel width"""
+    from matplotlib import dates, pyplot as plt
+
+    from src.plotting import fill_between, plot_line
+
+    series = analysis["series"]
+    _, (ax1, ax2, ax3) = plt.subplots(3, 1, gridspec_kw={"height_ratios": [3, 1, 1]})
+    plot_line(ax1, portfolio.Equity / portfolio.Equity.iloc[0], color="k")
+    ax1.set_ylabel("Return")
+    ax1.set_title("Equity Curve")
+    ax1.set_xticklabels([])
+    ax1.set_xticks([])
+    ax1.set_ylim(bottom=1)
+    plot_line(ax2, series["roll_drawdown"], color="k")
+    fill_between(ax2, series["roll_drawdown"], color="r")
+    ax2.set_ylabel("Drawdown")
+    ax2.set_xticklabels([])
+    ax2.set_xticks([])
+    ax2.set_ylim(ymax=0)
+    if "roll_correlation" in series:
+        plot_line(ax3, series["roll_correlation"], color="k", label="Correlation")
+        plot_line(ax3, series["rolling_beta"], color="b", label="Beta")
+        ax3.set_ylabel("Benchmark")
+        ax3.axhline(y=0, color="r", linestyle="--")
+        ax3.legend(loc="upper left")
+    ax3.xaxis.set_major_formatter(dates.DateFormatter("%b-%y"))
+    plt.show()
@@ -1,19 +1,18 @@
 import logging
 import os
-import sys
+import time
 from functools import lru_cache
 
 import numpy as np
-import pandas as pd
-from tqdm import tqdm
 
-from src.position_builders import (
-    get_mark_to_market_points,
-    get_number_of_contracts,
-    get_daily_change,
-    get_position_points,
-    get_currency_rate,
-)
+from src.bars import BarCalendar
+from src.compact import compact_panel
+from src.costs import read_specifications
+from src.instrumentation import Instrumentation, progress_bar
+from src.panel import book_name
+from src.trade_ledger import TradeLedger
+from src.validation import check_inputs
+from src.position_builders import get_number_of_contracts, get_position_points
 
 
 class Backtester:
@@ -33,6 +32,19 @@ class Backtester:
         commission,
         fee,
         fee_structure,
+        specifications=None,
+        instrumentation=None,
+        progress=True,
+        event_driven=False,
+        compact=False,
+        stop_criteria=None,
+        validate=True,
+        position_sizing=None,
+        strategies=None,
+        bar_frequency="daily",
+        max_gap="9D",
+        fx_tolerance="9D",
+        cost_model=None,
     ):
         """
         :param pandas.DataFrame all_markets_df: df including historical data
@@ -45,9 +57,45 @@ class Backtester:
         :param float commission: Commission per trade
         :param bool fee: Attribute to include fees
         :param list fee_structure: List that include fee structure. First value is mgmt fee, the second is performance fee / carry
+        :param pandas.DataFrame specifications: Futures contracts specifications. Loaded from contracts_details.xlsx if None
+        :param Instrumentation instrumentation: Records FX rates lookup, fees and, with market_timing, per-market timings
+        :param bool progress: Attribute to show the progress bar
+        :param bool event_driven: Attribute to simulate each day only markets with an open position or an order to execute
+        :param bool compact: Attribute to store orders as categorical, contracts as int32 and price levels as float32
+        :param list stop_criteria: StopCriterion objects checked at the end of each day. The first one met ends the run
+        :param bool validate: Attribute to check the inputs before simulating. Raises ValidationError if incomplete
+        :param VolatilityTarget position_sizing: Sizes new positions from the EWMA covariance of the markets.
+            None sizes them by their breakout distance
+        :param dict strategies: Strategy id -> share of the equity sizing its positions. Each strategy has its order,
+            level and state columns for every market, prefixed by "{strategy id}:", and its Equity, Margin and P/L.
+            None simulates a single strategy
+        :param str bar_frequency: "daily" or the pandas frequency of intraday bars, e.g. "1min" or "1h".
+            Intraday bars accrue the management fee by elapsed time and measure gaps between closes in time
+        :param str max_gap: Longest time between two closes of a market giving an intraday change
+        :param str fx_tolerance: Maximum age of the exchange rate of a bar
+        :param CostModel cost_model: Charges commission, slippage and impact on every traded contract and
+            records them in a Costs column. None charges commission * 2 per contract of new positions
         """
         self.logger = logging.getLogger(__name__)
-        self.data = all_markets_df.copy()  # To avoid fragmentation of DF
+        self.compaction_report = None
+        # Strategies trade the markets in books, each with its own columns
+        self.multi_strategy = bool(strategies)
+        self.strategies = list(strategies) if strategies else [None]
+        self.strategy_weights = list(strategies.values()) if strategies else [1.0]
+        self.books = [
+            book_name(strategy_id, market) for strategy_id in self.strategies for market in markets_list
+        ]
+        if compact:
+            # Conversion returns a new DF, so no further copy is needed
+            self.data, self.compaction_report = compact_panel(
+                all_markets_df, markets_list, self.strategies if self.multi_strategy else None
+            )
+            self.logger.info(
+                f"Compact panel: {self.compaction_report['compact_mb']:.1f} MB, "
+                f"{self.compaction_report['saved_mb']:.1f} MB saved"
+            )
+        else:
+            self.data = all_markets_df.copy()  # To avoid fragmentation of DF
         self.position_risk = position_risk
         self.markets_list = markets_list
         self.orders_df = orders_df
@@ -56,130 +104,460 @@ class Backtester:
         self.commission = commission * 2
         self.fee = fee
         self.fee_structure = fee_structure
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+        self.progress = progress
+        self.event_driven = event_driven
+        self.stop_criteria = stop_criteria or []
+        self.position_sizing = position_sizing
+        self.cost_model = cost_model
+        # Reason code and date of an early termination
+        self.stop_reason = None
+        self.stop_date = None
+        # Column index -> values of the columns read and written while simulating
+        self.state = None
 
         # Initialize columns
         self.data["Margin"] = 0.0
         self.data["Equity"] = self.data["Watermark"] = initial_equity
         self.orders_df["Risk"] = 0.0
+        if cost_model is not None:
+            self.data["Costs"] = 0.0
+        if self.multi_strategy:
+            self.data["P/L"] = 0.0
+            for strategy_id, weight in zip(self.strategies, self.strategy_weights):
+                self.data[f"{strategy_id} Margin"] = self.data[f"{strategy_id} P/L"] = 0.0
+                self.data[f"{strategy_id} Equity"] = initial_equity * weight
 
         # Get portfolio's equity, margin and watermark indices
         self.general_equity_idx = self.data.columns.get_loc("Equity")
         self.general_margin_idx = self.data.columns.get_loc("Margin")
         self.watermark_idx = self.data.columns.get_loc("Watermark")
+        if cost_model is not None:
+            self.costs_idx = self.data.columns.get_loc("Costs")
+        if self.multi_strategy:
+            self.general_pnl_idx = self.data.columns.get_loc("P/L")
+            self.strategies_details = [
+                {
+                    column: self.data.columns.get_loc(f"{strategy_id} {column}")
+                    for column in ["Margin", "Equity", "P/L"]
+                }
+                for strategy_id in self.strategies
+            ]
 
         # Load file with Futures contracts specifications
-        self.specifications = pd.read_excel(
-            os.path.join(os.getcwd(), "data", "contracts_details.xlsx"),
-            usecols=["Symbol", "Currency", "Point_Value", "Margin"],
+        if specifications is None:
+            specifications = read_specifications(os.path.join(os.getcwd(), "data", "contracts_details.xlsx"))
+        self.specifications = specifications
+
+        # Timing of the bars: fee accrual, gaps between closes and age of exchange rates
+        self.calendar = BarCalendar(self.data.index, bar_frequency, max_gap, fx_tolerance)
+        self.fee_days = self.calendar.fee_days()
+
+        # Check inputs up front, so the simulation can't stop half way
+        self.validation_report = None
+        if validate:
+            self.validation_report = check_inputs(
+                self.data,
+                markets_list,
+                orders_df,
+                specifications,
+                currencies_df,
+                local_currency,
+                strategies=self.strategies if self.multi_strategy else None,
+                calendar=self.calendar,
+            )
+
+        # Get books' columns indices and contract specifications
+        self.markets_details = {
+            book_name(strategy_id, market): self.get_market_details(market, strategy_idx)
+            for strategy_idx, strategy_id in enumerate(self.strategies)
+            for market in markets_list
+        }
+
+        # Changes in points and exchange rates of the markets on each bar, shared by the strategies
+        self.price_changes = [
+            self.calendar.price_changes(self.data.iloc[:, self.data.columns.get_loc(f"{market} Close")].to_numpy())
+            for market in markets_list
+        ]
+        if local_currency:
+            with self.instrumentation.stage("fx_conversion"):
+                self.market_currencies, self.exchange_rates = self.get_exchange_rates()
+
+        # Trades recorded while simulating, with their excursions
+        self.trade_ledger = TradeLedger(
+            [self.markets_details[book]["market"] for book in self.books],
+            self.data.index,
+            strategies=(
+                [self.markets_details[book]["strategy"] for book in self.books] if self.multi_strategy else None
+            ),
         )
 
     @lru_cache
     def simulate(self):
+        self.state = self.get_state()
+        for criterion in self.stop_criteria:
+            criterion.start(self)
+        if self.position_sizing is not None:
+            self.position_sizing.start(self)
+        if self.cost_model is not None:
+            self.cost_model.start(self)
+
+        if self.event_driven:
+            # Markets with an order to execute on each day
+            pending_orders = self.get_pending_orders()
+            open_positions = set()
+            last_update = [-1] * len(self.books)
+            updated = np.zeros((self.data.shape[0], len(self.books)), dtype=bool)
+
+        # Highest equity before the day
+        watermark = -np.inf
+
         # Iterate through each day
-        for day_data in tqdm(self.data.itertuples(), total=self.data.shape[0]):
-            # Get date
-            date = day_data[0].to_pydatetime()
-            # Get index for selected day
-            date_idx = self.data.index.get_indexer([date])[0]
-            # Initialize mark to market change for the day
-            marked_to_market = 0
-
-            # Iterate through each market
-            for market in self.markets_list:
-
-                # Get indices for accessing DF
-                order_idx = self.data.columns.get_loc(f"{market} Order")
-                contract_idx = self.data.columns.get_loc(f"{market} Contracts")
-                risk_idx = self.data.columns.get_loc(f"{market} Risk")
-                margin_idx = self.data.columns.get_loc(f"{market} Margin")
-                pnl_idx = self.data.columns.get_loc(f"{market} P/L")
-
-                market_name = market.split('_')[0]
-                # Get position of selected market contract specifications
-                market_specifications = self.specifications.Symbol.values.astype("str") == market_name
-                # Get point value
-                point_value = self.specifications[market_specifications].Point_Value.values[0]
-                # Get margin requirement
-                margin_requirement = self.specifications[market_specifications].Margin.values[0]
-
-                # Check if there's new position change
-                if self.data.iat[date_idx - 1, order_idx] is not np.NaN and date_idx != 0:
-                    self.new_order(
-                        date_idx,
-                        contract_idx,
-                        risk_idx,
-                        pnl_idx,
-                        market,
-                        self.data.iat[date_idx - 1, order_idx],
-                        point_value,
+        for date_idx, date in enumerate(
+            progress_bar(self.data.index, self.progress, total=self.data.shape[0])
+        ):
+            date = date.to_pydatetime()
+            # Initialize mark to market change of each strategy for the day
+            strategies_marked_to_market = [0] * len(self.strategies)
+
+            if not self.event_driven:
+                # Iterate through each market of each strategy
+                for book in self.books:
+                    strategy_idx = self.markets_details[book]["strategy_idx"]
+                    strategies_marked_to_market[strategy_idx] = self.simulate_market(
+                        date_idx, date, book, strategies_marked_to_market[strategy_idx]
                     )
 
-                    # Commission per roundtrip | We anticipate payment
-                    if self.data.iat[date_idx, contract_idx] != 0:
-                        marked_to_market -= self.data.iat[date_idx, contract_idx] * self.commission
+            else:
+                # Iterate only through books with an open position or an order to execute
+                active_books = open_positions.union(pending_orders.get(date_idx, []))
+                for book_idx in sorted(active_books):
+                    book = self.books[book_idx]
+                    # Bring forward state the book had when it went idle
+                    if 0 <= last_update[book_idx] < date_idx - 1:
+                        self.copy_market_state(book, last_update[book_idx], date_idx - 1)
+
+                    strategy_idx = self.markets_details[book]["strategy_idx"]
+                    strategies_marked_to_market[strategy_idx] = self.simulate_market(
+                        date_idx, date, book, strategies_marked_to_market[strategy_idx]
+                    )
+
+                    if self.state[self.markets_details[book]["contract_idx"]][date_idx] != 0:
+                        open_positions.add(book_idx)
+                    else:
+                        open_positions.discard(book_idx)
+                    last_update[book_idx] = date_idx
+                    updated[date_idx, book_idx] = True
+
+            marked_to_market = sum(strategies_marked_to_market)
+            if self.multi_strategy:
+                self.update_strategies(date_idx, strategies_marked_to_market, marked_to_market)
+
+            # Update equity level
+            self.state[self.general_equity_idx][date_idx] = (
+                marked_to_market + self.state[self.general_equity_idx][date_idx - 1]
+            )
+
+            # Set NAV watermark, kept as a running maximum. There is none on the first day
+            if date_idx != 0:
+                watermark = max(watermark, self.state[self.general_equity_idx][date_idx - 1])
+            self.state[self.watermark_idx][date_idx] = watermark if date_idx != 0 else np.NaN
+
+            # Remove fees
+            if self.fee and date_idx != 0:
+                with self.instrumentation.stage("fees"):
+                    self.compute_fees(date_idx, self.watermark_idx, self.general_equity_idx)
+
+            # Covariance of the returns up to the day, used by the orders of the day after
+            if self.position_sizing is not None:
+                self.position_sizing.update(self, date_idx)
+
+            if self.stop_criteria and self.check_stop_criteria(date_idx, date):
+                break
+
+        self.write_state()
+        if self.event_driven:
+            self.fill_idle_markets(updated)
+
+        if self.stop_reason is not None:
+            # Partial result up to the stop date. Later orders are never executed
+            self.data = self.data.iloc[: date_idx + 1]
+            self.orders_df = self.orders_df.loc[self.orders_df.Dates < date].reset_index(drop=True)
+
+        return self.data, self.orders_df
+
+    def get_state(self):
+        """
+        Copy the order and state columns to numpy arrays, where the day loop reads and writes single values
+
+        Element access on an array costs a fraction of DataFrame.iat. Markets' arrays keep the dtypes of their
+        columns. Portfolio and strategies' columns are amounts of money, so they are floats even when the initial
+        equity is an integer
+
+        :return dict: Column index -> values
+        """
+        state = {}
+        money_columns = [self.general_equity_idx, self.general_margin_idx, self.watermark_idx]
+        if self.cost_model is not None:
+            money_columns.append(self.costs_idx)
+        if self.multi_strategy:
+            money_columns.append(self.general_pnl_idx)
+            money_columns += [column_idx for details in self.strategies_details for column_idx in details.values()]
+        for column_idx in money_columns:
+            state[column_idx] = self.data.iloc[:, column_idx].to_numpy(float, copy=True)
+        for market_details in self.markets_details.values():
+            for column_idx in ["order_idx", "contract_idx", "risk_idx", "margin_idx", "pnl_idx"]:
+                column_idx = market_details[column_idx]
+                state[column_idx] = self.data.iloc[:, column_idx].to_numpy(copy=True)
+        return state
+
+    def write_state(self):
+        """Write the state arrays back to their columns. Orders are only read"""
+        order_columns = {market_details["order_idx"] for market_details in self.markets_details.values()}
+        for column_idx, values in self.state.items():
+            if column_idx not in order_columns:
+                self.data[self.data.columns[column_idx]] = values
+
+    def check_stop_criteria(self, date_idx, date):
+        """
+        Check the stop criteria at the end of the day
 
-                else:
-                    # Copy previous day # of contracts
-                    self.data.iat[date_idx, contract_idx] = self.data.iat[
-                        date_idx - 1, contract_idx
-                    ]
+        :param int date_idx: Selected date's row index
+        :param datetime.date date: Selected date
+        :return bool: True if the run has to stop
+        """
+        for criterion in self.stop_criteria:
+            reason = criterion.check(self, date_idx)
+            if reason is not None:
+                self.stop_reason, self.stop_date = reason, date
+                self.logger.info(f"Simulation stopped on {date:%Y-%m-%d}: {reason}")
+                return True
+        return False
+
+    def update_strategies(self, date_idx, strategies_marked_to_market, marked_to_market):
+        """
+        Record P/L and equity of each strategy and the portfolio's P/L for the day
 
-                    # Copy previous day Risk
-                    self.data.iat[date_idx, risk_idx] = self.data.iat[date_idx - 1, risk_idx]
+        Strategies' equity is before fees, which are charged on the portfolio
 
-                # Compute daily change
-                daily_change = self.mark_to_market(
+        :param int date_idx: Selected date's row index
+        :param list strategies_marked_to_market: Mark to market change of each strategy for the day
+        :param float marked_to_market: Portfolio's mark to market change for the day
+        """
+        self.state[self.general_pnl_idx][date_idx] = marked_to_market
+        for strategy_details, strategy_marked_to_market in zip(
+            self.strategies_details, strategies_marked_to_market
+        ):
+            self.state[strategy_details["P/L"]][date_idx] = strategy_marked_to_market
+            self.state[strategy_details["Equity"]][date_idx] = (
+                strategy_marked_to_market + self.state[strategy_details["Equity"]][date_idx - 1]
+            )
+
+    def simulate_market(self, date_idx, date, book, marked_to_market):
+        """
+        Execute orders, mark to market and compute margin of a market for the day
+
+        :param int date_idx: Selected date's row index
+        :param datetime.date date: Selected date
+        :param str book: Name of selected market, prefixed by the strategy id with several strategies
+        :param float marked_to_market: Strategy's mark to market change for the day so far
+        :return float: Updated mark to market change for the day
+        """
+        market_start = time.perf_counter() if self.instrumentation.market_timing else None
+
+        # Get indices for accessing DF and contract specifications
+        market_details = self.markets_details[book]
+        market = market_details["market"]
+        order_idx = market_details["order_idx"]
+        contract_idx = market_details["contract_idx"]
+        risk_idx = market_details["risk_idx"]
+        margin_idx = market_details["margin_idx"]
+        pnl_idx = market_details["pnl_idx"]
+        point_value = market_details["point_value"]
+        margin_requirement = market_details["margin_requirement"]
+        market_idx = market_details["market_idx"]
+        book_idx = market_details["book_idx"]
+
+        # Check if there's new position change
+        if self.state[order_idx][date_idx - 1] is not np.NaN and date_idx != 0:
+            order = self.state[order_idx][date_idx - 1]
+            self.new_order(
+                date_idx,
+                contract_idx,
+                risk_idx,
+                pnl_idx,
+                book,
+                order,
+                point_value,
+            )
+
+            # Every order closes the open trade and long / short ones open a new one
+            self.trade_ledger.close(book_idx, date_idx, self.state[pnl_idx][date_idx - 1])
+            if order != "flat":
+                self.trade_ledger.open(
+                    book_idx,
+                    order,
                     date_idx,
-                    order_idx,
-                    contract_idx,
-                    pnl_idx,
-                    point_value,
-                    market,
+                    self.state[contract_idx][date_idx],
+                    self.state[risk_idx][date_idx],
                 )
 
-                # Convert to USD if foreign
-                if self.local_currency:
-                    daily_change = self.convert_to_usd(
-                        "change",
-                        date_idx,
-                        date,
-                        margin_idx,
-                        market,
-                        daily_change,
-                    )
+            if self.cost_model is not None:
+                # Every traded contract pays its costs, closing ones included
+                costs = self.cost_model.costs(
+                    date_idx,
+                    market_idx,
+                    self.state[contract_idx][date_idx] - self.state[contract_idx][date_idx - 1],
+                )
+                marked_to_market -= costs
+                self.state[self.costs_idx][date_idx] += costs
 
-                # Round market daily P/L and add it MTM for the day
-                marked_to_market += round(daily_change, 4)
+            # Commission per roundtrip | We anticipate payment
+            elif self.state[contract_idx][date_idx] != 0:
+                marked_to_market -= self.state[contract_idx][date_idx] * self.commission
 
-                # Compute margins requirement for # of contracts
-                self.data.iat[date_idx, margin_idx] = (
-                    abs(self.data.iat[date_idx, contract_idx]) * margin_requirement
-                )
+        else:
+            # Copy previous day # of contracts
+            self.state[contract_idx][date_idx] = self.state[contract_idx][date_idx - 1]
 
-                # Convert margin to USD if foreign
-                if self.local_currency:
-                    self.convert_to_usd("margin", date_idx, date, margin_idx, market, 0)
+            # Copy previous day Risk
+            self.state[risk_idx][date_idx] = self.state[risk_idx][date_idx - 1]
+
+        # Compute daily change
+        daily_change = self.mark_to_market(
+            date_idx,
+            order_idx,
+            contract_idx,
+            pnl_idx,
+            point_value,
+            market_idx,
+        )
 
-                # Add position margin to total margin requirement for the day
-                self.data.iat[date_idx, self.general_margin_idx] += self.data.iat[
-                    date_idx, margin_idx
-                ]
+        self.trade_ledger.update(book_idx, self.state[pnl_idx][date_idx])
 
-            # Update equity level
-            self.data.iat[date_idx, self.general_equity_idx] = (
-                marked_to_market + self.data.iat[date_idx - 1, self.general_equity_idx]
+        # Convert to USD if foreign
+        if self.local_currency:
+            daily_change = self.convert_to_usd(
+                "change",
+                date_idx,
+                margin_idx,
+                market_idx,
+                daily_change,
             )
 
-            # Set NAV watermark
-            self.data.iat[date_idx, self.watermark_idx] = np.max(
-                self.data.iloc[:date_idx, self.general_equity_idx]
+        # Round market daily P/L and add it MTM for the day
+        marked_to_market += round(daily_change, 4)
+
+        # Compute margins requirement for # of contracts
+        self.state[margin_idx][date_idx] = (
+            abs(self.state[contract_idx][date_idx]) * margin_requirement
+        )
+
+        # Convert margin to USD if foreign
+        if self.local_currency:
+            self.convert_to_usd("margin", date_idx, margin_idx, market_idx, 0)
+
+        # Add position margin to total margin requirement for the day
+        self.state[self.general_margin_idx][date_idx] += self.state[margin_idx][date_idx]
+        if self.multi_strategy:
+            strategy_margin_idx = self.strategies_details[market_details["strategy_idx"]]["Margin"]
+            self.state[strategy_margin_idx][date_idx] += self.state[margin_idx][date_idx]
+
+        if market_start is not None:
+            self.instrumentation.add_market_time(market, time.perf_counter() - market_start)
+
+        return marked_to_market
+
+    def get_market_details(self, market, strategy_idx=0):
+        """
+        Get columns indices and contract specifications of a market traded by a strategy
+
+        :param str market: Name of selected market
+        :param int strategy_idx: Position of the strategy in strategies
+        """
+        market_name = market.split('_')[0]
+        # Get position of selected market contract specifications
+        market_specifications = self.specifications.Symbol.values.astype("str") == market_name
+        strategy_id = self.strategies[strategy_idx]
+        book = book_name(strategy_id, market)
+
+        return {
+            "order_idx": self.data.columns.get_loc(f"{book} Order"),
+            "contract_idx": self.data.columns.get_loc(f"{book} Contracts"),
+            "risk_idx": self.data.columns.get_loc(f"{book} Risk"),
+            "margin_idx": self.data.columns.get_loc(f"{book} Margin"),
+            "pnl_idx": self.data.columns.get_loc(f"{book} P/L"),
+            "market": market,
+            "market_idx": self.markets_list.index(market),
+            "book_idx": self.books.index(book),
+            "strategy": strategy_id,
+            "strategy_idx": strategy_idx,
+            "point_value": self.specifications[market_specifications].Point_Value.values[0],
+            "margin_requirement": self.specifications[market_specifications].Margin.values[0],
+        }
+
+    def get_exchange_rates(self):
+        """
+        Get the currency of each market and its exchange rate on every day
+
+        :return tuple: list of currencies and days x markets array of rates
+        """
+        # Currency is looked up by the full market name
+        market_currencies = [
+            self.specifications.loc[self.specifications.Symbol.astype("str") == market].Currency.values[0]
+            for market in self.markets_list
+        ]
+        exchange_rates = self.calendar.exchange_rates(self.currencies_df, market_currencies, missing=np.NaN)
+        if np.isnan(exchange_rates).any():
+            missing = sorted(
+                {currency for currency, rates in zip(market_currencies, exchange_rates.T) if np.isnan(rates).any()}
             )
+            raise ValueError(
+                f"Missing exchange rates in the {self.calendar.fx_tolerance} before a bar. Currencies: {missing}"
+            )
+        return market_currencies, exchange_rates
 
-            # Remove fees
-            if self.fee and date_idx != 0:
-                self.compute_fees(date_idx, self.watermark_idx, self.general_equity_idx)
+    def get_pending_orders(self):
+        """
+        Map each day to the books executing an order on it. Orders are executed the day after the signal
+        """
+        pending_orders = {}
+        for book_idx, book in enumerate(self.books):
+            orders = self.data.iloc[:, self.markets_details[book]["order_idx"]].values
+            for order_day in [idx for idx, order in enumerate(orders[:-1]) if order is not np.NaN]:
+                pending_orders.setdefault(order_day + 1, []).append(book_idx)
+        return pending_orders
+
+    def copy_market_state(self, book, from_idx, to_idx):
+        """
+        Copy # of contracts, risk and P/L of a market between two days
 
-        return self.data, self.orders_df
+        :param str book: Name of selected market, prefixed by the strategy id with several strategies
+        :param int from_idx: Source row index
+        :param int to_idx: Destination row index
+        """
+        for column_idx in ["contract_idx", "risk_idx", "pnl_idx"]:
+            column_idx = self.markets_details[book][column_idx]
+            self.state[column_idx][to_idx] = self.state[column_idx][from_idx]
+
+    def fill_idle_markets(self, updated):
+        """
+        Forward fill state of the days a market was skipped by the event driven simulation
+
+        :param numpy.ndarray updated: Days x books mask of the simulated market days
+        """
+        for book_idx, book in enumerate(self.books):
+            market_details = self.markets_details[book]
+            for column_idx in ["contract_idx", "risk_idx", "pnl_idx"]:
+                column = self.data.iloc[:, market_details[column_idx]]
+                filled = column.where(updated[:, book_idx]).ffill().fillna(0)
+                self.data.iloc[:, market_details[column_idx]] = filled.astype(column.dtype).values
+
+            # Flat markets need no margin
+            margin = self.data.iloc[:, market_details["margin_idx"]]
+            self.data.iloc[:, market_details["margin_idx"]] = np.where(
+                updated[:, book_idx], margin, 0.0
+            ).astype(margin.dtype)
 
     def new_order(
         self,
@@ -187,7 +565,7 @@ class Backtester:
         contract_idx,
         risk_idx,
         pnl_idx,
-        market,
+        book,
         order,
         point_value,
     ):
@@ -198,32 +576,47 @@ class Backtester:
         :param int contract_idx: Contracts column index
         :param int risk_idx: Risk column index
         :param int pnl_idx: P/L column index
-        :param str market: Name of selected market
+        :param str book: Name of selected market, prefixed by the strategy id with several strategies
         :param str order: Order type i.e. long, short, flat
         :param int point_value: Point value
         """
-
-        # Update # of contracts
-        self.data.iat[date_idx, contract_idx] = get_number_of_contracts(
-            self.data,
-            date_idx,
-            market,
-            order,
-            self.data.iat[date_idx - 1, self.general_equity_idx],
-            point_value,
-            self.position_risk,
-        )
+        market_details = self.markets_details[book]
+        market = market_details["market"]
+
+        # Update # of contracts. Each strategy sizes its positions on its share of the equity
+        updated_equity = self.state[self.general_equity_idx][date_idx - 1]
+        if self.multi_strategy:
+            updated_equity *= self.strategy_weights[market_details["strategy_idx"]]
+        contracts = None
+        if self.position_sizing is not None:
+            contracts = self.position_sizing.contracts(
+                self, date_idx, book, order, updated_equity, point_value
+            )
+        if contracts is None:
+            contracts = get_number_of_contracts(
+                self.data,
+                date_idx,
+                market,
+                order,
+                updated_equity,
+                point_value,
+                self.position_risk,
+                book,
+            )
+        self.state[contract_idx][date_idx] = contracts
 
         # Get index for specified order in orders_df
         order_idx = (self.orders_df["Symbol"] == market) & (
             self.orders_df.Dates == self.data.index[date_idx - 1]
         )
+        if self.multi_strategy:
+            order_idx &= self.orders_df.Strategy == market_details["strategy"]
 
         # Save trade pnl
-        self.orders_df.loc[order_idx, "Pnl"] = self.data.iat[date_idx - 1, pnl_idx]
+        self.orders_df.loc[order_idx, "Pnl"] = self.state[pnl_idx][date_idx - 1]
 
         # Compute starting risk
-        close, support, resistance = get_position_points(self.data, date_idx, market)
+        close, support, resistance = get_position_points(self.data, date_idx, market, book)
         if order:
             if order == "flat":
                 risk_per_contract = 0
@@ -232,11 +625,10 @@ class Backtester:
             elif order == "short":
                 risk_per_contract = resistance - close
             else:
-                self.logger.error("Couldn't recognise order type:", order)
-                sys.exit(1)
+                raise ValueError(f"Couldn't recognise order type: {order}")
             # Save starting risk in orders df
-            self.orders_df.loc[order_idx, "Risk"] = self.data.iat[date_idx, risk_idx] = abs(
-                (self.data.iat[date_idx, contract_idx] * risk_per_contract * point_value)
+            self.orders_df.loc[order_idx, "Risk"] = self.state[risk_idx][date_idx] = abs(
+                (self.state[contract_idx][date_idx] * risk_per_contract * point_value)
             )
 
         return
@@ -248,7 +640,7 @@ class Backtester:
         contract_idx,
         pnl_idx,
         point_value,
-        market,
+        market_idx,
     ):
         """
         Mark to market
@@ -258,76 +650,70 @@ class Backtester:
         :param int contract_idx: Contracts column index
         :param int pnl_idx: P/L column index
         :param int point_value: Point value
-        :param str market: Name of selected market
+        :param int market_idx: Position of the market in markets_list
         """
 
-        # Get Close and Previous Close to mark to market
-        close_prev, close = get_mark_to_market_points(self.data, date_idx, market)
-
-        # Compute daily change
+        # Compute daily change from the change of the close, shared by the strategies
         daily_change = (
-            get_daily_change(close, close_prev)
+            self.price_changes[market_idx][date_idx]
             * point_value
-            * self.data.iat[date_idx, contract_idx]
+            * self.state[contract_idx][date_idx]
         )
 
         # If we closed position initialize P/L
-        if self.data.iat[date_idx - 1, order_idx] == "flat":
-            self.data.iat[date_idx, pnl_idx] = 0
+        if self.state[order_idx][date_idx - 1] == "flat":
+            self.state[pnl_idx][date_idx] = 0
 
-        elif self.data.iat[date_idx - 1, order_idx] is not np.NaN:
-            self.data.iat[date_idx, pnl_idx] = round(daily_change, 4)
+        elif self.state[order_idx][date_idx - 1] is not np.NaN:
+            self.state[pnl_idx][date_idx] = round(daily_change, 4)
 
         # If we are in a position keep adding daily change
         else:
-            self.data.iat[date_idx, pnl_idx] = (
-                round(daily_change, 4) + self.data.iat[date_idx - 1, pnl_idx]
+            self.state[pnl_idx][date_idx] = (
+                round(daily_change, 4) + self.state[pnl_idx][date_idx - 1]
             )
 
         return daily_change
 
-    def convert_to_usd(self, type, date_idx, date, margin_idx, market, daily_change):
+    def convert_to_usd(self, type, date_idx, margin_idx, market_idx, daily_change):
         """
         Convert value to USD
 
         :param str type: Type of value to convert. margin or change
         :param int date_idx: Selected date's row index
-        :param datetime.date date: Selected date
         :param int margin_idx: Margin column index
-        :param str market: Selected market
+        :param int market_idx: Position of the market in markets_list
         :param float daily_change: Daily change
         """
-        # Load exchange rate
-        currency = self.specifications.loc[self.specifications.Symbol.astype("str") == market]
-        currency = currency.Currency.values[0]
-        rate = get_currency_rate(self.currencies_df, currency, date)
+        # Exchange rate rounded to 6 decimals
+        currency = self.market_currencies[market_idx]
+        rate = self.exchange_rates[date_idx, market_idx]
         if type == "margin":
             if currency != "USD":
-                self.data.iat[date_idx, margin_idx] *= round(rate, 6)
+                self.state[margin_idx][date_idx] *= rate
             return
 
         elif type == "change":
             if currency != "USD" and daily_change != 0:
-                daily_change = daily_change * round(rate, 6)
+                daily_change = daily_change * rate
             return daily_change
 
         else:
-            self.logger.error(f"Error emerged when converting to USD. Type: {type}")
-            sys.exit(1)
+            raise ValueError(f"Error emerged when converting to USD. Type: {type}")
 
     def compute_fees(self, date_idx, watermark_idx, general_equity_idx):
         """
-        Compute management and incentive fees
+        Compute management and incentive fees. The management fee accrues over the days of the bar
 
         :param int date_idx: Selected date's row index
         :param int watermark_idx: Watermark column index
         :param int general_equity_idx: Equity column index
         """
         profit = max(
-            0, self.data.iat[date_idx, general_equity_idx] - self.data.iat[date_idx, watermark_idx]
+            0, self.state[general_equity_idx][date_idx] - self.state[watermark_idx][date_idx]
         )
-        self.data.iat[date_idx, general_equity_idx] -= (
-            self.data.iat[date_idx, general_equity_idx] * self.fee_structure[0] / 365
+        self.state[general_equity_idx][date_idx] -= (
+            self.state[general_equity_idx][date_idx] * self.fee_structure[0] * self.fee_days[date_idx] / 365
             + profit * self.fee_structure[1]
         )
         return
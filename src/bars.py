@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from src.position_builders import get_exchange_rates, get_price_changes
+
+DAILY = "daily"
+
+
+def get_price_changes_by_time(close, dates, max_gap):
+    """
+    Change of each bar from the last close within max_gap before it
+
+    :param numpy.ndarray close: Closes of a market, NaN where it didn't trade
+    :param pandas.DatetimeIndex dates: Timestamps of the bars
+    :param pandas.Timedelta max_gap: Longest time between two closes giving a change
+    :return numpy.ndarray: Changes in points. 0 without close or previous close
+    """
+    rows = np.arange(len(close))
+    last_row = np.maximum.accumulate(np.where(np.isnan(close), -1, rows))
+    previous_row = np.r_[-1, last_row[:-1]]
+    times = dates.asi8
+    valid = previous_row >= 0
+    previous_row = np.maximum(previous_row, 0)
+    valid &= times - times[previous_row] <= max_gap.value
+    price_changes = np.where(valid, close - close[previous_row], 0.0)
+    price_changes[np.isnan(price_changes)] = 0
+    return price_changes
+
+
+class BarCalendar:
+    """
+    Class used to handle the timing of the bars of the backtesting dataframe
+
+    Daily bars keep the row based conventions: the management fee accrues 1/365 per row and the daily
+    change is taken from the last close in the previous 9 rows. Intraday bars accrue the fee by elapsed
+    time and take the change from the last close within max_gap, so overnight and weekend gaps are
+    measured in time rather than rows. Exchange rates are looked up as of each bar in both cases
+    """
+
+    def __init__(self, dates, frequency=DAILY, max_gap="9D", fx_tolerance="9D"):
+        """
+        :param pandas.DatetimeIndex dates: Timestamps of the bars, sorted
+        :param str frequency: "daily" or a pandas frequency of intraday bars, e.g. "1min" or "1h"
+        :param str max_gap: Longest time between two closes of a market giving an intraday change
+        :param str fx_tolerance: Maximum age of the exchange rate of a bar
+        """
+        self.dates = pd.DatetimeIndex(dates)
+        self.frequency = frequency
+        self.intraday = frequency != DAILY
+        if self.intraday and pd.Timedelta(pd.tseries.frequencies.to_offset(frequency)) >= pd.Timedelta(days=1):
+            raise ValueError(f"Intraday bar frequency has to be shorter than a day: {frequency}")
+        self.max_gap = pd.Timedelta(max_gap)
+        self.fx_tolerance = pd.Timedelta(fx_tolerance)
+
+    def fee_days(self):
+        """Return the days of management fee accrued by each bar. 1 per daily bar"""
+        if not self.intraday:
+            return np.ones(len(self.dates))
+        elapsed = np.diff(self.dates.asi8, prepend=self.dates.asi8[:1])
+        return elapsed / pd.Timedelta(days=1).value
+
+    def price_changes(self, close):
+        """Return the change of each bar of a market in points, see get_price_changes"""
+        if not self.intraday:
+            return get_price_changes(close)
+        return get_price_changes_by_time(close, self.dates, self.max_gap)
+
+    def exchange_rates(self, currencies_df, currencies, missing=1.0):
+        """Return the exchange rate of each market's currency as of each bar, see get_exchange_rates"""
+        return get_exchange_rates(currencies_df, currencies, self.dates, missing, self.fx_tolerance)
+
+    def day_ends(self):
+        """Return the mask of the last bar of each day. Every daily bar is one"""
+        if not self.intraday:
+            return np.ones(len(self.dates), dtype=bool)
+        days = self.dates.normalize().asi8
+        return np.r_[days[1:] != days[:-1], True]
+
+    def daily(self, frame):
+        """Return the last value of each day of a frame indexed by the bars. Daily frames are returned as they are"""
+        if not self.intraday:
+            return frame
+        return frame.groupby(self.dates.normalize()).last()
+
+    def on_bars(self, daily_frame):
+        """Return a frame indexed by day on the bars of each day. Daily frames are returned as they are"""
+        if not self.intraday:
+            return daily_frame
+        return daily_frame.reindex(self.dates.normalize()).set_axis(self.dates)
+
+
+def daily_bars(portfolio):
+    """Function to keep the last bar of each day of an intraday portfolio. Daily ones are returned as they are"""
+    if (portfolio.index == portfolio.index.normalize()).all():
+        return portfolio
+    return portfolio.groupby(portfolio.index.normalize()).last()
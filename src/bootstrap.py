@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+
+def trade_indices(n_trades, n_resamples, rng):
+    """Function to draw trades with replacement. One row of indices per resample"""
+    return rng.integers(0, n_trades, size=(n_resamples, n_trades))
+
+
+def stationary_block_indices(n_days, n_resamples, mean_block, rng):
+    """
+    Draw days with the stationary bootstrap of Politis and Romano
+
+    Blocks start at random days and have geometric lengths of mean mean_block. Blocks wrap around
+    the end of the series. Only block starts get a random first index and the indices are built in
+    place, so memory stays close to the size of the index matrix
+
+    :return numpy.ndarray: n_resamples x n_days indices
+    """
+    # Temporaries are made an eighth of the resamples at a time. Uniform floats take 8 times the memory of flags
+    rows = -(-n_resamples // 8)
+    slices = [slice(row, row + rows) for row in range(0, n_resamples, rows)]
+    new_block = np.empty((n_resamples, n_days), dtype=bool)
+    for rows_slice in slices:
+        new_block[rows_slice] = rng.random(new_block[rows_slice].shape) < 1 / mean_block
+    new_block[:, 0] = True
+    # Shift from the first day of each block to its random first index
+    block_days = np.flatnonzero(new_block) % n_days
+    block_shifts = rng.integers(0, n_days, size=len(block_days)) - block_days
+    # Block of each day, numbered across the resamples, then its index
+    indices = new_block.ravel().astype(np.int64)
+    del new_block
+    np.cumsum(indices, out=indices)
+    indices = indices.reshape(n_resamples, n_days)
+    indices -= 1
+    for rows_slice in slices:
+        indices[rows_slice] = block_shifts[indices[rows_slice]]
+    indices += np.arange(n_days)
+    indices %= n_days
+    return indices
+
+
+def trade_metrics(pnl, r_return):
+    """
+    Compute trade metrics of each resample
+
+    :param numpy.ndarray pnl: resamples x trades P/L
+    :param numpy.ndarray r_return: resamples x trades R returns
+    :return dict: Metric -> array with a value per resample
+    """
+    wins = pnl >= 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        profit_factor = np.where(wins, pnl, 0).sum(axis=1) / np.abs(np.where(wins, 0, pnl).sum(axis=1))
+    return {
+        "win_rate": wins.mean(axis=1),
+        "profit_factor": profit_factor,
+        "avg_return": r_return.mean(axis=1),
+    }
+
+
+def return_metrics(returns, periods=252):
+    """
+    Compute portfolio metrics of each resample, like empyrical
+
+    :param numpy.ndarray returns: resamples x days daily returns
+    :return dict: Metric -> array with a value per resample
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe_ratio = returns.mean(axis=1) / returns.std(axis=1, ddof=1) * np.sqrt(periods)
+        cagr = np.prod(1 + returns, axis=1) ** (periods / returns.shape[1]) - 1
+    return {"sharpe_ratio": sharpe_ratio, "cagr": cagr}
+
+
+def resample_metrics(metrics_function, samples, draw_indices, n_resamples, chunk_size):
+    """
+    Compute metrics of all resamples, chunk_size resamples at a time
+
+    :param function metrics_function: Takes resamples x observations arrays, one per sample
+    :param list samples: 1d arrays resampled with the same indices
+    :param function draw_indices: Number of resamples -> resamples x observations indices
+    :return dict: Metric -> array with a value per resample
+    """
+    chunks = []
+    for chunk_start in range(0, n_resamples, chunk_size):
+        indices = draw_indices(min(chunk_size, n_resamples - chunk_start))
+        chunks.append(metrics_function(*[sample[indices] for sample in samples]))
+    return {metric: np.concatenate([chunk[metric] for chunk in chunks]) for metric in chunks[0]}
+
+
+def confidence_intervals(
+    trades=None,
+    returns=None,
+    n_resamples=5000,
+    confidence=0.95,
+    mean_block=None,
+    max_elements=10_000_000,
+    seed=0,
+):
+    """
+    Bootstrap confidence intervals of trade and portfolio metrics
+
+    Trades are resampled independently, daily returns with the stationary block bootstrap.
+    Resamples are drawn as index matrices and the metrics computed on whole chunks at once
+
+    :param pandas.DataFrame trades: Trades with Pnl and R_return columns
+    :param pandas.Series returns: Daily returns of the portfolio
+    :param int n_resamples: Number of resamples
+    :param float confidence: Confidence level of the intervals
+    :param float mean_block: Mean block length in days. None uses the cube root of the # of days
+    :param int max_elements: Maximum size of the index matrix of a chunk, to bound memory
+    :param int seed: Seed of the random generator
+    :return pandas.DataFrame: estimate, lower and upper bound of each metric
+    """
+    rng = np.random.default_rng(seed)
+    tail = (1 - confidence) / 2
+    rows = {}
+
+    def add_intervals(estimates, resampled):
+        for metric, values in resampled.items():
+            lower, upper = np.nanquantile(values, [tail, 1 - tail])
+            rows[metric] = {"estimate": estimates[metric][0], "lower": lower, "upper": upper}
+
+    if trades is not None and len(trades) > 1:
+        pnl, r_return = trades.Pnl.to_numpy(float), trades.R_return.to_numpy(float)
+        add_intervals(
+            trade_metrics(pnl[None, :], r_return[None, :]),
+            resample_metrics(
+                trade_metrics,
+                [pnl, r_return],
+                lambda size: trade_indices(len(pnl), size, rng),
+                n_resamples,
+                max(1, max_elements // len(pnl)),
+            ),
+        )
+
+    if returns is not None:
+        returns = returns.dropna().to_numpy(float)
+        if len(returns) > 1:
+            mean_block = mean_block or max(1.0, round(len(returns) ** (1 / 3)))
+            add_intervals(
+                return_metrics(returns[None, :]),
+                resample_metrics(
+                    return_metrics,
+                    [returns],
+                    lambda size: stationary_block_indices(len(returns), size, mean_block, rng),
+                    n_resamples,
+                    max(1, max_elements // len(returns)),
+                ),
+            )
+
+    return pd.DataFrame.from_dict(rows, orient="index", columns=["estimate", "lower", "upper"])
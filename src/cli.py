@@ -0,0 +1,278 @@
+"""
+Command line entry point
+
+    python -m src backtest [config.json]
+    python -m src analyze [config.json] [--plot]
+    python -m src walk-forward [config.json]
+    python -m src screen [config.json]
+    python -m src sweep submit|worker|status|results [config.json]
+
+Heavy modules are imported by the commands, so --help and worker processes start quickly.
+"""
+import argparse
+import logging
+import sys
+
+
+def setup_logger():
+    """Function to log to the console"""
+    root_logger = logging.getLogger()
+    logger_handler = logging.StreamHandler()
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(module)s - %(message)s")
+    logger_handler.setFormatter(formatter)
+    root_logger.addHandler(logger_handler)
+    root_logger.setLevel(logging.INFO)
+
+
+def backtest(config):
+    from contextlib import ExitStack
+
+    from src.instrumentation import Instrumentation, profile
+    from src.pipeline import export_results, run_backtest
+
+    instrumentation = Instrumentation(trace_memory=config["trace_memory"], market_timing=config["market_timing"])
+    with ExitStack() as run_profile:
+        if config["profiler"]:
+            run_profile.enter_context(profile(config["profile_output"], config["profiler"]))
+        results = run_backtest(config, instrumentation)
+        export_results(results, config, instrumentation)
+
+    if config["results_store"]["folder"]:
+        from src.results_store import ResultsStore, run_metrics
+
+        run_id = ResultsStore(config["results_store"]["folder"]).append(
+            config["results_store"]["experiment"],
+            [
+                {
+                    "config": config,
+                    "parameters": config["strategy_parameters"],
+                    "metrics": run_metrics(results["portfolio"]),
+                    "equity": results["portfolio"].Equity,
+                    "trade_ledger": results["trade_ledger"],
+                }
+            ],
+        )[0]
+        logging.getLogger(__name__).info(f"Run {run_id} added to the results store")
+
+    if config["run_report"]:
+        instrumentation.to_json(config["run_report"])
+    return results
+
+
+def analyze(config, plot=False):
+    from src.analysis import analyze as analyze_results
+    from src.analysis import plot_report, print_report
+    from src.pipeline import load_results
+
+    results = load_results(config, with_benchmark=True)
+    bootstrap = config["bootstrap"] if config["bootstrap"]["n_resamples"] else None
+    analysis = analyze_results(results, results["benchmark"], bootstrap, config["rolling_windows"])
+    analysis["trades"].to_excel(config["trades_output"])
+    print_report(analysis)
+    if plot:
+        plot_report(analysis, results["portfolio"])
+    return analysis
+
+
+def load_sweep_inputs(config):
+    """Function to load the markets data and the engine settings shared by the parameter sweeps"""
+    from src.instrumentation import Instrumentation
+    from src.pipeline import get_markets_list, load_currencies, load_markets_data
+    from src.costs import make_cost_model
+    from src.position_sizing import make_position_sizing
+
+    markets_list = get_markets_list(config)
+    markets_data = load_markets_data(config, markets_list)
+    currencies_df = (
+        load_currencies(config, Instrumentation(enabled=False)) if config["local_currency"] else None
+    )
+
+    settings = {
+        "initial_equity": config["initial_equity"],
+        "position_risk": config["position_risk"],
+        "markets_list": markets_list,
+        "local_currency": config["local_currency"],
+        "currencies_df": currencies_df,
+        "commission": config["commission"],
+        "fee": config["fee"],
+        "fee_structure": config["fee_structure"],
+        "event_driven": config["event_driven"],
+        "compact": config["compact_panel"],
+        "position_sizing": make_position_sizing(config["position_sizing"]),
+        "bar_frequency": config["bars"]["frequency"],
+        "max_gap": config["bars"]["max_gap"],
+        "fx_tolerance": config["bars"]["fx_tolerance"],
+        "cost_model": make_cost_model(config["costs"], config["commission"]),
+    }
+    return markets_data, settings
+
+
+def walk_forward(config):
+    import pandas as pd
+
+    from src.indicator_cache import make_indicator_cache
+    from src.stop_criteria import make_stop_criteria
+    from src.walk_forward import WalkForward
+
+    markets_data, settings = load_sweep_inputs(config)
+    walk_forward_config = config["walk_forward"]
+    summary, in_sample_scores, equity = WalkForward(
+        markets_data,
+        walk_forward_config["parameter_grid"],
+        settings,
+        train_years=walk_forward_config["train_years"],
+        test_years=walk_forward_config["test_years"],
+        anchored=walk_forward_config["anchored"],
+        workers=walk_forward_config["workers"],
+        stop_criteria=make_stop_criteria(config["stop_criteria"]),
+        cache=make_indicator_cache(config["indicator_cache"]),
+    ).run()
+
+    with pd.ExcelWriter(walk_forward_config["output"]) as writer:
+        summary.to_excel(writer, sheet_name="folds", index=False)
+        in_sample_scores.to_excel(writer, sheet_name="in_sample_scores")
+        equity.to_excel(writer, sheet_name="out_of_sample_equity")
+    print(summary.to_string())
+    return summary, in_sample_scores, equity
+
+
+def screen(config):
+    from src.indicator_cache import make_indicator_cache
+    from src.pipeline import load_specifications
+    from src.screening import screen_parameters
+
+    markets_data, settings = load_sweep_inputs(config)
+    settings["specifications"] = load_specifications(config)
+
+    screening_config = config["screening"]
+    ranking = screen_parameters(
+        markets_data,
+        screening_config["parameter_grid"],
+        settings,
+        sizing=screening_config["sizing"],
+        top=screening_config["top"],
+        cache=make_indicator_cache(config["indicator_cache"]),
+    )
+    ranking.to_excel(screening_config["output"], index=False)
+    print(ranking.to_string(index=False))
+    return ranking
+
+
+def sweep(config, action):
+    from src import work_queue
+
+    sweep_config = config["sweep"]
+    folder = sweep_config["folder"]
+
+    if action == "submit":
+        from src.pipeline import load_specifications
+        from src.stop_criteria import make_stop_criteria
+
+        markets_data, settings = load_sweep_inputs(config)
+        # Workers on other hosts get everything they need from the snapshot
+        settings["specifications"] = load_specifications(config)
+        settings["stop_criteria"] = make_stop_criteria(config["stop_criteria"])
+        work_queue.submit_sweep(folder, markets_data, sweep_config["parameter_grid"], settings)
+
+    elif action == "worker":
+        worker_kwargs = {
+            "lease_seconds": sweep_config["lease_seconds"],
+            "max_attempts": sweep_config["max_attempts"],
+            "poll_seconds": sweep_config["poll_seconds"],
+            "store_folder": config["results_store"]["folder"],
+            "experiment": config["results_store"]["experiment"],
+        }
+        if sweep_config["local_workers"] > 1:
+            work_queue.run_local_workers(folder, sweep_config["local_workers"], **worker_kwargs)
+        else:
+            work_queue.run_worker(folder, **worker_kwargs)
+
+    elif action == "results":
+        results = work_queue.sweep_results(folder)
+        results.to_excel(sweep_config["output"], index=False)
+        print(results.to_string(index=False))
+
+    print(work_queue.sweep_progress(folder))
+
+
+def store(config, action):
+    from src.results_store import ResultsStore
+
+    store_config = config["results_store"]
+    if not store_config["folder"]:
+        raise ValueError("Set results_store.folder to use the results store")
+    results_store = ResultsStore(store_config["folder"])
+
+    if action == "list":
+        print(results_store.experiments().to_string())
+    elif action == "top":
+        top = results_store.top(store_config["metric"], store_config["top"], store_config["experiment"])
+        print(top.drop(columns="config").to_string(index=False))
+    elif action == "compact":
+        results_store.compact(store_config["experiment"])
+        print(results_store.experiments().to_string())
+    elif action == "plot":
+        from matplotlib import pyplot as plt
+
+        from src.plotting import plot_fan, plot_line
+
+        # Every run of the experiment as a band, the best ones as lines
+        run_ids = results_store.runs(store_config["experiment"], columns=[])["run_id"]
+        curves = results_store.equity_curves(run_ids, store_config["experiment"])
+        curves = curves / curves.bfill().iloc[0]
+        top = results_store.top(store_config["metric"], store_config["top"], store_config["experiment"])
+        _, ax = plt.subplots(1, 1)
+        plot_fan(ax, curves)
+        for run_id in top.run_id:
+            plot_line(ax, curves[run_id], linewidth=0.8)
+        ax.set_ylabel("Return")
+        ax.set_title(f"{store_config['experiment']}: {len(run_ids)} runs")
+        ax.legend(loc="upper left")
+        plt.show()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src", description="Futures backtester")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, help_text in [
+        ("backtest", "Generate orders, simulate them and save the summaries"),
+        ("analyze", "Compute statistics of the saved summaries"),
+        ("walk-forward", "Rolling parameter optimization and out-of-sample evaluation"),
+        ("screen", "Rank parameter sets with the fast approximate simulation"),
+        ("sweep", "Parameter sweep through a work queue shared by worker processes"),
+        ("store", "List, rank, plot or compact the runs kept in the results store"),
+    ]:
+        subparser = subparsers.add_parser(command, help=help_text)
+        if command == "sweep":
+            subparser.add_argument("action", choices=["submit", "worker", "status", "results"])
+        if command == "store":
+            subparser.add_argument("action", choices=["list", "top", "plot", "compact"])
+        subparser.add_argument("config", nargs="?", help="json file overriding the default settings")
+        if command == "analyze":
+            subparser.add_argument("--plot", action="store_true", help="Plot equity and drawdown")
+
+    args = parser.parse_args(argv)
+
+    from src.config import load_config
+
+    config = load_config(args.config)
+    setup_logger()
+
+    if args.command == "backtest":
+        backtest(config)
+    elif args.command == "analyze":
+        analyze(config, args.plot)
+    elif args.command == "walk-forward":
+        walk_forward(config)
+    elif args.command == "screen":
+        screen(config)
+    elif args.command == "sweep":
+        sweep(config, args.action)
+    elif args.command == "store":
+        store(config, args.action)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import numpy as np
+
+from src.panel import book_name
+
+# Dtype of each market column in the compact panel.
+# Margin, Risk and P/L are amounts of money written by the engine at float64 precision
+COMPACT_DTYPES = {
+    "Close": "float32",
+    "Resistance": "float32",
+    "Support": "float32",
+    "Contracts": "int32",
+    "Margin": "float64",
+    "Risk": "float64",
+    "P/L": "float64",
+}
+
+
+def memory_usage_mb(df):
+    """Return memory used by a dataframe in MB, including the strings of object columns"""
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def compact_panel(all_markets_df, markets_list, strategies=None):
+    """
+    Convert the markets columns of the backtesting dataframe to compact dtypes
+
+    Orders become categorical, contracts int32 and price levels float32.
+    Money columns keep float64
+
+    :param pandas.DataFrame all_markets_df: df including historical data
+    :param list markets_list: List of all available markets
+    :param list strategies: Strategy ids of a multi strategy panel. None for a single strategy
+    :return tuple: compact df and dict with memory before and after the conversion
+    """
+    dtypes = {}
+    for market in markets_list:
+        dtypes[f"{market} Close"] = COMPACT_DTYPES["Close"]
+        for strategy_id in strategies or [None]:
+            book = book_name(strategy_id, market)
+            # Categories are inferred, so unknown order types are kept
+            dtypes[f"{book} Order"] = "category"
+            for column, dtype in COMPACT_DTYPES.items():
+                if column != "Close":
+                    dtypes[f"{book} {column}"] = dtype
+
+    compact_df = all_markets_df.astype(dtypes)
+
+    original_mb, compact_mb = memory_usage_mb(all_markets_df), memory_usage_mb(compact_df)
+    return compact_df, {
+        "original_mb": original_mb,
+        "compact_mb": compact_mb,
+        "saved_mb": original_mb - compact_mb,
+        "saved_pct": 1 - compact_mb / original_mb if original_mb else 0.0,
+    }
+
+
+def precision_drift(reference_df, compact_df, markets_list):
+    """
+    Compare a compact run with the full precision one
+
+    :param pandas.DataFrame reference_df: Simulated df of the full precision run
+    :param pandas.DataFrame compact_df: Simulated df of the compact run
+    :param list markets_list: List of all available markets, or books with several strategies
+    :return dict: Equity and margin drift and number of days with a different # of contracts
+    """
+    equity_drift = (compact_df.Equity - reference_df.Equity).abs()
+    contracts_columns = [f"{market} Contracts" for market in markets_list]
+    return {
+        "max_abs_equity_drift": equity_drift.max(),
+        "max_rel_equity_drift": (equity_drift / reference_df.Equity.abs()).max(),
+        "final_equity_drift": compact_df.Equity.iloc[-1] - reference_df.Equity.iloc[-1],
+        "max_abs_margin_drift": (compact_df.Margin - reference_df.Margin).abs().max(),
+        "contracts_mismatches": int(
+            np.sum(
+                compact_df[contracts_columns].values != reference_df[contracts_columns].values
+            )
+        ),
+    }
@@ -0,0 +1,164 @@
+import copy
+import json
+
+DEFAULT_CONFIG = {
+    ##### Data #####
+    "data_folder": "data",
+    "historical_data_folder": "historical_data",
+    # Investment universe -> [] = All contracts in the folder
+    "selected_markets": [],
+    # Currency choice.
+    # Set True if you want to use local currency for signals and convert daily change to USD
+    # Set False if you use data already converted in USD
+    "local_currency": True,
+    # Date settings
+    "starting_date": "1999-01-01",
+    "ending_date": "2051-01-01",
+    # Files are read concurrently by "workers" threads or processes ("executor": "thread" or "process").
+    # Threads suit network mounted folders, processes parsing bound loads. workers 1 reads them in turn
+    "loading": {"workers": 8, "executor": "thread"},
+    ##### Portfolio configuration #####
+    "position_risk": 0.005,
+    "initial_equity": 100000000,
+    # Fee / commission configuration
+    # fee_structure [Mgmt fee, performance fee]
+    "fee": True,
+    "fee_structure": [0.02, 0.2],
+    "commission": 10,
+    # Transaction costs. method -> "flat" charges commission * 2 per contract when a position is opened.
+    # "model" charges every traded contract, closing ones included, the Commission per side of
+    # contracts_details.xlsx (commission if missing), slippage_ticks times its Tick_Size and an impact of
+    # impact times the EWMA volatility (halflife in days) of its returns times its notional
+    "costs": {"method": "flat", "slippage_ticks": 1, "impact": 0.1, "halflife": 20},
+    # Position sizing. method -> "breakout" risks position_risk of the equity on the distance to
+    # support / resistance. "volatility" targets target_volatility for the portfolio from an EWMA
+    # covariance of the markets' returns (halflife in days), with the markets' share of the target
+    # scaled by their diversification up to max_multiplier. Markets with fewer than min_periods
+    # returns are sized by breakout
+    "position_sizing": {
+        "method": "breakout",
+        "target_volatility": 0.2,
+        "halflife": 60,
+        "min_periods": 60,
+        "max_multiplier": 2.5,
+    },
+    ##### Strategy #####
+    # Keyword arguments of strategy.compute_indicators. Missing ones use the defaults
+    "strategy_parameters": {},
+    # Several strategies simulated together on the same data, sharing equity and margin.
+    # Strategy id -> {"parameters": compute_indicators keyword arguments, "weight": share of the equity
+    # sizing its positions (equal shares if missing)}. Empty simulates strategy_parameters alone
+    "strategies": {},
+    # Indicators are memoized by market, indicator, window and prices hash.
+    # folder -> None keeps them in memory only, a path also stores them on disk for later runs
+    "indicator_cache": {"enabled": True, "folder": None, "max_entries": 256},
+    ##### Engine #####
+    # Set True to simulate each day only markets with an open position or an order to execute.
+    # Results are the same of the full simulation
+    "event_driven": False,
+    # Set True to store the panel with compact dtypes (categorical orders, int32 contracts,
+    # float32 price levels). compact_drift_check also runs the full precision simulation
+    # and logs the difference
+    "compact_panel": False,
+    "compact_drift_check": False,
+    # Bar frequency of the data. "daily" accrues the management fee 1/365 per bar. Intraday bars ("1min",
+    # "1h", ...) accrue it by elapsed time, take the change of a bar from the last close within max_gap
+    # and the exchange rate from the last one within fx_tolerance. Indicator windows count bars. Volatility
+    # targeting, cost model impact, reports and the walk forward / screening Sharpe ratios resample them to daily
+    "bars": {"frequency": "daily", "max_gap": "9D", "fx_tolerance": "9D"},
+    # Rules ending a run early, e.g. bad parameter sets of a sweep. None disables a rule.
+    # max_drawdown and max_margin_to_equity are fractions, equity_floor is an equity level
+    "stop_criteria": {
+        "max_drawdown": None,
+        "max_margin_to_equity": None,
+        "equity_floor": None,
+        "min_trades_per_year": None,
+        "max_trades_per_year": None,
+    },
+    ##### Instrumentation #####
+    # Stage timings are saved as json in run_report. Set trace_memory to record peak memory (slower)
+    # and market_timing to time the engine on each market (a timer per market and day, slower)
+    # profiler -> None, "cprofile" or "pyinstrument". Output is saved in profile_output
+    "run_report": "run_report.json",
+    "trace_memory": False,
+    "market_timing": False,
+    "profiler": None,
+    "profile_output": "backtest.prof",
+    "show_progress": True,
+    ##### Outputs #####
+    "orders_output": "orders_summary.xlsx",
+    "portfolio_output": "portfolio_summary.xlsx",
+    "trades_output": "ordini.xlsx",
+    "ledger_output": "trade_ledger.xlsx",
+    "validation_output": "validation_report.xlsx",
+    ##### Analysis #####
+    # Benchmark file in data/index
+    "benchmark": "SPX",
+    # Windows in days of the rolling alpha, beta, correlation and residual volatility on the benchmark
+    "rolling_windows": [63, 126, 252, 504],
+    # Bootstrap confidence intervals of the report. n_resamples 0 skips them.
+    # mean_block is the mean block length in days of the returns' resamples (None -> cube root of # of days)
+    "bootstrap": {"n_resamples": 5000, "confidence": 0.95, "mean_block": None, "seed": 0},
+    ##### Walk forward #####
+    "walk_forward": {
+        "parameter_grid": {"breakout": [50, 100, 150], "exit_breakout": [25, 50]},
+        "train_years": 5,
+        "test_years": 1,
+        "anchored": False,
+        "workers": None,
+        "output": "walk_forward.xlsx",
+    },
+    ##### Sweep #####
+    # Work queue and data snapshots live in folder, which every worker host has to see.
+    # Tasks without heartbeat for lease_seconds are run again, up to max_attempts times.
+    # Workers wait poll_seconds while others run the last tasks (None to exit at once)
+    "sweep": {
+        "folder": "sweep",
+        "parameter_grid": {"breakout": [50, 100, 150], "exit_breakout": [25, 50]},
+        "local_workers": 1,
+        "lease_seconds": 600,
+        "max_attempts": 3,
+        "poll_seconds": 10,
+        "output": "sweep.xlsx",
+    },
+    ##### Results store #####
+    # Parquet store keeping config, metrics, equity curve and trade ledger of every run by experiment.
+    # folder -> None disables it. backtest and sweep workers append their runs. "store top" ranks the
+    # runs of the experiment by metric
+    "results_store": {"folder": None, "experiment": "default", "metric": "sharpe_ratio", "top": 10},
+    ##### Screening #####
+    # Parameter sets are ranked with the vectorized approximate simulation and the best "top"
+    # ones are re-run with the engine. sizing -> "fixed" (initial equity) or "trade_start"
+    "screening": {
+        "parameter_grid": {"breakout": [50, 100, 150], "exit_breakout": [25, 50]},
+        "sizing": "trade_start",
+        "top": 5,
+        "output": "screening.xlsx",
+    },
+}
+
+
+def load_config(config=None):
+    """
+    Merge a configuration with the defaults
+
+    :param config: None, path to a json file or dict with the settings to override
+    :return dict: Full configuration
+    """
+    if config is None:
+        config = {}
+    elif isinstance(config, str):
+        with open(config) as file:
+            config = json.load(file)
+
+    unknown_settings = set(config) - set(DEFAULT_CONFIG)
+    if unknown_settings:
+        raise ValueError(f"Unknown settings in configuration: {sorted(unknown_settings)}")
+
+    full_config = copy.deepcopy(DEFAULT_CONFIG)
+    for setting, value in config.items():
+        if isinstance(value, dict) and isinstance(full_config[setting], dict):
+            full_config[setting].update(value)
+        else:
+            full_config[setting] = value
+    return full_config
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+# Columns of contracts_details.xlsx. Cost columns are optional
+SPECIFICATION_COLUMNS = ["Symbol", "Currency", "Point_Value", "Margin"]
+COST_COLUMNS = ["Commission", "Tick_Size"]
+
+
+class CostModel:
+    """
+    Class used to charge transaction costs on every traded contract
+
+    Cost of a contract traded on a day = commission + slippage_ticks * tick size * point value
+    + impact * volatility of the market's daily returns * close * point value.
+    The cost of a contract on every day and market is computed at once before the simulation, so the
+    engine only looks it up for the contracts an order trades: opened, resized or closed to flat
+    """
+
+    def __init__(self, commission=10, slippage_ticks=1, impact=0.1, halflife=20):
+        """
+        :param float commission: Commission in USD per contract and side of markets without one in the specifications
+        :param float slippage_ticks: Ticks lost per contract. Markets without tick size have no slippage
+        :param float impact: Fraction of a daily standard deviation of the notional lost per contract
+        :param float halflife: Half life in days of the EWMA volatility of the returns
+        """
+        self.commission = commission
+        self.slippage_ticks = slippage_ticks
+        self.impact = impact
+        self.halflife = halflife
+        self.unit_costs = None
+
+    def start(self, backtester):
+        """
+        Compute the cost in USD of a contract of each market on every day
+
+        Volatility is known at the previous close, as orders are executed the day after the signal.
+        It is computed on the last close of each day, so intraday bars use the previous day's volatility
+        and the half life stays in days
+
+        :param Backtester backtester: Simulation being run
+        """
+        specifications = backtester.specifications.assign(Symbol=backtester.specifications.Symbol.astype("str"))
+        specifications = specifications.drop_duplicates("Symbol").set_index("Symbol")
+        market_names = [market.split("_")[0] for market in backtester.markets_list]
+        point_value = specifications.loc[market_names, "Point_Value"].to_numpy(float)
+        commission = (
+            specifications.loc[market_names, "Commission"].fillna(self.commission).to_numpy(float)
+            if "Commission" in specifications
+            else np.full(len(market_names), float(self.commission))
+        )
+        tick_size = (
+            specifications.loc[market_names, "Tick_Size"].fillna(0).to_numpy(float)
+            if "Tick_Size" in specifications
+            else np.zeros(len(market_names))
+        )
+
+        calendar = backtester.calendar
+        close = backtester.data[[f"{market} Close" for market in backtester.markets_list]].astype(float)
+        close = close.ffill(limit=8)
+        daily_close = calendar.daily(close)
+        returns = (daily_close / daily_close.shift(1) - 1).replace([np.inf, -np.inf], np.NaN)
+        volatility = returns.ewm(halflife=self.halflife, ignore_na=True).std().shift(1)
+        volatility = calendar.on_bars(volatility).to_numpy()
+
+        # Slippage and impact are in the market's currency, commissions in USD
+        local_costs = (
+            self.slippage_ticks * tick_size + self.impact * np.nan_to_num(volatility * close.to_numpy())
+        ) * point_value
+        if backtester.local_currency:
+            local_costs = local_costs * backtester.exchange_rates
+        self.unit_costs = commission + local_costs
+
+    def costs(self, date_idx, market_idx, traded_contracts):
+        """Return the cost in USD of the contracts traded in a market on a day"""
+        return abs(traded_contracts) * self.unit_costs[date_idx, market_idx]
+
+
+def make_cost_model(settings, commission):
+    """
+    Build the cost model from the costs settings
+
+    :param dict settings: method ("flat" or "model"), slippage_ticks, impact and halflife
+    :param float commission: Commission per contract and side of markets without one in the specifications
+    :return CostModel: None for the flat commission
+    """
+    if settings.get("method", "flat") == "flat":
+        return None
+    if settings["method"] == "model":
+        return CostModel(
+            commission,
+            settings.get("slippage_ticks", 1),
+            settings.get("impact", 0.1),
+            settings.get("halflife", 20),
+        )
+    raise ValueError(f"Unknown cost method: {settings['method']}")
+
+
+def read_specifications(path):
+    """Function to read contracts_details.xlsx with the cost columns it has"""
+    return pd.read_excel(path, usecols=lambda column: column in SPECIFICATION_COLUMNS + COST_COLUMNS)
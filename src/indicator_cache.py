@@ -0,0 +1,138 @@
+import hashlib
+import inspect
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+def series_hash(data):
+    """Function to hash values and dates of a price series"""
+    return hashlib.sha1(pd.util.hash_pandas_object(data, index=True).values).hexdigest()
+
+
+@lru_cache
+def code_hash(function):
+    """Function to hash the source of the module defining an indicator, helpers included.
+    Cached indicators of an older implementation get another key"""
+    try:
+        source = inspect.getsource(inspect.getmodule(function))
+    except (OSError, TypeError):
+        source = function.__code__.co_code.hex()
+    return hashlib.sha1(source.encode()).hexdigest()[:12]
+
+
+class IndicatorCache:
+    """
+    Class used to memoize indicators keyed by market, indicator, code hash, window and price series hash
+
+    An in-memory LRU sits in front of an optional on-disk store of .npy files. Files are written
+    to a temporary name and renamed, so worker processes can share the folder safely
+    """
+
+    def __init__(self, folder=None, max_entries=256):
+        """
+        :param str folder: Folder of the on-disk store. None keeps indicators in memory only
+        :param int max_entries: Number of indicators kept in memory
+        """
+        self.logger = logging.getLogger(__name__)
+        self.folder = folder
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        if folder is not None:
+            os.makedirs(folder, exist_ok=True)
+
+    def bind(self, market, data):
+        """
+        Return a function computing indicators of a price series through the cache
+
+        :param str market: Name of the market
+        :param pandas.Series data: Price series the indicators are computed on
+        :return function: (indicator function, periods) -> pandas.Series
+        """
+        data_hash = series_hash(data)
+        return lambda function, periods: self.get(market, function, periods, data, data_hash)
+
+    def get(self, market, function, periods, data, data_hash=None):
+        """
+        Return the cached indicator or compute and store it
+
+        :param str market: Name of the market
+        :param function function: Indicator function of src.indicators taking (data, periods)
+        :param int periods: Indicator window
+        :param pandas.Series data: Price series the indicator is computed on
+        :param str data_hash: Hash of data. Computed if None
+        :return pandas.Series: Indicator
+        """
+        key = (market, function.__name__, code_hash(function), periods, data_hash or series_hash(data))
+
+        values = self.memory.get(key)
+        if values is not None:
+            self.memory.move_to_end(key)
+            self.hits["memory"] += 1
+        else:
+            values = self.load(key)
+            if values is not None:
+                self.hits["disk"] += 1
+            else:
+                self.misses += 1
+                values = function(data, periods).to_numpy(dtype=float)
+                self.save(key, values)
+            self.remember(key, values)
+
+        return pd.Series(values.copy(), index=data.index, name=data.name)
+
+    def remember(self, key, values):
+        """Add indicator to the in-memory LRU, evicting the least recently used one if full"""
+        self.memory[key] = values
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def path(self, key):
+        market, indicator, indicator_hash, periods, data_hash = key
+        return os.path.join(self.folder, f"{market}_{indicator}_{indicator_hash}_{periods}_{data_hash}.npy")
+
+    def load(self, key):
+        """Load indicator from the on-disk store. None if missing"""
+        if self.folder is None:
+            return None
+        try:
+            return np.load(self.path(key))
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+    def save(self, key, values):
+        """Write indicator to the on-disk store with an atomic rename"""
+        if self.folder is None:
+            return
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                np.save(file, values)
+            os.replace(temporary_path, self.path(key))
+        except OSError as error:
+            self.logger.warning(f"Indicator not saved to the cache: {error}")
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def stats(self):
+        """Return hits and misses"""
+        return {"memory_hits": self.hits["memory"], "disk_hits": self.hits["disk"], "misses": self.misses}
+
+
+def make_indicator_cache(settings):
+    """
+    Build the indicator cache from the indicator_cache settings
+
+    :param dict settings: enabled, folder and max_entries
+    :return IndicatorCache: None if disabled
+    """
+    if not settings["enabled"]:
+        return None
+    return IndicatorCache(settings["folder"], settings["max_entries"])
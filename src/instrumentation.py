@@ -0,0 +1,155 @@
+import cProfile
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+
+class Instrumentation:
+    """
+    Class used to record wall time, call counts and peak memory of the pipeline stages
+    """
+
+    def __init__(self, enabled=True, trace_memory=False, market_timing=False):
+        """
+        :param bool enabled: Attribute to record stages. When False every hook is a no-op
+        :param bool trace_memory: Attribute to record peak memory with tracemalloc. Slows down the run
+        :param bool market_timing: Attribute to time the engine on each market. Adds a timer per market and day
+        """
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.market_timing = enabled and market_timing
+        self.stages = {}
+        self.markets = {}
+        self.files = {}
+        self._memory_stack = []
+
+    def stage(self, name):
+        """Context manager recording one call of the stage"""
+        if not self.enabled:
+            return nullcontext()
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name):
+        self._enter_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = self._exit_memory()
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_mb": 0.0})
+            stage["seconds"] += seconds
+            stage["calls"] += 1
+            stage["peak_mb"] = max(stage["peak_mb"], peak / 2**20)
+
+    def add_market_time(self, market, seconds):
+        """Add time spent by the engine on a market"""
+        if not self.market_timing:
+            return
+        market_stats = self.markets.setdefault(market, {"seconds": 0.0, "calls": 0})
+        market_stats["seconds"] += seconds
+        market_stats["calls"] += 1
+
+    def add_file_time(self, path, seconds):
+        """Add time spent reading a file"""
+        if not self.enabled:
+            return
+        self.files[path] = self.files.get(path, 0.0) + seconds
+
+    def _enter_memory(self):
+        if not self.trace_memory:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        current, peak = tracemalloc.get_traced_memory()
+        # Save the enclosing stage's peak before resetting it
+        if self._memory_stack:
+            self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._memory_stack.append([current, current])
+
+    def _exit_memory(self):
+        if not self.trace_memory:
+            return 0
+        peak = tracemalloc.get_traced_memory()[1]
+        start, stage_peak = self._memory_stack.pop()
+        stage_peak = max(stage_peak, peak)
+        if self._memory_stack:
+            self._memory_stack[-1][1] = max(self._memory_stack[-1][1], stage_peak)
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.stop()
+        return stage_peak - start
+
+    def report(self):
+        """Return stages, markets and files statistics sorted by time"""
+
+        def rounded(stats):
+            return {
+                key: {field: round(value, 6) for field, value in values.items()}
+                for key, values in sorted(stats.items(), key=lambda item: -item[1]["seconds"])
+            }
+
+        return {
+            "stages": rounded(self.stages),
+            "markets": rounded(self.markets),
+            "files": {
+                path: round(seconds, 6)
+                for path, seconds in sorted(self.files.items(), key=lambda item: -item[1])
+            },
+        }
+
+    def to_json(self, path):
+        """Save report as json"""
+        with open(path, "w") as file:
+            json.dump(self.report(), file, indent=2)
+        logger.info(f"Run report saved to {path}")
+
+
+def progress_bar(iterable, enabled=True, total=None):
+    """Wrap iterable in a tqdm progress bar. tqdm is imported only when the bar is shown"""
+    if not enabled:
+        return iterable
+    from tqdm import tqdm
+
+    return tqdm(iterable, total=total)
+
+
+@contextmanager
+def profile(path, profiler="cprofile"):
+    """
+    Profile the enclosed code and save the output
+
+    :param str path: Output file. cProfile stats or pyinstrument html report
+    :param str profiler: cprofile or pyinstrument
+    """
+    if profiler == "cprofile":
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+        try:
+            yield
+        finally:
+            cprofiler.disable()
+            cprofiler.dump_stats(path)
+            logger.info(f"cProfile stats saved to {path}")
+
+    elif profiler == "pyinstrument":
+        from pyinstrument import Profiler
+
+        sampler = Profiler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            with open(path, "w") as file:
+                file.write(sampler.output_html())
+            logger.info(f"pyinstrument report saved to {path}")
+
+    else:
+        raise ValueError(f"Unknown profiler: {profiler}")
@@ -0,0 +1,48 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+EXECUTORS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+
+def read_file(task):
+    """Worker task: read an excel file and return it with the seconds spent"""
+    path, read_kwargs = task
+    start = time.perf_counter()
+    data = pd.read_excel(path, **read_kwargs)
+    return data, time.perf_counter() - start
+
+
+def read_files(paths, read_kwargs, workers=None, executor="thread", instrumentation=None):
+    """
+    Read excel files concurrently
+
+    Threads help when the data folder is on a network mount, processes when parsing dominates
+
+    :param list paths: Files to read
+    :param read_kwargs: Keyword arguments of pandas.read_excel. dict shared by all files or list of dicts
+    :param int workers: Number of workers. 1 reads the files one at a time in process
+    :param str executor: thread or process
+    :param Instrumentation instrumentation: Records the time spent on each file
+    :return list: dfs in the order of paths
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor: {executor}")
+    if isinstance(read_kwargs, dict):
+        read_kwargs = [read_kwargs] * len(paths)
+    tasks = list(zip(paths, read_kwargs))
+
+    if workers == 1 or len(tasks) <= 1:
+        results = [read_file(task) for task in tasks]
+    else:
+        with EXECUTORS[executor](workers) as pool:
+            results = list(pool.map(read_file, tasks))
+
+    if instrumentation is not None:
+        for path, (_, seconds) in zip(paths, results):
+            instrumentation.add_file_time(path, seconds)
+    return [data for data, _ in results]
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+import src.strategy as strategy
+from src.instrumentation import Instrumentation, progress_bar
+
+
+def book_name(strategy_id, market):
+    """Function to get the prefix of the columns of a market traded by a strategy. None for a single strategy"""
+    return market if strategy_id is None else f"{strategy_id}:{market}"
+
+
+def build_market_frame(market, market_data, market_orders, strategy_id=None):
+    """Function to create the market's block of the backtesting dataframe.
+    With a strategy id the block has the strategy's columns only, as the close is shared"""
+    book = book_name(strategy_id, market)
+    market_frame = pd.concat(
+        [
+            market_orders.Order.reindex(market_data.index),
+            market_data.PX_LAST,
+            market_data.exit_resistance,
+            market_data.exit_support,
+        ],
+        axis=1,
+    )
+    market_frame.columns = [
+        f"{book} Order",
+        f"{market} Close",
+        f"{book} Resistance",
+        f"{book} Support",
+    ]
+    if strategy_id is not None:
+        market_frame = market_frame.drop(columns=f"{market} Close")
+
+    # State columns filled in by the backtester
+    for column in ["Contracts", "Margin", "Risk", "P/L"]:
+        market_frame[f"{book} {column}"] = np.NaN
+
+    return market_frame
+
+
+def build_strategies_frame(market, strategies_data):
+    """
+    Create the market's block of the backtesting dataframe for several strategies
+
+    :param str market: Name of the market
+    :param dict strategies_data: Strategy id -> (market data with indicators, market orders)
+    :return pandas.DataFrame: Close of the market and a block of columns per strategy
+    """
+    market_data = next(iter(strategies_data.values()))[0]
+    return pd.concat(
+        [market_data.PX_LAST.rename(f"{market} Close")]
+        + [
+            build_market_frame(market, strategy_data, strategy_orders, strategy_id)
+            for strategy_id, (strategy_data, strategy_orders) in strategies_data.items()
+        ],
+        axis=1,
+    )
+
+
+def assemble_panel(market_frames, markets_list, strategies=None):
+    """Function to merge the markets' blocks in the dataframe used in backtesting"""
+    # Drop any date with all values NaN and sort by date
+    all_markets_df = pd.concat(market_frames, axis=1).dropna(how="all").sort_index()
+
+    # Initializing columns
+    for strategy_id in strategies or [None]:
+        for market in markets_list:
+            book = book_name(strategy_id, market)
+            all_markets_df[f"{book} Risk"] = all_markets_df[f"{book} Risk"].fillna(0)
+            all_markets_df[f"{book} Contracts"] = all_markets_df[f"{book} Contracts"].fillna(0)
+            all_markets_df[f"{book} P/L"] = all_markets_df[f"{book} P/L"].fillna(0)
+
+    return all_markets_df
+
+
+def build_panel(markets_data, strategy_parameters=None, cache=None, instrumentation=None, progress=False):
+    """
+    Compute indicators and orders of every market and merge them in the backtesting dataframe
+
+    :param dict markets_data: Market name -> df with Symbol and PX_LAST columns indexed by date
+    :param dict strategy_parameters: Keyword arguments of strategy.compute_indicators
+    :param IndicatorCache cache: Memoizes indicators across parameter sets and runs
+    :param Instrumentation instrumentation: Records the indicators, orders and panel stages
+    :param bool progress: Attribute to show the progress bar over the markets
+    :return tuple: all markets df and orders df
+    """
+    return build_strategies_panel(markets_data, {None: strategy_parameters}, cache, instrumentation, progress)
+
+
+def build_strategies_panel(markets_data, strategies, cache=None, instrumentation=None, progress=False):
+    """
+    Compute indicators and orders of several strategies on every market and merge them in one
+    backtesting dataframe, where the strategies share the close of each market
+
+    :param dict markets_data: Market name -> df with Symbol and PX_LAST columns indexed by date
+    :param dict strategies: Strategy id -> keyword arguments of strategy.compute_indicators.
+        {None: parameters} builds the panel of a single strategy, without strategy prefixes
+    :param IndicatorCache cache: Memoizes indicators across strategies, parameter sets and runs
+    :param Instrumentation instrumentation: Records the indicators, orders and panel stages
+    :param bool progress: Attribute to show the progress bar over the markets
+    :return tuple: all markets df and orders df, with a Strategy column for several strategies
+    """
+    instrumentation = instrumentation or Instrumentation(enabled=False)
+    market_frames, orders = [], []
+    for market in progress_bar(markets_data, progress):
+        strategies_data = {}
+        for strategy_id, strategy_parameters in strategies.items():
+            with instrumentation.stage("indicators"):
+                strategy_data = strategy.compute_indicators(
+                    markets_data[market].copy(), **(strategy_parameters or {}), cache=cache
+                )
+            with instrumentation.stage("orders"):
+                strategy_orders = strategy.generate_orders(strategy_data)
+            if not strategy_orders.empty:
+                new_orders = strategy_orders.reset_index()
+                if strategy_id is not None:
+                    new_orders["Strategy"] = strategy_id
+                orders.append(new_orders)
+            strategies_data[strategy_id] = (strategy_data, strategy_orders)
+
+        with instrumentation.stage("panel"):
+            if None in strategies_data:
+                market_frames.append(build_market_frame(market, *strategies_data[None]))
+            else:
+                market_frames.append(build_strategies_frame(market, strategies_data))
+
+    orders_df = pd.concat(orders, ignore_index=True) if orders else pd.DataFrame()
+    with instrumentation.stage("panel"):
+        all_markets_df = assemble_panel(
+            market_frames, list(markets_data), None if None in strategies else list(strategies)
+        )
+    return all_markets_df, orders_df
@@ -0,0 +1,279 @@
+import logging
+import os
+
+import pandas as pd
+
+from src.backtesting_engine import Backtester
+from src.compact import precision_drift
+from src.config import load_config
+from src.costs import make_cost_model, read_specifications
+from src.indicator_cache import make_indicator_cache
+from src.instrumentation import Instrumentation
+from src.loading import read_files
+from src.panel import build_strategies_panel
+from src.position_sizing import make_position_sizing
+from src.stop_criteria import make_stop_criteria
+from src.validation import ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+def get_markets_list(config):
+    """Function to get the markets to invest in. All the markets in the folder if none is selected"""
+    if config["selected_markets"]:
+        return list(config["selected_markets"])
+    path_to_historical_data = os.path.join(
+        os.getcwd(), config["data_folder"], config["historical_data_folder"]
+    )
+    return [market.split(".")[0] for market in os.listdir(path_to_historical_data)]
+
+
+MARKET_FILE_COLUMNS = {"usecols": ["Dates", "PX_LAST"], "index_col": "Dates"}
+
+
+def market_data_path(config, market):
+    """Function to get the path of a market's historical data"""
+    return os.path.join(
+        os.getcwd(), config["data_folder"], config["historical_data_folder"], market + ".xlsx"
+    )
+
+
+def load_market_data(config, market):
+    """Function to import a market's data limited to the selected period"""
+    return prepare_market_data(
+        config, market, pd.read_excel(market_data_path(config, market), **MARKET_FILE_COLUMNS)
+    )
+
+
+def load_markets_data(config, markets_list, instrumentation=None):
+    """Function to import the data of all markets concurrently"""
+    markets_data = read_files(
+        [market_data_path(config, market) for market in markets_list],
+        MARKET_FILE_COLUMNS,
+        config["loading"]["workers"],
+        config["loading"]["executor"],
+        instrumentation,
+    )
+    return {
+        market: prepare_market_data(config, market, market_data)
+        for market, market_data in zip(markets_list, markets_data)
+    }
+
+
+def prepare_market_data(config, market, market_data):
+    """Function to clean a market's data read from file and limit it to the selected period"""
+    # Drop na
+    market_data = market_data.dropna(how="all")
+
+    # Adding ID column | Used in orders_df to identify ticker
+    market_data.insert(0, "Symbol", market)
+
+    # Limit study to certain periods
+    return market_data[(config["starting_date"] or None) : (config["ending_date"] or None)]
+
+
+def load_currencies(config, instrumentation):
+    """Function to load the currencies' spot rates concurrently, aligned on the same dates"""
+    path_to_currencies = os.path.join(os.getcwd(), config["data_folder"], "spot_currencies")
+    currencies = [currency.split(".")[0] for currency in os.listdir(path_to_currencies)]
+
+    with instrumentation.stage("load"):
+        currencies_rates = read_files(
+            [os.path.join(path_to_currencies, currency + ".xlsx") for currency in currencies],
+            [{"index_col": "Dates", "names": ["Dates", currency]} for currency in currencies],
+            config["loading"]["workers"],
+            config["loading"]["executor"],
+            instrumentation,
+        )
+    return pd.concat(currencies_rates, axis=1) if currencies_rates else pd.DataFrame()
+
+
+def load_specifications(config):
+    """Function to load the futures contracts specifications"""
+    return read_specifications(os.path.join(os.getcwd(), config["data_folder"], "contracts_details.xlsx"))
+
+
+def run_backtest(config=None, instrumentation=None):
+    """
+    Generate the strategy's orders and simulate them
+
+    :param config: None, path to a json file or dict with the settings to override
+    :param Instrumentation instrumentation: Records the stages of the run
+    :return dict: all markets df, portfolio df (Margin, Equity and with several strategies P/L and
+        each strategy's Margin, Equity and P/L), orders df, markets list, trade ledger, stop reason and
+        validation warnings
+    """
+    config = load_config(config)
+    instrumentation = instrumentation or Instrumentation(
+        trace_memory=config["trace_memory"], market_timing=config["market_timing"]
+    )
+
+    currencies_df = pd.DataFrame()
+    markets_list = get_markets_list(config)
+    cache = make_indicator_cache(config["indicator_cache"])
+    # Strategy id -> compute_indicators parameters. None is the single strategy of strategy_parameters
+    strategies = {
+        strategy_id: strategy_config.get("parameters", {})
+        for strategy_id, strategy_config in config["strategies"].items()
+    } or {None: config["strategy_parameters"]}
+    multi_strategy = None not in strategies
+
+    logger.info("Loading markets' data...")
+    with instrumentation.stage("load"):
+        markets_data = load_markets_data(config, markets_list, instrumentation)
+
+    # Indicators, orders and the df used in backtesting, for every market and strategy
+    logger.info("Generating entries and exists...")
+    all_markets_df, orders_df = build_strategies_panel(
+        {market: markets_data[market] for market in markets_list},
+        strategies,
+        cache,
+        instrumentation,
+        config["show_progress"],
+    )
+    if cache is not None:
+        logger.info(f"Indicator cache: {cache.stats()}")
+
+    # Load currencies' spot rates
+    if config["local_currency"]:
+        logger.info("Getting currencies' exchange rates...")
+        currencies_df = load_currencies(config, instrumentation)
+
+    ##### Market Simulation #####
+    def make_backtester(compact, orders_df, instrumentation):
+        return Backtester(
+            all_markets_df,
+            config["initial_equity"],
+            config["position_risk"],
+            markets_list,
+            orders_df,
+            config["local_currency"],
+            currencies_df,
+            config["commission"],
+            config["fee"],
+            config["fee_structure"],
+            instrumentation=instrumentation,
+            progress=config["show_progress"],
+            event_driven=config["event_driven"],
+            compact=compact,
+            stop_criteria=make_stop_criteria(config["stop_criteria"]),
+            position_sizing=make_position_sizing(config["position_sizing"]),
+            bar_frequency=config["bars"]["frequency"],
+            max_gap=config["bars"]["max_gap"],
+            fx_tolerance=config["bars"]["fx_tolerance"],
+            cost_model=make_cost_model(config["costs"], config["commission"]),
+            strategies={
+                strategy_id: strategy_config.get("weight", 1 / len(config["strategies"]))
+                for strategy_id, strategy_config in config["strategies"].items()
+            },
+        )
+
+    compact = config["compact_panel"]
+    reference_orders_df = orders_df.copy()
+    logger.info("Validating inputs...")
+    try:
+        with instrumentation.stage("setup"):
+            backtester = make_backtester(compact, orders_df, instrumentation)
+    except ValidationError as error:
+        error.report.to_excel(config["validation_output"], index=False)
+        logger.error(f"Inputs are incomplete. Report saved to {config['validation_output']}")
+        raise
+
+    logger.info("Backtesting...")
+    with instrumentation.stage("simulate"):
+        simulated_df, orders_df = backtester.simulate()
+
+    portfolio_columns = ["Margin", "Equity"]
+    if backtester.cost_model is not None:
+        portfolio_columns.append("Costs")
+    if multi_strategy:
+        portfolio_columns += ["P/L"] + [
+            f"{strategy_id} {column}" for strategy_id in strategies for column in ["Margin", "Equity", "P/L"]
+        ]
+    results = {
+        "all_markets": simulated_df,
+        "portfolio": simulated_df.loc[:, portfolio_columns],
+        "orders": orders_df,
+        "markets_list": markets_list,
+        "trade_ledger": backtester.trade_ledger.to_frame(),
+        "stop_reason": backtester.stop_reason,
+        "validation": backtester.validation_report,
+    }
+    if backtester.stop_reason is not None:
+        logger.warning(f"Backtest stopped early on {backtester.stop_date:%Y-%m-%d}: {backtester.stop_reason}")
+
+    if compact:
+        results["compaction"] = backtester.compaction_report
+        if config["compact_drift_check"]:
+            logger.info("Backtesting at full precision...")
+            reference_df, _ = make_backtester(
+                False, reference_orders_df, Instrumentation(enabled=False)
+            ).simulate()
+            results["compaction"].update(precision_drift(reference_df, simulated_df, backtester.books))
+            logger.info(f"Compact panel drift: {results['compaction']}")
+
+    return results
+
+
+def export_results(results, config=None, instrumentation=None):
+    """Function to save orders and portfolio summaries"""
+    config = load_config(config)
+    instrumentation = instrumentation or Instrumentation(enabled=False)
+    with instrumentation.stage("export"):
+        results["orders"].to_excel(config["orders_output"])
+        results["portfolio"].to_excel(config["portfolio_output"])
+        results["trade_ledger"].to_excel(config["ledger_output"], index=False)
+
+
+def load_results(config=None, with_benchmark=False, instrumentation=None):
+    """
+    Function to load the summaries saved by export_results. Files are read concurrently
+
+    :param config: None, path to a json file or dict with the settings to override
+    :param bool with_benchmark: Attribute to also load the benchmark's prices. None if the file is missing
+    :param Instrumentation instrumentation: Records the time spent on each file
+    :return dict: orders df, portfolio df, markets list, trade ledger (None if missing)
+        and benchmark series if requested
+    """
+    config = load_config(config)
+    files = {
+        "orders": (config["orders_output"], {"index_col": 1}),
+        "portfolio": (config["portfolio_output"], {"index_col": 0}),
+    }
+    if os.path.exists(config["ledger_output"]):
+        files["trade_ledger"] = (config["ledger_output"], {})
+    if with_benchmark and os.path.exists(get_benchmark_path(config)):
+        files["benchmark"] = (get_benchmark_path(config), {"index_col": 0})
+
+    loaded = dict(
+        zip(
+            files,
+            read_files(
+                [path for path, _ in files.values()],
+                [read_kwargs for _, read_kwargs in files.values()],
+                config["loading"]["workers"],
+                config["loading"]["executor"],
+                instrumentation,
+            ),
+        )
+    )
+    results = {
+        "orders": loaded["orders"].sort_index(),
+        "portfolio": loaded["portfolio"],
+        "markets_list": get_markets_list(config),
+        "trade_ledger": loaded.get("trade_ledger"),
+    }
+    if with_benchmark:
+        results["benchmark"] = loaded["benchmark"].iloc[:, 0] if "benchmark" in loaded else None
+    return results
+
+
+def get_benchmark_path(config):
+    """Function to get the path of the benchmark's prices"""
+    return os.path.join(os.getcwd(), config["data_folder"], "index", f"{config['benchmark']}.xlsx")
+
+
+def load_benchmark(config=None):
+    """Function to load the benchmark's prices"""
+    config = load_config(config)
+    return pd.read_excel(get_benchmark_path(config), index_col=0).iloc[:, 0]
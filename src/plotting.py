@@ -0,0 +1,157 @@
+"""
+Decimated plotting of long series
+
+Lines are reduced to about one point per pixel before matplotlib draws them, keeping their shape:
+min / max per pixel bucket keeps every spike and drawdown, LTTB (largest triangle three buckets) keeps the
+visual shape with fewer points. Fans of many curves are drawn as quantile bands
+"""
+import numpy as np
+import pandas as pd
+
+
+def to_numeric(index):
+    """Function to get x values of an index as floats. Dates become nanoseconds"""
+    if isinstance(index, pd.DatetimeIndex):
+        return index.asi8.astype(float)
+    return np.asarray(index, dtype=float)
+
+
+def pixel_width(ax, points_per_pixel=1):
+    """Function to get the # of points an axes can show, one per horizontal pixel"""
+    return max(int(ax.get_window_extent().width * points_per_pixel), 3)
+
+
+def min_max_indices(x, y, n_buckets):
+    """
+    Indices of the first, last, lowest and highest point of each of n_buckets equal ranges of x
+
+    :param numpy.ndarray x: Sorted x values
+    :param numpy.ndarray y: y values without NaN
+    :return numpy.ndarray: Sorted indices, at most 4 per bucket
+    """
+    if len(x) <= 4 * n_buckets:
+        return np.arange(len(x))
+    span = x[-1] - x[0]
+    buckets = np.minimum(((x - x[0]) / span * n_buckets).astype(np.int64), n_buckets - 1) if span else np.zeros(len(x), int)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(x)] - 1
+    groups = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(x)]))
+
+    indices = [starts, ends]
+    for extremes in [np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)]:
+        # First point of each bucket reaching the extreme
+        hits = np.flatnonzero(y == extremes[groups])
+        indices.append(hits[np.r_[True, groups[hits][1:] != groups[hits][:-1]]])
+    return np.unique(np.concatenate(indices))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Indices of the points kept by the largest triangle three buckets algorithm
+
+    The first and last points are kept. In each bucket the point forming the largest triangle with the point
+    kept in the previous bucket and the mean of the next bucket is kept
+
+    :param numpy.ndarray x: Sorted x values
+    :param numpy.ndarray y: y values without NaN
+    :param int n_out: # of points to keep
+    :return numpy.ndarray: Sorted indices
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Bucket edges of the n - 2 inner points, and the means of each bucket from cumulative sums
+    edges = np.floor(np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    sums_x, sums_y = np.r_[0, np.cumsum(x)], np.r_[0, np.cumsum(y)]
+    counts = np.diff(edges)
+    means_x = (sums_x[edges[1:]] - sums_x[edges[:-1]]) / counts
+    means_y = (sums_y[edges[1:]] - sums_y[edges[:-1]]) / counts
+    # The bucket after the last one is the last point
+    means_x, means_y = np.r_[means_x[1:], x[-1]], np.r_[means_y[1:], y[-1]]
+
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    kept = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = np.abs(
+            (x[kept] - means_x[bucket]) * (y[start:end] - y[kept])
+            - (x[kept] - x[start:end]) * (means_y[bucket] - y[kept])
+        )
+        kept = start + int(np.argmax(areas))
+        indices[bucket + 1] = kept
+    return indices
+
+
+def decimate(series, max_points, method="minmax"):
+    """
+    Reduce a series to about max_points points keeping its shape
+
+    :param pandas.Series series: Series indexed by date or number. NaN are dropped
+    :param int max_points: # of points to keep, e.g. the pixel width of the axes
+    :param str method: minmax (keeps extremes, up to 4 points per bucket) or lttb
+    :return pandas.Series: Subset of the series
+    """
+    series = series.dropna()
+    x, y = to_numeric(series.index), series.to_numpy(float)
+    if method == "minmax":
+        indices = min_max_indices(x, y, max(max_points // 4, 1))
+    elif method == "lttb":
+        indices = lttb_indices(x, y, max_points)
+    else:
+        raise ValueError(f"Unknown decimation method: {method}")
+    return series.iloc[indices]
+
+
+def plot_line(ax, series, method="minmax", max_points=None, **plot_kwargs):
+    """Plot a series decimated to the pixel width of the axes. Other arguments go to ax.plot"""
+    decimated = decimate(series, max_points or pixel_width(ax), method)
+    return ax.plot(decimated.index, decimated.to_numpy(), **plot_kwargs)
+
+
+def fill_between(ax, series, baseline=0, max_points=None, **fill_kwargs):
+    """Fill between a decimated series and a baseline, e.g. drawdowns. Extremes are kept"""
+    decimated = decimate(series, max_points or pixel_width(ax), "minmax")
+    return ax.fill_between(decimated.index, baseline, decimated.to_numpy(), **fill_kwargs)
+
+
+def plot_fan(ax, curves, quantiles=(0.05, 0.25), max_points=None, color="k", median=True, **fill_kwargs):
+    """
+    Draw many curves, e.g. Monte Carlo or sweep equity curves, as a density band
+
+    Dates are sampled to the pixel width and each band joins a quantile of the curves to its
+    symmetric one (5% to 95%, 25% to 75%). Inner bands are darker
+
+    :param pandas.DataFrame curves: Dates x curves
+    :param list quantiles: Lower quantiles of the bands
+    :param int max_points: # of dates drawn. None for the pixel width of the axes
+    :param bool median: Attribute to draw the median curve
+    """
+    max_points = max_points or pixel_width(ax)
+    rows = np.unique(np.linspace(0, len(curves) - 1, min(max_points, len(curves))).astype(np.int64))
+    sampled = curves.iloc[rows].to_numpy(float)
+    dates = curves.index[rows]
+
+    levels = sorted(quantiles)
+    bounds = np.nanquantile(sampled, [*levels, 0.5, *[1 - level for level in levels]], axis=1)
+    # Bands overlap, so inner ones add up to darker shades
+    alpha = fill_kwargs.pop("alpha", 0.15)
+    artists = []
+    for band, level in enumerate(levels):
+        artists.append(
+            ax.fill_between(
+                dates,
+                bounds[band],
+                bounds[-1 - band],
+                color=color,
+                alpha=alpha,
+                linewidth=0,
+                label=f"{level:.0%}-{1 - level:.0%}",
+                **fill_kwargs,
+            )
+        )
+    if median:
+        artists.extend(ax.plot(dates, bounds[len(levels)], color=color, linewidth=1, label="Median"))
+    return artists
@@ -1,40 +1,33 @@
-import sys
-import logging
-from datetime import timedelta
 from math import isnan, ceil
 
+import numpy as np
+import pandas as pd
 
-logger = logging.getLogger(__name__)
 
-
-def get_daily_change(close, close_prev):
-    """Function to compute daily change"""
-    return (close - close_prev) if not isnan(close - close_prev) else 0
-
-
-def get_position_points(data, date_idx, market):
-    """Function to get points needed to compute positions size"""
+def get_position_points(data, date_idx, market, book=None):
+    """Function to get points needed to compute positions size.
+    book is the prefix of the support and resistance columns when several strategies trade the market"""
+    book = book or market
     for x in range(0, 10):
         if not isnan(data.iloc[date_idx - x, data.columns.get_loc(f"{market} Close")]):
             return (
                 data.iloc[date_idx - x, data.columns.get_loc(f"{market} Close")],
-                data.iloc[date_idx - x, data.columns.get_loc(f"{market} Support")],
-                data.iloc[date_idx - x, data.columns.get_loc(f"{market} Resistance")],
+                data.iloc[date_idx - x, data.columns.get_loc(f"{book} Support")],
+                data.iloc[date_idx - x, data.columns.get_loc(f"{book} Resistance")],
             )
-    logger.error("Error while getting position points.", data.iloc[date_idx])
-    sys.exit(1)
+    raise ValueError(f"No close of {market} in the 10 days up to {data.index[date_idx]:%Y-%m-%d}")
 
 
-def get_mark_to_market_points(data, date_idx, market):
-    """Function to take into account weekends and holidays.
-    Ex. NKD is closed on 3-4-5 May. This will return Close of 2 and 6"""
-    for x in range(1, 10):
-        if not isnan(data.iloc[date_idx - x, data.columns.get_loc(f"{market} Close")]):
-            return (
-                data.iloc[date_idx - x, data.columns.get_loc(f"{market} Close")],
-                data.iloc[date_idx, data.columns.get_loc(f"{market} Close")],
-            )
-    return 0, 0
+def get_price_changes(close):
+    """Function to compute the daily change of each day at once, from the last close in the previous 9 days.
+    Markets closed on a day have no change. Rows before the first ones look back from the end"""
+    previous_close = np.full_like(close, np.NaN)
+    for x in range(9, 0, -1):
+        lagged_close = np.roll(close, x)
+        previous_close = np.where(np.isnan(lagged_close), previous_close, lagged_close)
+    price_changes = close - previous_close
+    price_changes[np.isnan(price_changes)] = 0
+    return price_changes
 
 
 def get_number_of_contracts(
@@ -45,9 +38,10 @@ def get_number_of_contracts(
     updated_equity,
     point_value,
     position_risk,
+    book=None,
 ):
     """Function to compute number of contracts to buy / sell"""
-    close, support, resistance = get_position_points(data, date_idx, market)
+    close, support, resistance = get_position_points(data, date_idx, market, book)
     # N of contracts is given by (risk factor * equity) / (position risk * point value)
 
     if position_type == "long":
@@ -68,16 +62,45 @@ def get_number_of_contracts(
         return 0
 
     else:
-        logger.error(f"Error computing # of contracts. Position Type: {position_type}")
-        sys.exit(1)
-
-
-def get_currency_rate(currencies_df, currency, date):
-    """Function to obtain exchange rate in a given day"""
-    for x in range(0, 10):
-        try:
-            rate = currencies_df.at[date - timedelta(days=x), currency]
-            if not isnan(rate):
-                return rate
-        except KeyError:
+        raise ValueError(f"Error computing # of contracts. Position Type: {position_type}")
+
+
+def as_of(values, dates, tolerance):
+    """
+    Look up the last value at or before each date, within a tolerance
+
+    :param pandas.Series values: Values indexed by date. NaN are skipped
+    :param pandas.DatetimeIndex dates: Dates to look up
+    :param pandas.Timedelta tolerance: Maximum age of the value found
+    :return numpy.ndarray: Values as of the dates. NaN if none within the tolerance
+    """
+    values = values.dropna().sort_index(kind="stable")
+    if values.empty:
+        return np.full(len(dates), np.NaN)
+    value_dates, dates = values.index.asi8, pd.DatetimeIndex(dates).asi8
+    positions = np.searchsorted(value_dates, dates, side="right") - 1
+    found = (positions >= 0) & (dates - value_dates[np.maximum(positions, 0)] <= tolerance.value)
+    return np.where(found, values.to_numpy(float)[np.maximum(positions, 0)], np.NaN)
+
+
+def get_exchange_rates(currencies_df, currencies, dates, missing=1.0, tolerance=pd.Timedelta(days=9)):
+    """
+    Exchange rate of each market's currency as of each date, looking back up to 9 days
+
+    :param pandas.DataFrame currencies_df: df including exchange rates
+    :param list currencies: Currency of each market
+    :param pandas.DatetimeIndex dates: Days, or intraday bars, to get the rates of
+    :param float missing: Rate of the dates without one within the tolerance
+    :param pandas.Timedelta tolerance: Maximum age of a rate
+    :return numpy.ndarray: dates x markets rates rounded to 6 decimals. USD rates are 1
+    """
+    rates = np.ones((len(dates), len(currencies)))
+    for market_idx, currency in enumerate(currencies):
+        if currency == "USD":
+            continue
+        if currency not in currencies_df:
+            rates[:, market_idx] = missing
             continue
+        currency_rates = as_of(currencies_df[currency], dates, tolerance).round(6)
+        rates[:, market_idx] = np.where(np.isnan(currency_rates), missing, currency_rates)
+    return rates
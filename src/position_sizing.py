@@ -0,0 +1,178 @@
+import numpy as np
+
+from src.position_builders import get_position_points
+
+
+class EWMACovariance:
+    """
+    Class used to keep an exponentially weighted covariance matrix of daily returns up to date
+
+    Each update decays the sums and adds the outer product of the day's returns, in O(N²).
+    Missing returns add nothing and are excluded from the weights of their pairs, so the estimate
+    of each pair only uses the days both markets traded. Single entries are read in O(1)
+    """
+
+    def __init__(self, n_assets, halflife=60, min_periods=60, periods=252):
+        """
+        :param int n_assets: Number of markets
+        :param float halflife: Half life in days of the weights
+        :param int min_periods: # of returns a market needs before its volatility is used
+        :param int periods: Days per year used to annualize
+        """
+        self.n_assets = n_assets
+        self.decay = 0.5 ** (1 / halflife)
+        self.min_periods = min_periods
+        self.periods = periods
+        self.reset()
+
+    def reset(self):
+        self.sums = np.zeros((self.n_assets, self.n_assets))
+        self.weights = np.zeros((self.n_assets, self.n_assets))
+        self.variances = np.full(self.n_assets, np.NaN)
+        self.observations = np.zeros(self.n_assets, dtype=np.int64)
+        self.diversification = 1.0
+        self.ready = 0
+
+    def update(self, returns, max_multiplier=np.inf):
+        """
+        Add a day of returns
+
+        :param numpy.ndarray returns: Daily return of each market. NaN if the market didn't trade
+        :param float max_multiplier: Cap of the diversification multiplier
+        """
+        observed = ~np.isnan(returns)
+        returns = np.where(observed, returns, 0.0)
+        self.sums *= self.decay
+        self.sums += (1 - self.decay) * np.outer(returns, returns)
+        self.weights *= self.decay
+        self.weights += (1 - self.decay) * np.outer(observed, observed)
+        self.observations += observed
+
+        weights = np.diagonal(self.weights)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.variances = np.where(weights > 0, np.diagonal(self.sums) / weights, np.NaN)
+        ready = (self.observations >= self.min_periods) & (self.variances > 0)
+        self.ready = int(ready.sum())
+
+        # Multiplier bringing an equal volatility portfolio of the ready markets to the target:
+        # 1 / sqrt(mean pairwise correlation), diagonal included
+        if self.ready:
+            inverse_volatility = np.zeros(self.n_assets)
+            inverse_volatility[ready] = 1 / np.sqrt(self.variances[ready])
+            covariance = np.divide(
+                self.sums, self.weights, out=np.zeros_like(self.sums), where=self.weights > 0
+            )
+            mean_correlation = inverse_volatility @ covariance @ inverse_volatility / self.ready**2
+            self.diversification = (
+                min(max_multiplier, 1 / np.sqrt(mean_correlation)) if mean_correlation > 0 else max_multiplier
+            )
+
+    def covariance(self, asset_i, asset_j):
+        """Return the daily covariance of two markets"""
+        weight = self.weights[asset_i, asset_j]
+        return self.sums[asset_i, asset_j] / weight if weight > 0 else np.NaN
+
+    def volatility(self, asset):
+        """Return the annualized volatility of a market. None before min_periods returns"""
+        if self.observations[asset] < self.min_periods or not self.variances[asset] > 0:
+            return None
+        return np.sqrt(self.variances[asset] * self.periods)
+
+
+class VolatilityTarget:
+    """
+    Size new positions so that the portfolio targets an annualized volatility
+
+    Every ready market gets the same share of the target, target / # of ready markets, scaled up by
+    the diversification multiplier of their correlations. Markets without enough history are sized
+    by their breakout distance. Contracts are rounded up as in the breakout sizing
+    """
+
+    def __init__(self, target_volatility=0.2, halflife=60, min_periods=60, max_multiplier=2.5, periods=252):
+        """
+        :param float target_volatility: Annualized volatility target of the portfolio, e.g. 0.2
+        :param float halflife: Half life in days of the EWMA covariance
+        :param int min_periods: # of returns a market needs before it is sized by volatility
+        :param float max_multiplier: Cap of the diversification multiplier
+        :param int periods: Days per year used to annualize
+        """
+        self.target_volatility = target_volatility
+        self.halflife = halflife
+        self.min_periods = min_periods
+        self.max_multiplier = max_multiplier
+        self.periods = periods
+        self.covariance = None
+        self.returns = None
+        self.day_ends = None
+        self.days = None
+
+    def start(self, backtester):
+        """
+        Reset the covariance and compute the daily returns of the markets
+
+        Returns are measured from the previous close of the last 9 days, like the mark to market.
+        Intraday bars are sampled at the last close of each day, so the half life and annualization
+        stay in days whatever the bar frequency
+
+        :param Backtester backtester: Simulation being run
+        """
+        calendar = backtester.calendar
+        close = backtester.data[[f"{market} Close" for market in backtester.markets_list]].astype(float)
+        close = calendar.daily(close)
+        previous_close = close.ffill(limit=8).shift(1)
+        self.returns = (close / previous_close - 1).replace([np.inf, -np.inf], np.NaN).to_numpy()
+        # Day of each bar. The returns of a day are known at its last bar
+        self.day_ends = calendar.day_ends()
+        self.days = np.cumsum(self.day_ends) - self.day_ends
+        self.covariance = EWMACovariance(
+            len(backtester.markets_list), self.halflife, self.min_periods, self.periods
+        )
+
+    def update(self, backtester, date_idx):
+        """Add the returns of the day to the covariance at its last bar"""
+        if self.day_ends[date_idx]:
+            self.covariance.update(self.returns[self.days[date_idx]], self.max_multiplier)
+
+    def contracts(self, backtester, date_idx, book, position_type, updated_equity, point_value):
+        """
+        Compute the # of contracts of a new position
+
+        :param Backtester backtester: Simulation being run
+        :param int date_idx: Selected date's row index
+        :param str book: Name of selected market, prefixed by the strategy id with several strategies
+        :param str position_type: Order type i.e. long, short, flat
+        :param float updated_equity: Equity at the previous close, times the strategy's share with several strategies
+        :param int point_value: Point value
+        :return int: # of contracts. Negative for shorts. None if the market is not ready
+        """
+        if position_type == "flat":
+            return 0
+        market_details = backtester.markets_details[book]
+        volatility = self.covariance.volatility(market_details["market_idx"])
+        if volatility is None:
+            return None
+
+        close, _, _ = get_position_points(backtester.data, date_idx, market_details["market"], book)
+        market_target = self.target_volatility * self.covariance.diversification / self.covariance.ready
+        contracts = int(np.ceil(market_target * updated_equity / (close * volatility * point_value)))
+        return contracts if position_type == "long" else -contracts
+
+
+def make_position_sizing(settings):
+    """
+    Build the position sizing from the position_sizing settings
+
+    :param dict settings: method ("breakout" or "volatility"), target_volatility, halflife,
+        min_periods and max_multiplier
+    :return VolatilityTarget: None for the breakout sizing
+    """
+    if settings.get("method", "breakout") == "breakout":
+        return None
+    if settings["method"] == "volatility":
+        return VolatilityTarget(
+            settings.get("target_volatility", 0.2),
+            settings.get("halflife", 60),
+            settings.get("min_periods", 60),
+            settings.get("max_multiplier", 2.5),
+        )
+    raise ValueError(f"Unknown position sizing method: {settings['method']}")
@@ -0,0 +1,312 @@
+"""
+Append-only store of backtest runs in Parquet files, partitioned by experiment
+
+    folder/runs/experiment=<name>/<part>.parquet     One row per run: run_id, created, config, parameters.*, metrics
+    folder/equity/experiment=<name>/<part>.parquet   run_id, Dates, Equity. One row group per run
+    folder/trades/experiment=<name>/<part>.parquet   run_id and the trade ledger. One row group per run
+
+Every append writes new part files, so processes on several hosts can append to the same experiment.
+Appended parts are level 0. Once a level has max_parts parts they are merged into one part of the next level,
+so queries open a few parts per level whatever the number of runs and each run is rewritten once per level.
+Metric queries read the small runs table only. Curves and trades of selected runs are read from the row groups
+whose run_id statistics match, skipping the rest. compact merges all the parts of an experiment into one
+"""
+import contextlib
+import datetime
+import glob
+import json
+import os
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+TABLES = ["runs", "equity", "trades"]
+# Each run's dates are unique, so dictionaries don't pay off. Deltas of dates and byte split floats
+# make equity files about 2.5 times smaller
+COLUMN_ENCODINGS = {"equity": {"Dates": "DELTA_BINARY_PACKED", "Equity": "BYTE_STREAM_SPLIT"}}
+# Prefix of the names of merged parts, followed by their level
+LEVEL_PREFIX = "L"
+
+
+def part_level(path):
+    """Function to get the merge level of a part file. Appended parts are level 0"""
+    name = os.path.basename(path)
+    return int(name[len(LEVEL_PREFIX) : name.index("-")]) if name.startswith(LEVEL_PREFIX) else 0
+
+
+def part_name(path):
+    """Function to get the name of a part, shared by its files in the runs, equity and trades tables"""
+    return os.path.basename(path)[: -len(".parquet")]
+
+
+def run_metrics(portfolio):
+    """Function to compute the metrics of a run stored with it, as in the analyzer's report"""
+    from src.analysis import portfolio_statistics
+    from src.bars import daily_bars
+
+    metrics, _ = portfolio_statistics(daily_bars(portfolio.loc[:, ["Margin", "Equity"]]))
+    return {**metrics, "final_equity": float(portfolio.Equity.iloc[-1])}
+
+
+class ResultsStore:
+    """
+    Class used to keep and query the runs of many experiments
+    """
+
+    def __init__(self, folder, compression="zstd", max_parts=32, lock_seconds=600):
+        """
+        :param str folder: Root folder of the store. Created if missing
+        :param str compression: Parquet compression codec
+        :param int max_parts: # of parts of a level merged into one part of the next level. None never merges
+        :param float lock_seconds: Age after which the merge lock of a dead process is taken over
+        """
+        self.folder = folder
+        self.compression = compression
+        self.max_parts = max_parts
+        self.lock_seconds = lock_seconds
+        # Parts are never modified, so their schemas are read once
+        self.schemas = {}
+        os.makedirs(folder, exist_ok=True)
+
+    def append(self, experiment, runs):
+        """
+        Add runs to an experiment
+
+        :param str experiment: Name of the experiment
+        :param list runs: dicts with config (json serializable), parameters and metrics (flat dicts),
+            equity (pandas.Series indexed by date), trade_ledger (pandas.DataFrame, optional)
+            and run_id (optional, a new one is generated)
+        :return list: Run ids
+        """
+        created = pd.Timestamp(datetime.datetime.now())
+        rows, curves, trades = [], [], []
+        for run in runs:
+            run_id = run.get("run_id") or uuid.uuid4().hex[:16]
+            rows.append(
+                {
+                    "run_id": run_id,
+                    "created": created,
+                    "config": json.dumps(run.get("config", {}), sort_keys=True, default=str),
+                    **{f"parameters.{name}": value for name, value in run.get("parameters", {}).items()},
+                    **run.get("metrics", {}),
+                }
+            )
+            equity = run["equity"]
+            curves.append(
+                pd.DataFrame(
+                    {"run_id": run_id, "Dates": equity.index, "Equity": equity.to_numpy(float)}
+                )
+            )
+            if run.get("trade_ledger") is not None:
+                trade_ledger = run["trade_ledger"].copy()
+                trade_ledger.insert(0, "run_id", run_id)
+                # Categories differ between runs
+                for column in trade_ledger.select_dtypes("category"):
+                    trade_ledger[column] = trade_ledger[column].astype("str")
+                trades.append(trade_ledger)
+
+        part = f"{created:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.write("runs", experiment, part, [pd.DataFrame(rows)])
+        self.write("equity", experiment, part, curves)
+        if trades:
+            self.write("trades", experiment, part, trades)
+        if self.max_parts:
+            self.merge_levels(experiment)
+        return [row["run_id"] for row in rows]
+
+    def write(self, table, experiment, part, frames, replaced=()):
+        """
+        Write frames in a new part file, one row group per frame, and publish it with an atomic rename
+
+        :param list replaced: Part files merged in the new one. They are removed before it is published,
+            so readers never see a run twice
+        """
+        folder = self.partition_path(table, experiment)
+        os.makedirs(folder, exist_ok=True)
+        tables = [pa.Table.from_pandas(frame, preserve_index=False) for frame in frames]
+        schema = pa.unify_schemas([table.schema for table in tables], promote_options="permissive")
+        column_encoding = COLUMN_ENCODINGS.get(table, {})
+        temporary_path = os.path.join(folder, f".{part}.tmp")
+        with pq.ParquetWriter(
+            temporary_path,
+            schema,
+            compression=self.compression,
+            use_dictionary=[name for name in schema.names if name not in column_encoding],
+            column_encoding=column_encoding or None,
+        ) as writer:
+            for frame_table in tables:
+                # Columns missing from a frame are written as nulls
+                columns = [
+                    frame_table[field.name].cast(field.type)
+                    if field.name in frame_table.column_names
+                    else pa.nulls(len(frame_table), field.type)
+                    for field in schema
+                ]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+        for path in replaced:
+            os.remove(path)
+        os.replace(temporary_path, os.path.join(folder, f"{part}.parquet"))
+
+    def partition_path(self, table, experiment):
+        return os.path.join(self.folder, table, f"experiment={experiment}")
+
+    def parts(self, table, experiment=None):
+        """Return the part files of a table, of all experiments if experiment is None"""
+        pattern = self.partition_path(table, "*" if experiment is None else experiment)
+        return sorted(glob.glob(os.path.join(pattern, "*.parquet")))
+
+    def dataset(self, table, experiment=None):
+        """Return a pyarrow dataset of a table. Parts with different columns are read with their union"""
+        parts = self.parts(table, experiment)
+        if not parts:
+            return None
+        self.schemas = {part: self.schemas.get(part) or pq.read_schema(part) for part in parts}
+        schema = pa.unify_schemas([self.schemas[part] for part in parts], promote_options="permissive")
+        return ds.dataset(
+            parts,
+            schema=schema.append(pa.field("experiment", pa.string())),
+            format="parquet",
+            partitioning=ds.partitioning(pa.schema([("experiment", pa.string())]), flavor="hive"),
+            partition_base_dir=os.path.join(self.folder, table),
+        )
+
+    def read(self, table, experiment=None, attempts=3, **scan_options):
+        """
+        Read a table as a pyarrow Table. Parts removed by a merge while reading are listed again
+
+        :param dict scan_options: columns and filter of pyarrow.dataset.Dataset.to_table
+        :return pyarrow.Table: None if the table has no parts
+        """
+        for attempt in range(attempts):
+            dataset = self.dataset(table, experiment)
+            if dataset is None:
+                return None
+            try:
+                return dataset.to_table(**scan_options)
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+
+    def experiments(self):
+        """Return the number of runs of each experiment"""
+        runs = self.runs(columns=["run_id"])
+        return runs.groupby("experiment").size().rename("runs") if not runs.empty else pd.Series(dtype=int)
+
+    def runs(self, experiment=None, filters=None, columns=None):
+        """
+        Return config, parameters and metrics of the runs
+
+        :param str experiment: Name of the experiment. None for all
+        :param list filters: (column, operator, value) tuples that must all hold,
+            e.g. [("sharpe_ratio", ">", 1), ("parameters.breakout", "in", [50, 100])]
+        :param list columns: Columns to read. None for all
+        :return pandas.DataFrame: One row per run, with its experiment
+        """
+        if columns is not None:
+            columns = list(dict.fromkeys(["run_id", *columns, "experiment"]))
+        runs = self.read(
+            "runs", experiment, columns=columns, filter=pq.filters_to_expression(filters) if filters else None
+        )
+        return runs.to_pandas() if runs is not None else pd.DataFrame(columns=["run_id", "experiment"])
+
+    def top(self, metric, k=10, experiment=None, filters=None, ascending=False):
+        """
+        Return the k best runs by a metric
+
+        :param str metric: Metric column
+        :param int k: Number of runs
+        :param bool ascending: Attribute to rank lower values first, e.g. for drawdowns as positive numbers
+        :return pandas.DataFrame: Runs sorted by the metric. Runs without it are left out
+        """
+        runs = self.runs(experiment, filters)
+        runs = runs.loc[runs[metric].notna()] if metric in runs else runs.iloc[:0]
+        return (runs.nsmallest(k, metric) if ascending else runs.nlargest(k, metric)).reset_index(drop=True)
+
+    def read_runs_rows(self, table, run_ids, experiment=None, columns=None):
+        """Read the rows of some runs from a table, skipping the row groups of other runs"""
+        rows = self.read(table, experiment, columns=columns, filter=ds.field("run_id").isin(list(run_ids)))
+        return rows.to_pandas() if rows is not None else pd.DataFrame()
+
+    def equity_curves(self, run_ids, experiment=None):
+        """
+        Load the equity curves of some runs
+
+        :return pandas.DataFrame: Dates x run ids
+        """
+        curves = self.read_runs_rows("equity", run_ids, experiment, ["run_id", "Dates", "Equity"])
+        if curves.empty:
+            return pd.DataFrame(columns=list(run_ids))
+        equity = curves.pivot(index="Dates", columns="run_id", values="Equity")
+        return equity.reindex(columns=[run_id for run_id in run_ids if run_id in equity])
+
+    def trades(self, run_ids, experiment=None):
+        """Load the trade ledgers of some runs, with a run_id column"""
+        return self.read_runs_rows("trades", run_ids, experiment)
+
+    def compact(self, experiment):
+        """
+        Merge all the part files of an experiment into one per table, sorted by run id
+
+        Parts appended while compacting are kept. Readers may miss the runs being merged for a moment
+        """
+        with self.merge_lock(experiment) as locked:
+            if not locked:
+                raise RuntimeError(f"Parts of {experiment} are being merged by another process")
+            parts = self.parts("runs", experiment)
+            if len(parts) > 1:
+                self.merge(experiment, [part_name(part) for part in parts], max(map(part_level, parts)) + 1)
+
+    def merge_levels(self, experiment):
+        """
+        Merge the parts of each level with max_parts parts into one part of the next level
+
+        One process merges an experiment at a time. The others skip it and keep appending
+        """
+        with self.merge_lock(experiment) as locked:
+            level = 0
+            while locked:
+                parts = [part for part in self.parts("runs", experiment) if part_level(part) == level]
+                if len(parts) < self.max_parts:
+                    return
+                self.merge(experiment, [part_name(part) for part in parts], level + 1)
+                level += 1
+
+    def merge(self, experiment, parts, level):
+        """Merge parts of an experiment, given by name, into one part of a level"""
+        merged_part = f"{LEVEL_PREFIX}{level}-{datetime.datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        for table in TABLES:
+            folder = self.partition_path(table, experiment)
+            paths = [
+                path for path in (os.path.join(folder, f"{part}.parquet") for part in parts) if os.path.exists(path)
+            ]
+            if not paths:
+                continue
+            frames = [pq.read_table(path).to_pandas() for path in paths]
+            if table == "runs":
+                frames = [pd.concat(frames, ignore_index=True).sort_values("run_id", kind="stable")]
+            else:
+                # Keep one row group per run
+                rows = pd.concat(frames, ignore_index=True)
+                frames = [run_rows for _, run_rows in rows.groupby("run_id", sort=True)]
+            self.write(table, experiment, merged_part, frames, replaced=paths)
+
+    @contextlib.contextmanager
+    def merge_lock(self, experiment):
+        """Hold the merge lock of an experiment. Gives False if another process holds it"""
+        path = os.path.join(self.folder, f".merge-{experiment}.lock")
+        with contextlib.suppress(FileNotFoundError):
+            if time.time() - os.path.getmtime(path) > self.lock_seconds:
+                os.remove(path)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            os.remove(path)
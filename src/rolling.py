@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+METRICS = ["alpha", "beta", "correlation", "residual_volatility"]
+
+
+def rolling_regression(returns, benchmarks, windows=(63, 126, 252, 504), periods=252, min_periods=None):
+    """
+    Rolling alpha, beta, correlation and residual volatility against one or more benchmarks
+
+    Window sums of x, y, x², y² and xy are differences of cumulative sums, so every window and
+    benchmark costs O(n) whatever its length. Days where either return is missing are skipped
+
+    :param returns: pandas.Series of daily returns or pandas.DataFrame with one column per curve
+    :param benchmarks: pandas.Series of benchmark daily returns or pandas.DataFrame with one column per benchmark
+    :param list windows: Window lengths in days
+    :param int periods: Days per year used to annualize alpha and residual volatility
+    :param int min_periods: Minimum # of valid days in a window. None requires all of them
+    :return pandas.DataFrame: Columns (metric, benchmark, window) for a Series of returns,
+        (metric, benchmark, window, curve) for a DataFrame
+    """
+    single_curve = isinstance(returns, pd.Series)
+    curves = returns.to_frame() if single_curve else returns
+    benchmarks = benchmarks.to_frame() if isinstance(benchmarks, pd.Series) else benchmarks
+    benchmarks = benchmarks.reindex(curves.index)
+
+    # days x benchmarks x curves
+    y = curves.to_numpy(float)[:, None, :]
+    x = benchmarks.to_numpy(float)[:, :, None]
+    valid = ~np.isnan(x) & ~np.isnan(y)
+
+    # Centering keeps the differences of cumulative sums accurate
+    x_center, y_center = np.nanmean(x, axis=0), np.nanmean(y, axis=0)
+    x, y = np.where(valid, x - x_center, 0), np.where(valid, y - y_center, 0)
+
+    def cumulative(values):
+        return np.concatenate([np.zeros((1, *values.shape[1:])), np.cumsum(values, axis=0)])
+
+    sums = {
+        "n": cumulative(valid.astype(float)),
+        "x": cumulative(x),
+        "y": cumulative(y),
+        "xx": cumulative(x * x),
+        "yy": cumulative(y * y),
+        "xy": cumulative(x * y),
+    }
+
+    window_metrics = []
+    for window in windows:
+        # Sums over the window ending on each day
+        window_sums = {}
+        for name, cumulative_sum in sums.items():
+            window_sum = np.full_like(cumulative_sum[1:], np.NaN)
+            window_sum[window - 1 :] = cumulative_sum[window:] - cumulative_sum[:-window]
+            window_sums[name] = window_sum
+
+        n = window_sums["n"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_x, mean_y = window_sums["x"] / n, window_sums["y"] / n
+            variance_x = window_sums["xx"] / n - mean_x**2
+            variance_y = window_sums["yy"] / n - mean_y**2
+            covariance = window_sums["xy"] / n - mean_x * mean_y
+
+            beta = covariance / variance_x
+            daily_alpha = (mean_y + y_center) - beta * (mean_x + x_center)
+            residual_variance = np.maximum(variance_y - beta * covariance, 0) * n / (n - 1)
+            metrics = {
+                "alpha": (1 + daily_alpha) ** periods - 1,
+                "beta": beta,
+                "correlation": covariance / np.sqrt(variance_x * variance_y),
+                "residual_volatility": np.sqrt(residual_variance * periods),
+            }
+
+        enough_days = n >= (min_periods or window)
+        window_metrics.append(
+            np.stack([np.where(enough_days, metrics[metric], np.NaN) for metric in METRICS], axis=1)
+        )
+
+    # days x metrics x benchmarks x windows x curves
+    values = np.stack(window_metrics, axis=3)
+    rolling = pd.DataFrame(
+        values.reshape(len(curves), -1),
+        index=curves.index,
+        columns=pd.MultiIndex.from_product(
+            [METRICS, benchmarks.columns, list(windows), curves.columns],
+            names=["metric", "benchmark", "window", "curve"],
+        ),
+    )
+    if single_curve:
+        rolling.columns = rolling.columns.droplevel("curve")
+    return rolling
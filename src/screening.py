@@ -0,0 +1,206 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.backtesting_engine import Backtester
+from src.panel import build_panel
+from src.position_builders import get_exchange_rates
+from src.walk_forward import expand_grid, sharpe_ratio
+
+logger = logging.getLogger(__name__)
+
+ORDER_DIRECTIONS = {"long": 1, "short": -1, "flat": 0}
+
+
+def forward_fill(values, limit=None):
+    """Forward fill a days x markets array along the days"""
+    return pd.DataFrame(values).ffill(limit=limit).to_numpy()
+
+
+def fast_simulate(
+    all_markets_df,
+    markets_list,
+    specifications,
+    initial_equity,
+    position_risk,
+    commission,
+    local_currency=False,
+    currencies_df=None,
+    fee=False,
+    fee_structure=(0, 0),
+    sizing="trade_start",
+    iterations=2,
+):
+    """
+    Approximate simulation with array operations only, for screening parameter sets
+
+    Positions are sized on a fixed equity (sizing="fixed") or on the equity of the day before
+    the order, taken from the previous iteration's equity curve (sizing="trade_start").
+    Performance fees are approximated as paid on every new high of the equity net of management fees
+
+    :param pandas.DataFrame all_markets_df: df including historical data
+    :param list markets_list: List of all available markets
+    :param pandas.DataFrame specifications: Futures contracts specifications
+    :param float initial_equity: Initial equity level
+    :param float position_risk: % risk level for each new position
+    :param float commission: Commission per trade
+    :param bool local_currency: Attribute to signal if the conversion in USD is needed
+    :param pandas.DataFrame currencies_df: df including exchange rates
+    :param bool fee: Attribute to include fees
+    :param list fee_structure: Mgmt fee and performance fee
+    :param str sizing: fixed or trade_start
+    :param int iterations: Number of passes refining the trade start equity
+    :return dict: Equity and Margin series, Contracts and P/L days x markets dfs
+    """
+    dates = all_markets_df.index
+    days = np.arange(len(dates))[:, None]
+
+    def columns(name, dtype=float):
+        return all_markets_df[[f"{market} {name}" for market in markets_list]].to_numpy(dtype)
+
+    close, support, resistance = columns("Close"), columns("Support"), columns("Resistance")
+    orders = columns("Order", object)
+
+    market_specifications = specifications.set_index(specifications.Symbol.astype("str")).loc[
+        [market.split("_")[0] for market in markets_list]
+    ]
+    point_value = market_specifications.Point_Value.to_numpy(float)
+    margin_requirement = market_specifications.Margin.to_numpy(float)
+    rates = np.ones(close.shape)
+    if local_currency:
+        # Like the engine, a missing rate is an error rather than a rate of 1
+        currencies = market_specifications.Currency.tolist()
+        rates = get_exchange_rates(currencies_df, currencies, dates, missing=np.NaN)
+        if np.isnan(rates).any():
+            has_gaps = np.isnan(rates).any(axis=0)
+            missing = sorted({currency for currency, has_gap in zip(currencies, has_gaps) if has_gap})
+            raise ValueError(f"Missing exchange rates in the 9 days before a day. Currencies: {missing}")
+
+    # Orders are executed the day after the signal
+    order_direction = np.full(close.shape, np.NaN)
+    for order, direction in ORDER_DIRECTIONS.items():
+        order_direction[orders == order] = direction
+    execution = np.vstack([np.full((1, close.shape[1]), np.NaN), order_direction[:-1]])
+    is_execution = ~np.isnan(execution)
+
+    # Position points of the last close in the previous 10 days, like get_position_points
+    valid_close = ~np.isnan(close)
+    last_close_row = forward_fill(np.where(valid_close, days, np.NaN), limit=9)
+    has_points = ~np.isnan(last_close_row)
+    last_close_row = np.where(has_points, last_close_row, 0).astype(int)
+    entry_close = np.take_along_axis(close, last_close_row, axis=0)
+    entry_support = np.take_along_axis(support, last_close_row, axis=0)
+    entry_resistance = np.take_along_axis(resistance, last_close_row, axis=0)
+
+    long_risk = entry_close - entry_support
+    long_risk = np.where((long_risk != 0) & ~np.isnan(entry_support), long_risk, entry_close * position_risk)
+    short_risk = entry_resistance - entry_close
+    short_risk = np.where(
+        (short_risk != 0) & ~np.isnan(entry_resistance), short_risk, entry_close * position_risk
+    )
+    risk_per_contract = np.where(execution == -1, short_risk, long_risk) * point_value
+
+    # Daily change from the last close in the previous 9 days, like get_price_changes
+    previous_close = np.vstack([np.full((1, close.shape[1]), np.NaN), forward_fill(close, 8)[:-1]])
+    daily_change = np.nan_to_num(close - previous_close) * point_value * rates
+    margin_per_contract = margin_requirement * rates
+
+    sizing_equity = np.full(len(dates), float(initial_equity))
+    for _ in range(iterations if sizing == "trade_start" else 1):
+        # Size positions on execution days and hold them until the next order
+        with np.errstate(invalid="ignore", divide="ignore"):
+            new_contracts = np.where(
+                execution == 0,
+                0,
+                execution * np.ceil(position_risk * sizing_equity[:, None] / risk_per_contract),
+            )
+        new_contracts = np.where(is_execution & has_points, new_contracts, np.NaN)
+        contracts = np.nan_to_num(forward_fill(new_contracts))
+
+        pnl = daily_change * contracts
+        commissions = np.where(is_execution, contracts, 0) * commission * 2
+        gross_equity = initial_equity + np.cumsum(pnl.sum(axis=1) - commissions.sum(axis=1))
+
+        equity = gross_equity
+        if fee:
+            # Management fee compounds daily: E[t] = (E[t-1] + P/L[t]) * decay
+            decay = 1 - fee_structure[0] / 365
+            decay_power = decay ** days[:, 0]
+            equity = decay_power * (
+                initial_equity + np.cumsum(np.diff(gross_equity, prepend=initial_equity) * decay / decay_power)
+            )
+            # Performance fee is paid on every new high of the equity
+            performance_fees = (np.maximum.accumulate(equity) - initial_equity) * fee_structure[1]
+            equity = equity - np.maximum(performance_fees, 0)
+
+        # Next pass sizes each trade on the equity of the day before its execution
+        sizing_equity = np.concatenate([[initial_equity], equity[:-1]])
+
+    return {
+        "Equity": pd.Series(equity, index=dates, name="Equity"),
+        "Margin": pd.Series(
+            (np.abs(contracts) * margin_per_contract).sum(axis=1), index=dates, name="Margin"
+        ),
+        "Contracts": pd.DataFrame(contracts, index=dates, columns=markets_list),
+        "P/L": pd.DataFrame(pnl, index=dates, columns=markets_list),
+    }
+
+
+def screen_parameters(
+    markets_data,
+    parameter_grid,
+    settings,
+    objective=sharpe_ratio,
+    sizing="trade_start",
+    top=5,
+    cache=None,
+):
+    """
+    Rank parameter sets with the fast simulation and re-run the best ones with the exact engine
+
+    :param dict markets_data: Market name -> df with Symbol and PX_LAST columns indexed by date
+    :param dict parameter_grid: strategy.compute_indicators parameter -> list of values to sweep
+    :param dict settings: Backtester keyword arguments except all_markets_df and orders_df.
+        specifications is required
+    :param function objective: Function scoring an equity curve. Higher is better
+    :param str sizing: fixed or trade_start
+    :param int top: Number of parameter sets re-run with the exact engine
+    :param IndicatorCache cache: Memoizes indicators shared by the parameter sets
+    :return pandas.DataFrame: Parameters, screening score and exact score of the top sets
+    """
+    parameter_sets = expand_grid(parameter_grid)
+    screening_settings = {
+        key: settings[key]
+        for key in [
+            "markets_list",
+            "specifications",
+            "initial_equity",
+            "position_risk",
+            "commission",
+            "local_currency",
+            "currencies_df",
+            "fee",
+            "fee_structure",
+        ]
+        if key in settings
+    }
+
+    logger.info(f"Screening {len(parameter_sets)} parameter sets...")
+    signals, rows = [], []
+    for parameters in parameter_sets:
+        all_markets_df, orders_df = build_panel(markets_data, parameters, cache)
+        signals.append((all_markets_df, orders_df))
+        equity = fast_simulate(all_markets_df, sizing=sizing, **screening_settings)["Equity"]
+        rows.append({**parameters, "screening_score": objective(equity)})
+
+    ranking = pd.DataFrame(rows).sort_values("screening_score", ascending=False)
+
+    logger.info(f"Re-running the best {top} parameter sets with the exact engine...")
+    ranking["exact_score"] = np.NaN
+    for parameters_idx in ranking.index[:top]:
+        all_markets_df, orders_df = signals[parameters_idx]
+        backtester = Backtester(all_markets_df, orders_df=orders_df.copy(), progress=False, **settings)
+        ranking.loc[parameters_idx, "exact_score"] = objective(backtester.simulate()[0].Equity)
+
+    return ranking
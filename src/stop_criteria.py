@@ -0,0 +1,147 @@
+import numpy as np
+
+
+class StopCriterion:
+    """
+    Base class of the rules ending a simulation early
+
+    start is called once before the day loop and check after the equity of each day is final.
+    check returns the reason code when the run has to stop, None otherwise.
+    Values of the day are read from backtester.state, the arrays of the columns being simulated
+    """
+
+    def start(self, backtester):
+        """
+        Reset the state of the criterion for a new run
+
+        :param Backtester backtester: Simulation being run
+        """
+
+    def check(self, backtester, date_idx):
+        """
+        :param Backtester backtester: Simulation being run
+        :param int date_idx: Row index of the day just simulated
+        :return str: Reason code or None
+        """
+        raise NotImplementedError
+
+
+class MaxDrawdown(StopCriterion):
+    """
+    Stop when the equity falls more than limit below its highest level
+    """
+
+    def __init__(self, limit):
+        """
+        :param float limit: Maximum drawdown as a positive fraction, e.g. 0.3
+        """
+        self.limit = limit
+        self.peak = None
+
+    def start(self, backtester):
+        self.peak = backtester.state[backtester.general_equity_idx][0]
+
+    def check(self, backtester, date_idx):
+        equity = backtester.state[backtester.general_equity_idx][date_idx]
+        self.peak = max(self.peak, equity)
+        if equity < self.peak * (1 - self.limit):
+            return "max_drawdown"
+        return None
+
+
+class MarginToEquity(StopCriterion):
+    """
+    Stop when the margin requirement exceeds a fraction of the equity
+    """
+
+    def __init__(self, ceiling):
+        """
+        :param float ceiling: Maximum margin to equity ratio, e.g. 0.5
+        """
+        self.ceiling = ceiling
+
+    def check(self, backtester, date_idx):
+        margin = backtester.state[backtester.general_margin_idx][date_idx]
+        if margin > self.ceiling * backtester.state[backtester.general_equity_idx][date_idx]:
+            return "margin_to_equity"
+        return None
+
+
+class EquityFloor(StopCriterion):
+    """
+    Stop when the equity falls below a level
+    """
+
+    def __init__(self, floor):
+        """
+        :param float floor: Minimum equity level
+        """
+        self.floor = floor
+
+    def check(self, backtester, date_idx):
+        if backtester.state[backtester.general_equity_idx][date_idx] < self.floor:
+            return "equity_floor"
+        return None
+
+
+class TradesPerYear(StopCriterion):
+    """
+    Stop when the number of new positions per year is out of bounds
+
+    The rate is checked only after min_years, so a slow start does not end the run
+    """
+
+    def __init__(self, minimum=None, maximum=None, min_years=1):
+        """
+        :param float minimum: Minimum number of new positions per year. None for no bound
+        :param float maximum: Maximum number of new positions per year. None for no bound
+        :param float min_years: Years simulated before the rate is checked
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.min_years = min_years
+        self.trades = None
+        self.years = None
+
+    def start(self, backtester):
+        # Long and short orders given on each day are executed the day after
+        order_columns = [f"{book} Order" for book in backtester.books]
+        orders = backtester.data[order_columns].to_numpy(object)
+        new_positions = ((orders == "long") | (orders == "short")).sum(axis=1)
+        self.trades = np.concatenate([[0], np.cumsum(new_positions)[:-1]])
+
+        dates = backtester.data.index
+        self.years = ((dates - dates[0]).days / 365.25).to_numpy()
+
+    def check(self, backtester, date_idx):
+        years = self.years[date_idx]
+        if years < self.min_years:
+            return None
+        trades_per_year = self.trades[date_idx] / years
+        if self.maximum is not None and trades_per_year > self.maximum:
+            return "max_trades_per_year"
+        if self.minimum is not None and trades_per_year < self.minimum:
+            return "min_trades_per_year"
+        return None
+
+
+def make_stop_criteria(settings):
+    """
+    Build the stop criteria from the stop_criteria settings
+
+    :param dict settings: max_drawdown, max_margin_to_equity, equity_floor,
+        min_trades_per_year and max_trades_per_year. None disables a criterion
+    :return list: StopCriterion objects
+    """
+    stop_criteria = []
+    if settings.get("max_drawdown") is not None:
+        stop_criteria.append(MaxDrawdown(settings["max_drawdown"]))
+    if settings.get("max_margin_to_equity") is not None:
+        stop_criteria.append(MarginToEquity(settings["max_margin_to_equity"]))
+    if settings.get("equity_floor") is not None:
+        stop_criteria.append(EquityFloor(settings["equity_floor"]))
+    if settings.get("min_trades_per_year") is not None or settings.get("max_trades_per_year") is not None:
+        stop_criteria.append(
+            TradesPerYear(settings.get("min_trades_per_year"), settings.get("max_trades_per_year"))
+        )
+    return stop_criteria
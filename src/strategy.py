@@ -0,0 +1,98 @@
+import numpy as np
+
+import src.indicators as indicators
+
+
+def compute_indicators(
+    market_data,
+    fast_ma=100,
+    slow_ma=200,
+    breakout=100,
+    exit_breakout=50,
+    volatility_window=100,
+    volatility_ma=20,
+    vol_parameter=3,
+    cache=None,
+):
+    """Function to add the strategy indicators to a market's data
+
+    vol_parameter is the # of sigmas needed to trigger an exit for volatility.
+    cache is an IndicatorCache used to skip indicators already computed on the same prices
+    """
+    if cache is not None and not market_data.empty:
+        indicator = cache.bind(market_data.Symbol.iloc[0], market_data.PX_LAST)
+    else:
+        indicator = lambda function, periods: function(market_data.PX_LAST, periods)
+
+    market_data["fast_ma"] = indicator(indicators.simple_moving_average, fast_ma)
+    market_data["slow_ma"] = indicator(indicators.simple_moving_average, slow_ma)
+
+    market_data["resistance"] = indicator(indicators.local_max, breakout)
+    market_data["support"] = indicator(indicators.local_min, breakout)
+
+    market_data["exit_resistance"] = indicator(indicators.local_max, exit_breakout)
+    market_data["exit_support"] = indicator(indicators.local_min, exit_breakout)
+
+    market_data["standard_deviation"] = indicator(indicators.standard_deviation, volatility_window)
+
+    market_data["vol_support"] = (
+        indicator(indicators.simple_moving_average, volatility_ma)
+        - market_data.standard_deviation * vol_parameter
+    )
+
+    market_data["vol_resistance"] = (
+        indicator(indicators.simple_moving_average, volatility_ma)
+        + market_data.standard_deviation * vol_parameter
+    )
+
+    return market_data
+
+
+def generate_orders(market_data):
+    """Function to convert entry / exit rules into orders
+
+    Adds the Order column to market_data and returns the position changes only
+    """
+    # Short rules
+    short_entry_rule = (market_data.PX_LAST < market_data.support) & (
+        market_data.fast_ma < market_data.slow_ma
+    )
+
+    short_exit_rule = (market_data.PX_LAST > market_data.exit_resistance) | (
+        market_data.PX_LAST < market_data.vol_support
+    )
+
+    # Long rules
+    long_entry_rule = (market_data.PX_LAST > market_data.resistance) & (
+        market_data.fast_ma > market_data.slow_ma
+    )
+
+    long_exit_rule = (market_data.PX_LAST < market_data.exit_support) | (
+        market_data.PX_LAST > market_data.vol_resistance
+    )
+
+    # Compute signals
+    market_data["short_signal"] = np.where(
+        short_entry_rule, "short", np.where(short_exit_rule, "flat", None)
+    )
+
+    market_data["long_signal"] = np.where(
+        long_entry_rule, "long", np.where(long_exit_rule, "flat", None)
+    )
+
+    # Converting signals to orders
+    market_data["short_signal"] = market_data.short_signal.shift(1).ffill()
+    market_data["long_signal"] = market_data.long_signal.shift(1).ffill()
+    market_data["Order"] = market_data.long_signal + market_data.short_signal
+    market_data.Order = (
+        market_data.Order.replace(["longflat", "flatflat", "flatshort"], ["long", "flat", "short"])
+    )
+    market_orders = market_data.where(
+        (market_data.Order != market_data.Order.shift()), other=None
+    ).dropna()[["Symbol", "Order"]]
+
+    # Skip first line if it's not a new position
+    if not market_orders.empty and market_orders.Order.iloc[0] == "flat":
+        market_orders = market_orders[1:]
+
+    return market_orders
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+SIDES = {"long": 1, "short": -1}
+
+
+class TradeLedger:
+    """
+    Class used to record trades while the backtester simulates
+
+    Fields live in preallocated numpy arrays that double when full. Each market has at most one open
+    trade, whose max adverse and max favorable excursions are updated in O(1) with the daily P/L
+    """
+
+    def __init__(self, markets_list, dates, capacity=1024, strategies=None):
+        """
+        :param list markets_list: List of all available markets. With several strategies, the market of each book
+        :param pandas.DatetimeIndex dates: Calendar of the simulation
+        :param int capacity: Initial number of trades the arrays can hold
+        :param list strategies: Strategy id of each book. None for a single strategy
+        """
+        self.markets_list = markets_list
+        self.strategies = strategies
+        self.dates = dates
+        self.size = 0
+        self.open_trades = {}
+        self.fields = {
+            "market": np.zeros(capacity, dtype=np.int32),
+            "side": np.zeros(capacity, dtype=np.int8),
+            "entry": np.zeros(capacity, dtype=np.int32),
+            "exit": np.full(capacity, -1, dtype=np.int32),
+            "contracts": np.zeros(capacity, dtype=np.int64),
+            "risk": np.zeros(capacity, dtype=np.float64),
+            "mae": np.zeros(capacity, dtype=np.float64),
+            "mfe": np.zeros(capacity, dtype=np.float64),
+            "pnl": np.zeros(capacity, dtype=np.float64),
+        }
+
+    def open(self, market_idx, side, date_idx, contracts, risk):
+        """
+        Open a trade
+
+        :param int market_idx: Position of the market (book) in markets_list
+        :param str side: long or short
+        :param int date_idx: Row index of the execution day
+        :param int contracts: # of contracts. Negative for shorts
+        :param float risk: Starting risk in the market's currency
+        """
+        if self.size == len(self.fields["market"]):
+            for name, values in self.fields.items():
+                grown = np.full(2 * len(values), -1 if name == "exit" else 0, dtype=values.dtype)
+                grown[: self.size] = values[: self.size]
+                self.fields[name] = grown
+
+        trade_idx = self.size
+        self.fields["market"][trade_idx] = market_idx
+        self.fields["side"][trade_idx] = SIDES[side]
+        self.fields["entry"][trade_idx] = date_idx
+        self.fields["contracts"][trade_idx] = contracts
+        self.fields["risk"][trade_idx] = risk
+        self.open_trades[market_idx] = trade_idx
+        self.size += 1
+
+    def close(self, market_idx, date_idx, pnl):
+        """
+        Close the open trade of a market, if any
+
+        :param int market_idx: Position of the market (book) in markets_list
+        :param int date_idx: Row index of the execution day
+        :param float pnl: Final P/L of the trade
+        """
+        trade_idx = self.open_trades.pop(market_idx, None)
+        if trade_idx is not None:
+            self.fields["exit"][trade_idx] = date_idx
+            self.fields["pnl"][trade_idx] = pnl
+
+    def update(self, market_idx, pnl):
+        """Update P/L and excursions of the open trade of a market with its P/L of the day"""
+        trade_idx = self.open_trades.get(market_idx)
+        if trade_idx is None:
+            return
+        self.fields["pnl"][trade_idx] = pnl
+        if pnl < self.fields["mae"][trade_idx]:
+            self.fields["mae"][trade_idx] = pnl
+        elif pnl > self.fields["mfe"][trade_idx]:
+            self.fields["mfe"][trade_idx] = pnl
+
+    def to_frame(self):
+        """
+        Return the trades as a typed table
+
+        P/L, risk and excursions are in the market's currency, as the orders summary.
+        Open trades have no exit date and their P/L is the one of the last simulated day
+
+        :return pandas.DataFrame: Symbol, Side, Entry_date, Exit_date, Contracts, Risk, MAE, MFE, Pnl.
+            Strategy first with several strategies
+        """
+        fields = {name: values[: self.size] for name, values in self.fields.items()}
+        exits = fields["exit"]
+        trades = pd.DataFrame(
+            {
+                "Symbol": self.categorical(self.markets_list, fields["market"]),
+                "Side": pd.Categorical.from_codes(
+                    (fields["side"] < 0).astype(np.int8), categories=["long", "short"]
+                ),
+                "Entry_date": self.dates[fields["entry"]],
+                "Exit_date": pd.DatetimeIndex(
+                    np.where(exits >= 0, self.dates.values[np.maximum(exits, 0)], np.datetime64("NaT"))
+                ),
+                "Contracts": fields["contracts"],
+                "Risk": fields["risk"],
+                "MAE": fields["mae"],
+                "MFE": fields["mfe"],
+                "Pnl": fields["pnl"],
+            }
+        )
+        if self.strategies is not None:
+            trades.insert(0, "Strategy", self.categorical(self.strategies, fields["market"]))
+        return trades
+
+    @staticmethod
+    def categorical(labels, codes):
+        """Return the labels of the trades' books as a categorical. Books can share labels"""
+        categories = list(dict.fromkeys(labels))
+        label_codes = np.array([categories.index(label) for label in labels], dtype=np.int32)
+        return pd.Categorical.from_codes(label_codes[codes], categories=categories)
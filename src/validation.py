@@ -0,0 +1,222 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.panel import book_name
+from src.position_builders import as_of
+
+logger = logging.getLogger(__name__)
+
+ORDER_TYPES = ["long", "short", "flat"]
+REPORT_COLUMNS = ["severity", "check", "market", "count", "first_date", "last_date", "detail"]
+
+
+class ValidationError(Exception):
+    """
+    Raised when the inputs of a simulation are incomplete. The report lists every problem
+    """
+
+    def __init__(self, report):
+        self.report = report
+        errors = report.loc[report.severity == "error"]
+        super().__init__(
+            f"{len(errors)} input problems: "
+            + "; ".join(f"{row.check} {row.market} ({row.count})" for row in errors.itertuples())
+        )
+
+
+def problem(severity, check, market, dates, detail=""):
+    """Function to summarize a problem found on some dates as a report row"""
+    dates = pd.DatetimeIndex(dates)
+    return {
+        "severity": severity,
+        "check": check,
+        "market": market,
+        "count": max(len(dates), 1),
+        "first_date": dates.min() if len(dates) else pd.NaT,
+        "last_date": dates.max() if len(dates) else pd.NaT,
+        "detail": detail,
+    }
+
+
+def validate_inputs(
+    all_markets_df,
+    markets_list,
+    orders_df,
+    specifications,
+    currencies_df=None,
+    local_currency=False,
+    max_gap=9,
+    strategies=None,
+    calendar=None,
+):
+    """
+    Check panel, orders, contracts specifications and FX coverage before a simulation
+
+    Errors are the problems that would stop the backtester: unknown orders, orders executed without
+    a close in the previous 10 days, markets without specifications and days without exchange rate.
+    Warnings are gaps that silently zero the daily change and orders of unknown markets
+
+    :param pandas.DataFrame all_markets_df: df including historical data
+    :param list markets_list: List of all available markets
+    :param pandas.DataFrame orders_df: df summarizing all trading orders
+    :param pandas.DataFrame specifications: Futures contracts specifications
+    :param pandas.DataFrame currencies_df: df including exchange rates
+    :param bool local_currency: Attribute to signal if the conversion in USD is needed
+    :param int max_gap: Days a close or an exchange rate can be carried forward, like the engine
+    :param list strategies: Strategy ids of a multi strategy panel. Orders are checked for each of them
+    :param BarCalendar calendar: Timing of the bars. With intraday bars close gaps are measured in time and
+        exchange rates can be as old as its fx_tolerance
+    :return pandas.DataFrame: One row per problem and market. Empty if the inputs are complete
+    """
+    dates = all_markets_df.index
+    days = np.arange(len(dates))[:, None]
+    problems = []
+
+    # Contracts specifications
+    symbols = specifications.Symbol.astype("str")
+    market_specifications = specifications.assign(Symbol=symbols).drop_duplicates("Symbol").set_index("Symbol")
+    for market in markets_list:
+        market_name = market.split("_")[0]
+        if market_name not in market_specifications.index:
+            problems.append(problem("error", "missing_specification", market, [], "Not in contracts details"))
+            continue
+        missing_fields = market_specifications.loc[
+            market_name, ["Currency", "Point_Value", "Margin"]
+        ].isna()
+        if missing_fields.any():
+            problems.append(
+                problem(
+                    "error",
+                    "incomplete_specification",
+                    market,
+                    [],
+                    f"Missing {', '.join(missing_fields.index[missing_fields])}",
+                )
+            )
+
+    # Orders of each strategy. The engine executes any value of the order column that is not NaN
+    books = [
+        (book_name(strategy_id, market), market)
+        for strategy_id in strategies or [None]
+        for market in markets_list
+    ]
+    orders = all_markets_df[[f"{book} Order" for book, _ in books]].to_numpy(object)
+    given = ~pd.isna(orders) | np.equal(orders, None)
+    unknown = given & ~np.isin(orders, ORDER_TYPES)
+
+    # Orders are executed the day after and need a close in the previous 10 days
+    close = all_markets_df[[f"{market} Close" for _, market in books]].to_numpy(float)
+    has_close = ~np.isnan(close)
+    last_close = pd.DataFrame(np.where(has_close, days, np.NaN)).ffill(limit=max_gap).notna().to_numpy()
+    executed = np.zeros_like(given)
+    executed[1:] = given[:-1]
+    missing_close = executed & ~last_close
+
+    # After a gap longer than max_gap the first close has no previous one and its daily change is 0
+    intraday = calendar is not None and calendar.intraday
+    previous_close = np.zeros_like(has_close)
+    if intraday:
+        last_close_day = np.maximum.accumulate(np.where(has_close, days, 0), axis=0)
+        elapsed = dates.asi8[1:, None] - dates.asi8[last_close_day[:-1]]
+        previous_close[1:] = elapsed <= calendar.max_gap.value
+    else:
+        previous_close[1:] = (
+            pd.DataFrame(np.where(has_close, days, np.NaN)).ffill(limit=max_gap - 1).notna().to_numpy()[:-1]
+        )
+    long_gap = has_close & ~previous_close & (np.cumsum(has_close, axis=0) > 1)
+    gap_detail = f"{calendar.max_gap}" if intraday else f"{max_gap} days"
+
+    for book_idx, (book, market) in enumerate(books):
+        if unknown[:, book_idx].any():
+            values = sorted({str(order) for order in orders[unknown[:, book_idx], book_idx]})
+            problems.append(
+                problem("error", "unknown_order", book, dates[unknown[:, book_idx]], f"Orders: {values}")
+            )
+        if missing_close[:, book_idx].any():
+            problems.append(
+                problem(
+                    "error",
+                    "missing_close_at_order",
+                    book,
+                    dates[missing_close[:, book_idx]],
+                    f"No close in the {max_gap + 1} days before the execution",
+                )
+            )
+        # Strategies share the close, so its gaps are reported once
+        if book_idx < len(markets_list) and long_gap[:, book_idx].any():
+            problems.append(
+                problem(
+                    "warning",
+                    "close_gap",
+                    market,
+                    dates[long_gap[:, book_idx]],
+                    f"Daily change is 0 after more than {gap_detail} without close",
+                )
+            )
+
+    # Exchange rates of every simulated day, looked up as of the day like the engine.
+    # convert_to_usd finds the currency by the full market name
+    fx_tolerance = calendar.fx_tolerance if calendar is not None else pd.Timedelta(days=max_gap)
+    if local_currency:
+        for market in markets_list:
+            if market.split("_")[0] not in market_specifications.index:
+                continue
+            if market not in market_specifications.index:
+                problems.append(
+                    problem("error", "missing_currency_specification", market, [], "Not in contracts details")
+                )
+                continue
+            currency = market_specifications.at[market, "Currency"]
+            if currency == "USD" or pd.isna(currency):
+                continue
+            if currencies_df is None or currency not in currencies_df:
+                problems.append(problem("error", "missing_currency", market, [], f"No rates for {currency}"))
+                continue
+            rates = pd.Series(as_of(currencies_df[currency], dates, fx_tolerance))
+            if rates.isna().any():
+                problems.append(
+                    problem(
+                        "error",
+                        "missing_fx_rate",
+                        market,
+                        dates[rates.isna().to_numpy()],
+                        f"No {currency} rate in the {fx_tolerance} before",
+                    )
+                )
+
+    # Orders summary
+    if orders_df is not None and not orders_df.empty:
+        unknown_markets = ~orders_df.Symbol.astype("str").isin(markets_list)
+        if unknown_markets.any():
+            for market, market_orders in orders_df.loc[unknown_markets].groupby(
+                orders_df.Symbol.astype("str")
+            ):
+                problems.append(
+                    problem("warning", "unknown_market_order", market, market_orders.Dates, "Not in the panel")
+                )
+
+    return pd.DataFrame(problems, columns=REPORT_COLUMNS)
+
+
+def check_inputs(*args, **kwargs):
+    """
+    Validate the inputs and raise ValidationError if any error is found
+
+    Takes the arguments of validate_inputs
+    :return pandas.DataFrame: Report of the warnings
+    """
+    report = validate_inputs(*args, **kwargs)
+    for row in report.itertuples():
+        log = logger.error if row.severity == "error" else logger.warning
+        if pd.isna(row.first_date):
+            log(f"{row.check} {row.market}. {row.detail}")
+        else:
+            log(
+                f"{row.check} {row.market}: {row.count} days from {row.first_date:%Y-%m-%d} "
+                f"to {row.last_date:%Y-%m-%d}. {row.detail}"
+            )
+    if (report.severity == "error").any():
+        raise ValidationError(report)
+    return report
@@ -0,0 +1,225 @@
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.backtesting_engine import Backtester
+from src.bars import daily_bars
+from src.panel import build_panel
+
+# Shared by the sweep workers. Set once per process by init_worker
+_worker_state = {}
+
+
+def expand_grid(parameter_grid):
+    """Function to turn {parameter: [values]} into the list of all parameter sets"""
+    names = list(parameter_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*parameter_grid.values())]
+
+
+def make_folds(dates, train_years, test_years, anchored=False):
+    """
+    Split the calendar into train / test folds. Test periods are consecutive and do not overlap
+
+    :param pandas.DatetimeIndex dates: Sorted calendar of the backtest
+    :param float train_years: Length of each train period
+    :param float test_years: Length of each test period
+    :param bool anchored: Attribute to start every train period at the beginning of the calendar
+    :return list: (train_start, train_end, test_start, test_end) row positions. Ends are excluded
+    """
+    train_length = pd.DateOffset(months=int(train_years * 12))
+    test_length = pd.DateOffset(months=int(test_years * 12))
+
+    folds = []
+    test_start = dates.searchsorted(dates[0] + train_length)
+    while test_start < len(dates):
+        test_end = dates.searchsorted(dates[test_start] + test_length)
+        train_start = 0 if anchored else dates.searchsorted(dates[test_start] - train_length)
+        folds.append((train_start, test_start, test_start, test_end))
+        test_start = test_end
+    return folds
+
+
+def sharpe_ratio(equity, periods=252):
+    """Annualized sharpe ratio of an equity curve. Intraday curves are resampled to their last bar of each day"""
+    returns = daily_bars(equity).pct_change().dropna()
+    if returns.std() == 0 or np.isnan(returns.std()):
+        return np.NaN
+    return returns.mean() / returns.std() * np.sqrt(periods)
+
+
+def stitch_equity(equity_curves, initial_equity):
+    """Function to chain the returns of consecutive equity curves into one curve"""
+    returns = pd.concat([equity.pct_change().fillna(0) for equity in equity_curves])
+    return initial_equity * (1 + returns).cumprod()
+
+
+def run_window(panel, orders_df, start, end, settings, stop_criteria=None):
+    """
+    Simulate a slice of a precomputed panel
+
+    Indicators were computed on the full history, so the window needs no warm-up period.
+    The simulation starts flat and only executes orders given inside the window
+
+    :param pandas.DataFrame panel: All markets df built over the full history
+    :param pandas.DataFrame orders_df: Orders over the full history
+    :param int start: First row of the window
+    :param int end: Row after the last one of the window
+    :param dict settings: Backtester keyword arguments
+    :param list stop_criteria: StopCriterion objects ending the simulation early
+    :return Backtester: Simulated backtester. Results are returned by its cached simulate
+    """
+    window = panel.iloc[start:end]
+    window_orders = orders_df
+    if not orders_df.empty:
+        window_orders = orders_df.loc[
+            (orders_df.Dates >= window.index[0]) & (orders_df.Dates <= window.index[-1])
+        ].reset_index(drop=True)
+
+    backtester = Backtester(
+        window,
+        orders_df=window_orders.copy(),
+        progress=False,
+        stop_criteria=stop_criteria,
+        **settings,
+    )
+    backtester.simulate()
+    return backtester
+
+
+def init_worker(state):
+    _worker_state.update(state)
+
+
+def run_sweep_task(task):
+    """Worker task: score a parameter set on a window. Runs ended by a stop criterion score NaN"""
+    parameters_idx, start, end = task
+    panel, orders_df = _worker_state["signals"][parameters_idx]
+    backtester = run_window(
+        panel, orders_df, start, end, _worker_state["settings"], _worker_state["stop_criteria"]
+    )
+    if backtester.stop_reason is not None:
+        return np.NaN
+    return _worker_state["objective"](backtester.simulate()[0].Equity)
+
+
+class WalkForward:
+    """
+    Class used to run rolling in-sample optimization and out-of-sample evaluation
+    """
+
+    def __init__(
+        self,
+        markets_data,
+        parameter_grid,
+        settings,
+        train_years=5,
+        test_years=1,
+        anchored=False,
+        objective=sharpe_ratio,
+        workers=None,
+        stop_criteria=None,
+        cache=None,
+    ):
+        """
+        :param dict markets_data: Market name -> df with Symbol and PX_LAST columns indexed by date
+        :param dict parameter_grid: strategy.compute_indicators parameter -> list of values to sweep
+        :param dict settings: Backtester keyword arguments except all_markets_df and orders_df
+        :param float train_years: Length of each in-sample period
+        :param float test_years: Length of each out-of-sample period
+        :param bool anchored: Attribute to start every in-sample period at the beginning of the data
+        :param function objective: Function scoring an equity curve. Higher is better
+        :param int workers: Number of worker processes of the sweep. 1 runs in process
+        :param list stop_criteria: StopCriterion objects ending in-sample runs early. Out-of-sample runs are complete
+        :param IndicatorCache cache: Memoizes indicators shared by the parameter sets
+        """
+        self.logger = logging.getLogger(__name__)
+        self.markets_data = markets_data
+        self.parameter_sets = expand_grid(parameter_grid)
+        self.settings = settings
+        self.train_years = train_years
+        self.test_years = test_years
+        self.anchored = anchored
+        self.objective = objective
+        self.workers = workers
+        self.stop_criteria = stop_criteria
+        self.cache = cache
+        self.signals = []
+
+    def precompute(self):
+        """Compute indicators, orders and panel of every parameter set once over the full history"""
+        self.logger.info(f"Precomputing {len(self.parameter_sets)} parameter sets...")
+        self.signals = [
+            build_panel(self.markets_data, parameters, self.cache) for parameters in self.parameter_sets
+        ]
+        return self.signals
+
+    def sweep(self, tasks):
+        """Score every (parameter set, start, end) task"""
+        state = {
+            "signals": self.signals,
+            "settings": self.settings,
+            "objective": self.objective,
+            "stop_criteria": self.stop_criteria,
+        }
+        if self.workers == 1:
+            init_worker(state)
+            return [run_sweep_task(task) for task in tasks]
+
+        with ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(state,)) as pool:
+            return list(pool.map(run_sweep_task, tasks))
+
+    def run(self):
+        """
+        Optimize on each train fold and evaluate the best parameter set on the following test fold
+
+        :return tuple: folds summary df, in-sample scores df and stitched out-of-sample equity
+        """
+        if not self.signals:
+            self.precompute()
+
+        dates = self.signals[0][0].index
+        folds = make_folds(dates, self.train_years, self.test_years, self.anchored)
+        self.logger.info(f"Walk forward on {len(folds)} folds...")
+
+        # Sweep all parameter sets on all train folds at once
+        tasks = [
+            (parameters_idx, train_start, train_end)
+            for train_start, train_end, _, _ in folds
+            for parameters_idx in range(len(self.parameter_sets))
+        ]
+        scores = np.array(self.sweep(tasks), dtype=float).reshape(
+            len(folds), len(self.parameter_sets)
+        )
+
+        summary, equity_curves = [], []
+        for fold_idx, (train_start, train_end, test_start, test_end) in enumerate(folds):
+            fold_scores = np.where(np.isnan(scores[fold_idx]), -np.inf, scores[fold_idx])
+            best_idx = int(np.argmax(fold_scores))
+            panel, orders_df = self.signals[best_idx]
+            all_markets_df, _ = run_window(
+                panel, orders_df, test_start, test_end, self.settings
+            ).simulate()
+            equity_curves.append(all_markets_df.Equity)
+
+            summary.append(
+                {
+                    "train_start": dates[train_start],
+                    "train_end": dates[train_end - 1],
+                    "test_start": dates[test_start],
+                    "test_end": dates[test_end - 1],
+                    **self.parameter_sets[best_idx],
+                    "train_score": scores[fold_idx, best_idx],
+                    "test_score": self.objective(all_markets_df.Equity),
+                }
+            )
+
+        in_sample_scores = pd.DataFrame(
+            scores,
+            index=[dates[train_start] for train_start, _, _, _ in folds],
+            columns=[str(parameters) for parameters in self.parameter_sets],
+        )
+        out_of_sample_equity = stitch_equity(equity_curves, self.settings["initial_equity"])
+        return pd.DataFrame(summary), in_sample_scores, out_of_sample_equity
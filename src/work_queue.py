@@ -0,0 +1,370 @@
+"""
+Sweep scheduler over a SQLite work queue in a shared folder
+
+A coordinator saves a data snapshot and one task per parameter set. Worker processes on any host
+that sees the folder claim tasks atomically, run them with the Backtester and write the results
+back. Tasks of workers that stop sending heartbeats are claimed again, up to max_attempts.
+SQLite locking needs a file system with working locks (local disk, NFSv4, SMB)
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from multiprocessing import Process
+
+import numpy as np
+import pandas as pd
+
+from src.backtesting_engine import Backtester
+from src.panel import build_panel
+from src.walk_forward import expand_grid, sharpe_ratio
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    snapshot_id TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    heartbeat REAL,
+    result TEXT,
+    error TEXT,
+    UNIQUE (snapshot_id, parameters)
+)
+"""
+
+
+class WorkQueue:
+    """
+    Class used to share tasks between the coordinator and the workers through a SQLite file
+    """
+
+    def __init__(self, path, lease_seconds=600, max_attempts=3):
+        """
+        :param str path: SQLite file of the queue. Created if missing
+        :param float lease_seconds: Seconds without heartbeat after which a running task is claimed again
+        :param int max_attempts: Number of claims before a task is marked as failed
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self.connect() as connection:
+            connection.execute(SCHEMA)
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return _Transaction(connection)
+
+    def add_tasks(self, snapshot_id, parameter_sets):
+        """
+        Add one task per parameter set. Tasks already in the queue are kept as they are
+
+        :return int: Number of new tasks
+        """
+        with self.connect() as connection:
+            cursor = connection.executemany(
+                "INSERT OR IGNORE INTO tasks (snapshot_id, parameters) VALUES (?, ?)",
+                [(snapshot_id, json.dumps(parameters, sort_keys=True)) for parameters in parameter_sets],
+            )
+            return cursor.rowcount
+
+    def claim(self, worker):
+        """
+        Claim a pending task or a running one whose worker stopped sending heartbeats
+
+        :param str worker: Worker id
+        :return dict: id, snapshot_id and parameters of the task. None if nothing is left to run
+        """
+        now = time.time()
+        with self.connect() as connection:
+            # Tasks of dead workers that used up their attempts are given up
+            connection.execute(
+                "UPDATE tasks SET status = 'failed', error = 'worker lost' "
+                "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                (now - self.lease_seconds, self.max_attempts),
+            )
+            task = connection.execute(
+                "SELECT id, snapshot_id, parameters FROM tasks "
+                "WHERE status = 'pending' OR (status = 'running' AND heartbeat < ?) "
+                "ORDER BY id LIMIT 1",
+                (now - self.lease_seconds,),
+            ).fetchone()
+            if task is None:
+                return None
+            connection.execute(
+                "UPDATE tasks SET status = 'running', attempts = attempts + 1, worker = ?, heartbeat = ? "
+                "WHERE id = ?",
+                (worker, now, task["id"]),
+            )
+        return {
+            "id": task["id"],
+            "snapshot_id": task["snapshot_id"],
+            "parameters": json.loads(task["parameters"]),
+        }
+
+    def heartbeat(self, task_id, worker):
+        """Tell the queue the worker is still running the task"""
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), task_id, worker),
+            )
+
+    def complete(self, task_id, worker, result):
+        """
+        Save the result of a task. Ignored if the task was claimed again by another worker
+
+        :return bool: True if the result was saved
+        """
+        with self.connect() as connection:
+            cursor = connection.execute(
+                "UPDATE tasks SET status = 'done', result = ?, error = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (json.dumps(result), task_id, worker),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, task_id, worker, error):
+        """Put a failed task back in the queue, or mark it as failed after max_attempts"""
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (self.max_attempts, error, task_id, worker),
+            )
+
+    def progress(self):
+        """Return the number of tasks by status"""
+        with self.connect() as connection:
+            rows = connection.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        progress = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+        progress.update({status: count for status, count in rows})
+        progress["total"] = sum(progress.values())
+        return progress
+
+    def results(self):
+        """Return parameters, status, attempts and result of every task"""
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT id, snapshot_id, parameters, status, attempts, worker, result, error FROM tasks "
+                "ORDER BY id"
+            ).fetchall()
+        return pd.DataFrame(
+            [
+                {
+                    "task": row["id"],
+                    "snapshot_id": row["snapshot_id"],
+                    **json.loads(row["parameters"]),
+                    "status": row["status"],
+                    "attempts": row["attempts"],
+                    "worker": row["worker"],
+                    **json.loads(row["result"] or "{}"),
+                    "error": row["error"],
+                }
+                for row in rows
+            ]
+        )
+
+
+class _Transaction:
+    """Context manager running the enclosed statements in one write transaction"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        # Take the write lock at once, so two workers can't select the same task
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.connection.close()
+
+
+def save_snapshot(folder, markets_data, settings):
+    """
+    Save markets data and Backtester settings shared by the tasks of a sweep
+
+    :return str: Snapshot id, the hash of its content
+    """
+    content = pickle.dumps({"markets_data": markets_data, "settings": settings})
+    snapshot_id = hashlib.sha1(content).hexdigest()[:16]
+    path = os.path.join(folder, f"{snapshot_id}.pkl")
+    if not os.path.exists(path):
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(content)
+        os.replace(temporary_path, path)
+    return snapshot_id
+
+
+def load_snapshot(folder, snapshot_id):
+    with open(os.path.join(folder, f"{snapshot_id}.pkl"), "rb") as file:
+        return pickle.load(file)
+
+
+def run_task(snapshot, parameters, objective=sharpe_ratio, keep_run=False):
+    """
+    Simulate a parameter set on a snapshot
+
+    :param bool keep_run: Attribute to also return the run for a ResultsStore: metrics, equity curve and trade ledger
+    :return tuple: Score, final equity, max drawdown and stop reason of the run, and the run. None without keep_run
+    """
+    all_markets_df, orders_df = build_panel(snapshot["markets_data"], parameters)
+    backtester = Backtester(all_markets_df, orders_df=orders_df, progress=False, **snapshot["settings"])
+    simulated_df = backtester.simulate()[0]
+    equity = simulated_df.Equity
+    score = objective(equity)
+    result = {
+        "score": None if np.isnan(score) else float(score),
+        "final_equity": float(equity.iloc[-1]),
+        "max_drawdown": float((equity / equity.cummax() - 1).min()),
+        "stop_reason": backtester.stop_reason,
+    }
+    if not keep_run:
+        return result, None
+
+    from src.results_store import run_metrics
+
+    # Settings that fit in json. Data frames stay in the snapshot
+    settings = {
+        name: value
+        for name, value in snapshot["settings"].items()
+        if isinstance(value, (bool, int, float, str, list, tuple)) or value is None
+    }
+    return result, {
+        "config": settings,
+        "parameters": parameters,
+        "metrics": {**run_metrics(simulated_df), "score": result["score"], "stop_reason": result["stop_reason"]},
+        "equity": equity,
+        "trade_ledger": backtester.trade_ledger.to_frame(),
+    }
+
+
+def task_run_id(task):
+    """Function to get the id in the ResultsStore of the run of a task, the same for every attempt"""
+    return hashlib.sha1(f"{task['snapshot_id']}:{task['id']}".encode()).hexdigest()[:16]
+
+
+def submit_sweep(folder, markets_data, parameter_grid, settings):
+    """
+    Save the data snapshot and add a task per parameter set to the queue of the folder
+
+    Submitting the same sweep again adds nothing, so an interrupted sweep is resumed by the workers
+
+    :param str folder: Shared folder of the queue and snapshots
+    :param dict markets_data: Market name -> df with Symbol and PX_LAST columns indexed by date
+    :param dict parameter_grid: strategy.compute_indicators parameter -> list of values to sweep
+    :param dict settings: Backtester keyword arguments except all_markets_df and orders_df
+    :return str: Snapshot id
+    """
+    os.makedirs(folder, exist_ok=True)
+    snapshot_id = save_snapshot(folder, markets_data, settings)
+    new_tasks = WorkQueue(os.path.join(folder, "queue.sqlite")).add_tasks(
+        snapshot_id, expand_grid(parameter_grid)
+    )
+    logger.info(f"Snapshot {snapshot_id}: {new_tasks} new tasks")
+    return snapshot_id
+
+
+def run_worker(
+    folder, lease_seconds=600, max_attempts=3, poll_seconds=None, store_folder=None, experiment="default"
+):
+    """
+    Claim and run tasks of the queue in the folder
+
+    :param str folder: Shared folder of the queue and snapshots
+    :param float lease_seconds: Seconds without heartbeat after which a task is claimed again
+    :param int max_attempts: Number of claims before a task is marked as failed
+    :param float poll_seconds: Seconds between claims while other workers run the last tasks.
+        None stops as soon as no task can be claimed
+    :param str store_folder: Folder of the ResultsStore keeping every run. None keeps the results in the queue only
+    :param str experiment: Experiment of the runs in the store
+    :return int: Number of tasks completed
+    """
+    queue = WorkQueue(os.path.join(folder, "queue.sqlite"), lease_seconds, max_attempts)
+    store = None
+    if store_folder is not None:
+        from src.results_store import ResultsStore
+
+        store = ResultsStore(store_folder)
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    snapshots, completed = {}, 0
+
+    while True:
+        task = queue.claim(worker)
+        if task is None:
+            progress = queue.progress()
+            if poll_seconds is None or progress["pending"] + progress["running"] == 0:
+                return completed
+            time.sleep(poll_seconds)
+            continue
+
+        # Heartbeats keep the lease while the simulation runs
+        running = threading.Event()
+        beating = threading.Thread(
+            target=_send_heartbeats, args=(queue, task["id"], worker, running), daemon=True
+        )
+        beating.start()
+        try:
+            if task["snapshot_id"] not in snapshots:
+                snapshots[task["snapshot_id"]] = load_snapshot(folder, task["snapshot_id"])
+            result, run = run_task(snapshots[task["snapshot_id"]], task["parameters"], keep_run=store is not None)
+        except Exception as error:
+            logger.exception(f"Task {task['id']} failed")
+            running.set()
+            beating.join()
+            queue.fail(task["id"], worker, repr(error))
+            continue
+        running.set()
+        beating.join()
+        if run is not None:
+            run["run_id"] = result["run_id"] = task_run_id(task)
+        # Only the worker still holding the task keeps its run, so a task claimed again after a lost lease
+        # is stored once
+        if not queue.complete(task["id"], worker, result):
+            logger.warning(f"Task {task['id']} was claimed again by another worker. Its result is dropped")
+            continue
+        if run is not None:
+            store.append(experiment, [run])
+        completed += 1
+        logger.info(f"Task {task['id']} done: {task['parameters']}")
+
+
+def _send_heartbeats(queue, task_id, worker, stopped):
+    while not stopped.wait(queue.lease_seconds / 3):
+        queue.heartbeat(task_id, worker)
+
+
+def run_local_workers(folder, processes, **worker_kwargs):
+    """Run worker processes on this host and wait for them"""
+    workers = [
+        Process(target=run_worker, args=(folder,), kwargs=worker_kwargs) for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [worker.exitcode for worker in workers]
+
+
+def sweep_progress(folder):
+    """Return the number of tasks by status of the queue in the folder"""
+    return WorkQueue(os.path.join(folder, "queue.sqlite")).progress()
+
+
+def sweep_results(folder):
+    """Return the tasks of the queue in the folder with their results"""
+    return WorkQueue(os.path.join(folder, "queue.sqlite")).results()
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_universe import make_universe
+
+
+@pytest.fixture(scope="session")
+def universe():
+    return make_universe(4, 2)
+
+
+@pytest.fixture(scope="session")
+def hourly_universe(universe):
+    """Universe with hourly bars. Even markets trade around the clock, odd ones from 9 to 16"""
+    rng = np.random.default_rng(1)
+    markets = {}
+    for market_idx, (market, market_data) in enumerate(universe["markets"].items()):
+        hours = range(9, 17) if market_idx % 2 else range(24)
+        dates = pd.DatetimeIndex(
+            [day + pd.Timedelta(hours=hour) for day in market_data.index[:250] for hour in hours], name="Dates"
+        )
+        close = 100 * np.exp(np.cumsum(rng.standard_normal(len(dates)) * 0.002))
+        markets[market] = pd.DataFrame({"Symbol": market, "PX_LAST": close.round(4)}, index=dates)
+    return {**universe, "markets": markets}
+
+
+@pytest.fixture(scope="session")
+def settings(universe):
+    """Backtester keyword arguments of the universe, except the panel and the orders"""
+    return {
+        "initial_equity": 1e8,
+        "position_risk": 0.005,
+        "markets_list": list(universe["markets"]),
+        "local_currency": True,
+        "currencies_df": universe["currencies"],
+        "commission": 10,
+        "fee": True,
+        "fee_structure": [0.02, 0.2],
+        "specifications": universe["specifications"],
+        "progress": False,
+    }
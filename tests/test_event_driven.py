@@ -0,0 +1,63 @@
+import pytest
+
+from src.backtesting_engine import Backtester
+from src.costs import CostModel
+from src.panel import build_panel, build_strategies_panel
+from src.position_sizing import VolatilityTarget
+
+STRATEGIES = {"fast": {"breakout": 50, "exit_breakout": 25}, "slow": {"breakout": 150}}
+
+
+def simulate(all_markets_df, orders_df, settings, **kwargs):
+    """Function to run a simulation and return the panel, the orders and the trade ledger"""
+    backtester = Backtester(all_markets_df, orders_df=orders_df.copy(), **settings, **kwargs)
+    simulated_df, simulated_orders = backtester.simulate()
+    return simulated_df, simulated_orders, backtester.trade_ledger.to_frame()
+
+
+def assert_same_results(dense, event_driven):
+    # Event driven runs only differ from dense ones when the strategy trades
+    assert not dense[2].empty
+    for dense_result, event_result in zip(dense, event_driven):
+        assert dense_result.equals(event_result)
+    assert (dense[0].dtypes == event_driven[0].dtypes).all()
+
+
+@pytest.fixture(scope="module")
+def panel(universe):
+    return build_panel(universe["markets"])
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("local_currency", [False, True])
+def test_single_strategy(panel, settings, compact, local_currency):
+    settings = {**settings, "local_currency": local_currency}
+    dense = simulate(*panel, settings, compact=compact)
+    assert_same_results(dense, simulate(*panel, settings, compact=compact, event_driven=True))
+
+
+def test_volatility_target(panel, settings):
+    dense = simulate(*panel, settings, position_sizing=VolatilityTarget(0.15))
+    event_driven = simulate(*panel, settings, position_sizing=VolatilityTarget(0.15), event_driven=True)
+    assert_same_results(dense, event_driven)
+
+
+def test_multi_strategy(universe, settings):
+    panel = build_strategies_panel(universe["markets"], STRATEGIES)
+    strategies = {"fast": 0.4, "slow": 0.6}
+    dense = simulate(*panel, settings, strategies=strategies)
+    assert_same_results(dense, simulate(*panel, settings, strategies=strategies, event_driven=True))
+
+
+def test_cost_model(panel, settings):
+    specifications = settings["specifications"].assign(Tick_Size=0.25)
+    settings = {**settings, "specifications": specifications}
+    dense = simulate(*panel, settings, cost_model=CostModel(10, 1, 0.1, 20))
+    assert dense[0].Costs.sum() > 0
+    assert_same_results(dense, simulate(*panel, settings, cost_model=CostModel(10, 1, 0.1, 20), event_driven=True))
+
+
+def test_intraday(hourly_universe, settings):
+    panel = build_panel(hourly_universe["markets"])
+    dense = simulate(*panel, settings, bar_frequency="1h")
+    assert_same_results(dense, simulate(*panel, settings, bar_frequency="1h", event_driven=True))
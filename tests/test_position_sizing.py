@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from src.backtesting_engine import Backtester
+from src.bars import daily_bars
+from src.panel import assemble_panel, build_market_frame
+from src.position_sizing import VolatilityTarget
+
+ANNUAL_VOLATILITY = 0.2
+HOURS = range(9, 17)
+
+
+def make_hourly_market(n_days, seed=0):
+    """Function to simulate a market with 8 hourly bars per business day and a known annualized volatility"""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range("2001-01-01", periods=n_days)
+    dates = pd.DatetimeIndex([day + pd.Timedelta(hours=hour) for day in days for hour in HOURS], name="Dates")
+    bar_volatility = ANNUAL_VOLATILITY / np.sqrt(252 * len(HOURS))
+    close = 100 * np.exp(np.cumsum(rng.standard_normal(len(dates)) * bar_volatility))
+    market_data = pd.DataFrame({"PX_LAST": close}, index=dates)
+    market_data["exit_resistance"] = market_data.PX_LAST * 1.05
+    market_data["exit_support"] = market_data.PX_LAST * 0.95
+
+    # Position flipped at the last bar of every 10th day, so it is sized again by the volatility
+    day_ends = dates[np.r_[dates.normalize()[1:] != dates.normalize()[:-1], True]]
+    order_dates = day_ends[::10][:-1]
+    orders = ["long" if position % 2 == 0 else "short" for position in range(len(order_dates))]
+    market_orders = pd.DataFrame({"Order": orders}, index=order_dates.rename("Dates"))
+    return market_data, market_orders
+
+
+def test_volatility_target_on_hourly_bars():
+    market_data, market_orders = make_hourly_market(1000)
+    all_markets_df = assemble_panel([build_market_frame("M000", market_data, market_orders)], ["M000"])
+    orders_df = market_orders.reset_index().assign(Symbol="M000")
+    specifications = pd.DataFrame({"Symbol": ["M000"], "Currency": ["USD"], "Point_Value": [10], "Margin": [500.0]})
+
+    target_volatility = 0.15
+    backtester = Backtester(
+        all_markets_df,
+        initial_equity=1e8,
+        position_risk=0.005,
+        markets_list=["M000"],
+        orders_df=orders_df,
+        local_currency=False,
+        currencies_df=None,
+        commission=0,
+        fee=False,
+        fee_structure=[0, 0],
+        specifications=specifications,
+        progress=False,
+        event_driven=True,
+        position_sizing=VolatilityTarget(target_volatility),
+        bar_frequency="1h",
+    )
+    data, _ = backtester.simulate()
+
+    # Realized volatility of the daily equity once every position is sized by the covariance
+    returns = daily_bars(data).Equity.pct_change().iloc[100:]
+    realized_volatility = returns.std() * np.sqrt(252)
+    assert abs(realized_volatility / target_volatility - 1) < 0.15
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from src.results_store import ResultsStore, part_level
+
+EQUITY = pd.Series(np.linspace(1e6, 1.1e6, 50), index=pd.bdate_range("2020-01-01", periods=50))
+
+
+def append_runs(store, n_runs, experiment="sweep"):
+    runs = [{"parameters": {"breakout": run}, "metrics": {"score": float(run)}, "equity": EQUITY} for run in range(n_runs)]
+    return [store.append(experiment, [run])[0] for run in runs]
+
+
+def test_appends_merge_levels(tmp_path):
+    store = ResultsStore(str(tmp_path), max_parts=4)
+    run_ids = append_runs(store, 37)
+
+    # 37 = 2 * 16 + 1 * 4 + 1
+    parts = store.parts("runs", "sweep")
+    assert sorted(part_level(part) for part in parts) == [0, 1, 2, 2]
+    assert len(store.parts("equity", "sweep")) == len(parts)
+
+    runs = store.runs("sweep")
+    assert sorted(runs.run_id) == sorted(run_ids)
+    assert store.top("score", 3, "sweep")["parameters.breakout"].tolist() == [36, 35, 34]
+    curves = store.equity_curves(run_ids[:5], "sweep")
+    assert list(curves.columns) == run_ids[:5]
+    np.testing.assert_array_equal(curves[run_ids[0]].to_numpy(), EQUITY.to_numpy())
+
+
+def test_compact(tmp_path):
+    store = ResultsStore(str(tmp_path), max_parts=None)
+    run_ids = append_runs(store, 5)
+    append_runs(store, 2, experiment="other")
+    assert len(store.parts("runs", "sweep")) == 5
+
+    store.compact("sweep")
+    assert len(store.parts("runs", "sweep")) == 1
+    assert sorted(store.runs("sweep").run_id) == sorted(run_ids)
+    assert store.experiments().to_dict() == {"other": 2, "sweep": 5}
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.rolling import rolling_regression
+
+
+@pytest.fixture(scope="module")
+def returns():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2010-01-01", periods=600)
+    benchmark = pd.Series(rng.normal(0.0003, 0.01, len(dates)), index=dates, name="Benchmark")
+    curve = 0.0001 + 0.6 * benchmark + rng.normal(0, 0.005, len(dates))
+    return curve.rename("Curve"), benchmark
+
+
+@pytest.mark.parametrize("window", [20, 63, 252])
+def test_matches_pandas(returns, window):
+    curve, benchmark = returns
+    rolling = rolling_regression(curve, benchmark, windows=[window])
+
+    covariance = curve.rolling(window).cov(benchmark)
+    beta = covariance / benchmark.rolling(window).var()
+    alpha = (1 + curve.rolling(window).mean() - beta * benchmark.rolling(window).mean()) ** 252 - 1
+    residual_volatility = np.sqrt((curve.rolling(window).var() - beta * covariance) * 252)
+    expected = {
+        "alpha": alpha,
+        "beta": beta,
+        "correlation": curve.rolling(window).corr(benchmark),
+        "residual_volatility": residual_volatility,
+    }
+    for metric, values in expected.items():
+        np.testing.assert_allclose(rolling[(metric, "Benchmark", window)], values, rtol=1e-8, atol=1e-12)
+
+
+def test_missing_days_are_skipped(returns):
+    curve, benchmark = returns
+    curve = curve.copy()
+    curve.iloc[100:110] = np.NaN
+    rolling = rolling_regression(curve, benchmark, windows=[63], min_periods=50)
+
+    # Full windows with enough valid days match pandas on the days both returns exist
+    beta = curve.rolling(63, min_periods=50).cov(benchmark) / benchmark.where(curve.notna()).rolling(
+        63, min_periods=50
+    ).var()
+    assert rolling[("beta", "Benchmark", 63)].iloc[:62].isna().all()
+    np.testing.assert_allclose(rolling[("beta", "Benchmark", 63)].iloc[62:], beta.iloc[62:], rtol=1e-8)
+
+
+def test_several_curves_and_benchmarks(returns):
+    curve, benchmark = returns
+    curves = pd.concat([curve, 2 * curve.rename("Levered")], axis=1)
+    benchmarks = pd.concat([benchmark, benchmark.rename("Copy")], axis=1)
+    rolling = rolling_regression(curves, benchmarks, windows=[63, 126])
+
+    single = rolling_regression(curve, benchmark, windows=[63, 126])
+    pd.testing.assert_series_equal(
+        rolling[("beta", "Copy", 126, "Curve")], single[("beta", "Benchmark", 126)], check_names=False
+    )
+    np.testing.assert_allclose(
+        rolling[("beta", "Benchmark", 63, "Levered")], 2 * single[("beta", "Benchmark", 63)], rtol=1e-8
+    )
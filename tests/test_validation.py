@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from src.backtesting_engine import Backtester
+from src.panel import build_panel
+from src.screening import fast_simulate
+from src.validation import ValidationError, check_inputs
+
+
+@pytest.fixture
+def panel(universe):
+    return build_panel(universe["markets"])
+
+
+def validate(all_markets_df, orders_df, settings):
+    return check_inputs(
+        all_markets_df,
+        settings["markets_list"],
+        orders_df,
+        settings["specifications"],
+        settings["currencies_df"],
+        settings["local_currency"],
+    )
+
+
+def assert_error(all_markets_df, orders_df, settings, check, market):
+    """Function to check that the inputs fail the check on the market, in the report and in the Backtester"""
+    with pytest.raises(ValidationError) as error:
+        validate(all_markets_df, orders_df, settings)
+    errors = error.value.report.loc[error.value.report.severity == "error"]
+    assert (errors.check == check).any()
+    assert set(errors.loc[errors.check == check, "market"]) == {market}
+
+    with pytest.raises(ValidationError):
+        Backtester(all_markets_df, orders_df=orders_df.copy(), **settings)
+
+
+def test_complete_inputs(panel, settings):
+    report = validate(*panel, settings)
+    assert (report.severity != "error").all()
+
+
+def test_unknown_order(panel, settings):
+    all_markets_df, orders_df = panel
+    all_markets_df.iloc[10, all_markets_df.columns.get_loc("M001 Order")] = "buy"
+    assert_error(all_markets_df, orders_df, settings, "unknown_order", "M001")
+
+
+def test_missing_close_at_order(panel, settings):
+    all_markets_df, orders_df = panel
+    order_rows = np.flatnonzero(all_markets_df["M002 Order"].notna().to_numpy())
+    order_row = order_rows[order_rows > 20][0]
+    all_markets_df.iloc[order_row - 10 : order_row + 2, all_markets_df.columns.get_loc("M002 Close")] = np.NaN
+    assert_error(all_markets_df, orders_df, settings, "missing_close_at_order", "M002")
+
+
+def test_missing_specification(panel, settings):
+    specifications = settings["specifications"]
+    settings = {**settings, "specifications": specifications.loc[specifications.Symbol != "M003"]}
+    assert_error(*panel, settings, "missing_specification", "M003")
+
+
+def test_missing_currency(panel, settings):
+    # M001 is quoted in EUR
+    settings = {**settings, "currencies_df": settings["currencies_df"].drop(columns="EUR")}
+    assert_error(*panel, settings, "missing_currency", "M001")
+
+
+def test_missing_fx_rate(panel, settings):
+    # M002 is quoted in GBP. Rates older than 9 days are not used
+    currencies_df = settings["currencies_df"].copy()
+    currencies_df.iloc[100:120, currencies_df.columns.get_loc("GBP")] = np.NaN
+    assert_error(*panel, {**settings, "currencies_df": currencies_df}, "missing_fx_rate", "M002")
+
+
+def test_fast_simulate_missing_fx_rate(panel, settings):
+    currencies_df = settings["currencies_df"].copy()
+    currencies_df.iloc[100:120, currencies_df.columns.get_loc("GBP")] = np.NaN
+    fast_settings = {**settings, "currencies_df": currencies_df}
+    del fast_settings["progress"]
+    with pytest.raises(ValueError, match="GBP"):
+        fast_simulate(panel[0], **fast_settings)
+
+
+def test_close_gap_is_a_warning(panel, settings):
+    all_markets_df, orders_df = panel
+    all_markets_df.iloc[200:215, all_markets_df.columns.get_loc("M000 Close")] = np.NaN
+    report = validate(all_markets_df, orders_df, settings)
+    assert ((report.check == "close_gap") & (report.market == "M000") & (report.severity == "warning")).any()
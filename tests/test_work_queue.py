@@ -0,0 +1,102 @@
+import os
+import time
+
+from src.results_store import ResultsStore
+from src.work_queue import WorkQueue, run_worker, submit_sweep, task_run_id
+
+PARAMETER_SETS = [{"breakout": 50}, {"breakout": 100}]
+
+
+def make_queue(tmp_path, lease_seconds=600, max_attempts=3):
+    queue = WorkQueue(os.path.join(tmp_path, "queue.sqlite"), lease_seconds, max_attempts)
+    queue.add_tasks("snapshot", PARAMETER_SETS)
+    return queue
+
+
+def test_claims_each_task_once(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.add_tasks("snapshot", PARAMETER_SETS) == 0
+    claimed = [queue.claim("a"), queue.claim("b")]
+    assert [task["parameters"] for task in claimed] == PARAMETER_SETS
+    assert queue.claim("c") is None
+    assert queue.progress()["running"] == 2
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05)
+    task = queue.claim("a")
+    queue.claim("a")
+    time.sleep(0.1)
+
+    # The first worker stopped sending heartbeats, so its task goes to another worker
+    reclaimed = queue.claim("b")
+    assert reclaimed["id"] == task["id"]
+
+    # Results of the worker that lost the lease are ignored
+    assert not queue.complete(task["id"], "a", {"score": 1.0})
+    assert queue.complete(task["id"], "b", {"score": 2.0})
+    results = queue.results().set_index("task")
+    assert results.at[task["id"], "status"] == "done"
+    assert results.at[task["id"], "worker"] == "b"
+    assert results.at[task["id"], "attempts"] == 2
+    assert results.at[task["id"], "score"] == 2.0
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.5)
+    task = queue.claim("a")
+    for _ in range(3):
+        time.sleep(0.2)
+        queue.heartbeat(task["id"], "a")
+    assert queue.claim("b")["id"] != task["id"]
+    assert queue.claim("c") is None
+
+
+def test_failed_task_is_retried_up_to_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    task = queue.claim("a")
+    queue.fail(task["id"], "a", "ValueError()")
+    assert queue.progress()["pending"] == 2
+
+    retried = queue.claim("b")
+    assert retried["id"] == task["id"]
+    queue.fail(task["id"], "b", "ValueError()")
+    results = queue.results().set_index("task")
+    assert results.at[task["id"], "status"] == "failed"
+    assert results.at[task["id"], "error"] == "ValueError()"
+
+
+def test_lost_worker_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05, max_attempts=1)
+    task = queue.claim("a")
+    time.sleep(0.1)
+    assert queue.claim("b")["id"] != task["id"]
+    results = queue.results().set_index("task")
+    assert results.at[task["id"], "status"] == "failed"
+    assert results.at[task["id"], "error"] == "worker lost"
+
+
+def test_worker_stores_each_task_once(tmp_path, universe, settings, monkeypatch):
+    folder, store_folder = str(tmp_path / "sweep"), str(tmp_path / "store")
+    settings = {name: value for name, value in settings.items() if name != "progress"}
+    submit_sweep(folder, universe["markets"], {"breakout": [50, 100]}, settings)
+    queue = WorkQueue(os.path.join(folder, "queue.sqlite"))
+
+    # A worker whose task was claimed again by another one drops its run
+    complete = WorkQueue.complete
+    monkeypatch.setattr(WorkQueue, "complete", lambda *args: False)
+    assert run_worker(folder, store_folder=store_folder, experiment="sweep") == 0
+    assert queue.progress()["running"] == 2
+    assert ResultsStore(store_folder).runs("sweep").empty
+
+    monkeypatch.setattr(WorkQueue, "complete", complete)
+    with queue.connect() as connection:
+        connection.execute("UPDATE tasks SET status = 'pending', attempts = 0")
+    assert run_worker(folder, store_folder=store_folder, experiment="sweep") == 2
+    results = queue.results()
+    runs = ResultsStore(store_folder).runs("sweep")
+    assert sorted(runs.run_id) == sorted(results.run_id)
+    assert results.run_id.tolist() == [
+        task_run_id({"id": task, "snapshot_id": snapshot_id})
+        for task, snapshot_id in zip(results.task, results.snapshot_id)
+    ]
@@ -1,23 +1,11 @@
 import os
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
-from scipy.stats import norm
-from scipy.optimize import minimize
-
-import rpy2.robjects as ro
-from rpy2.robjects.packages import importr
-from rpy2.robjects import pandas2ri
-from rpy2.robjects.conversion import localconverter
-
-sde = importr("sde")
-stats = importr("stats")
 
 root_folder = os.getcwd()
 data_folder = "data"
 historical_data_folder = "historical_data_ratio_adjusted"
 path_to_historical_data = os.path.join(root_folder, data_folder, historical_data_folder)
-markets_list = [market.split(".")[0] for market in os.listdir(path_to_historical_data)]
 
 dt = 1 / 252
 
@@ -27,22 +15,24 @@ ending_date = "2022-01-01"
 
 
 # Explicit formula MLE
-def lik(parameters):
+def lik(parameters, market_returns):
+    from scipy.stats import norm
+
     theta_1, theta_2 = parameters
     loglik = norm.logpdf(market_returns, loc=theta_1, scale=theta_2)
     loglik = loglik[~np.isnan(loglik)]
     return -sum(loglik)
 
 
-params_matrix = pd.DataFrame()
+def change_point(market_data):
+    """Return index of the change-point of the series. R is started at the first call"""
+    import rpy2.robjects as ro
+    from rpy2.robjects import pandas2ri
+    from rpy2.robjects.conversion import localconverter
+    from rpy2.robjects.packages import importr
 
-for market in tqdm(markets_list):
-    # Import data and drop na
-    market_data = pd.read_excel(
-        os.path.join(root_folder, data_folder, historical_data_folder, market + ".xlsx"),
-        usecols=["Dates", "PX_LAST"],
-        index_col="Dates",
-    ).dropna(how="all")[:ending_date]
+    sde = importr("sde")
+    stats = importr("stats")
 
     # Convert data from Pandas.DataFrame to R-format
     with localconverter(ro.default_converter + pandas2ri.converter):
@@ -55,17 +45,30 @@ for market in tqdm(markets_list):
     out_cpoint = sde.cpoint(rts_data)
 
     # Extract $tau1 (index of change-point)
-    cpoint = int(np.array(out_cpoint[1]))
+    return int(np.array(out_cpoint[1]))
+
+
+def estimate_parameters(market):
+    """Estimate drift and volatility of a market after its change-point"""
+    from scipy.optimize import minimize
 
+    # Import data and drop na
+    market_data = pd.read_excel(
+        os.path.join(root_folder, data_folder, historical_data_folder, market + ".xlsx"),
+        usecols=["Dates", "PX_LAST"],
+        index_col="Dates",
+    ).dropna(how="all")[:ending_date]
+
+    cpoint = change_point(market_data)
     market_data = market_data[cpoint:]
 
     market_returns = np.log(market_data.PX_LAST).diff()
     market_returns = market_returns[~np.isnan(market_returns)]
-    res = minimize(lik, [1, 1], method="Nelder-Mead")
+    res = minimize(lik, [1, 1], args=(market_returns,), method="Nelder-Mead")
     theta_1 = res.x[0] / dt
     theta_2 = res.x[1] / np.sqrt(dt)
 
-    market_params = pd.DataFrame(
+    return pd.DataFrame(
         {
             "market": [market],
             "drift": [theta_1],
@@ -75,7 +78,15 @@ for market in tqdm(markets_list):
             "last_price": [market_data.PX_LAST[-1]],
         }
     )
-    params_matrix = pd.concat([params_matrix, market_params])
 
 
-params_matrix.to_excel(os.path.join(root_folder, data_folder, "parameters.xlsx"), index=False)
+if __name__ == "__main__":
+    from tqdm import tqdm
+
+    markets_list = [market.split(".")[0] for market in os.listdir(path_to_historical_data)]
+
+    params_matrix = pd.DataFrame()
+    for market in tqdm(markets_list):
+        params_matrix = pd.concat([params_matrix, estimate_parameters(market)])
+
+    params_matrix.to_excel(os.path.join(root_folder, data_folder, "parameters.xlsx"), index=False)
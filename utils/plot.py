@@ -3,6 +3,8 @@ import os
 from matplotlib import pyplot as plt, dates
 import numpy as np
 
+from src.plotting import plot_line
+
 ticker = "ES"
 
 root_folder = os.getcwd()
@@ -30,8 +32,9 @@ fig, ax = plt.subplots(1,1)
 plt.grid(color="#2A3459")
 plt.ylabel("Price")
 plt.xticks(rotation=45)
-ax.plot(df, 'black')
-# ax.plot(resistance, '--')
-# ax.plot(support, '--')
+# Decimated to the pixel width, keeping the highs and lows of each pixel
+plot_line(ax, df.PX_LAST, color='black')
+# plot_line(ax, resistance, linestyle='--')
+# plot_line(ax, support, linestyle='--')
 ax.xaxis.set_major_formatter(dates.DateFormatter('%b-%y'))
 plt.show()